@@ -0,0 +1,59 @@
+"""benchmark of bulk shopping list generation
+
+compares one ShoppingList.refresh + get_total_price per list with
+core.batch.generate_lists (with and without NumPy)
+
+run with: python benchmarks/bench_batch.py [lists]"""
+import random
+import sys
+import time
+
+from shoppinglistapp.core import batch
+from shoppinglistapp.core.columnar import ColumnarItemPool
+from shoppinglistapp.core.items import Item
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+
+def make_pool(size, seed=0):
+    """a columnar pool of size items with random prices"""
+    rng = random.Random(seed)
+    pool = ColumnarItemPool()
+    pool.add_items([Item(f'item{i}', rng.randint(1, 99999) / 100)
+                    for i in range(size)])
+    return pool
+
+
+def timed(func):
+    """seconds taken by one call of func"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def one_by_one(pool, count, size):
+    """the current way: one refresh and one total per list"""
+    rng = random.Random(0)
+    shopping_list = ShoppingList()
+    for _ in range(count):
+        shopping_list.refresh(pool, size, rng=rng)
+        shopping_list.get_total_price()
+
+
+def main(count=1000000, size=5, pool_size=10000):
+    """print the time each approach takes to generate count lists"""
+    pool = make_pool(pool_size)
+    loop_count = min(count, 100000)
+    elapsed = timed(lambda: one_by_one(pool, loop_count, size))
+    print(f'refresh loop      {elapsed * count / loop_count:8.2f} s '
+          f'(extrapolated from {loop_count} lists)')
+    elapsed = timed(lambda: batch.generate_lists(pool, loop_count, size,
+                                                 use_numpy=False))
+    print(f'batch, no numpy   {elapsed * count / loop_count:8.2f} s '
+          f'(extrapolated from {loop_count} lists)')
+    if batch.np is not None:
+        elapsed = timed(lambda: batch.generate_lists(pool, count, size))
+        print(f'batch, numpy      {elapsed:8.2f} s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
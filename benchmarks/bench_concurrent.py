@@ -0,0 +1,107 @@
+"""benchmark of reads on an item pool shared between threads
+
+readers refresh shopping lists while a few writers add and remove
+items. ConcurrentItemPool (lock-free reads on snapshots) is compared
+with a plain ItemPool behind one lock, the simplest correct alternative
+
+run with:
+    python benchmarks/bench_concurrent.py [readers] [writers] [seconds]"""
+import random
+import sys
+import threading
+import time
+
+from shoppinglistapp.core.concurrent import ConcurrentItemPool
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+
+class LockedItemPool:
+    """a plain ItemPool with every call made under one lock"""
+    def __init__(self, pool):
+        self.pool = pool
+        self.lock = threading.Lock()
+
+    def refresh(self, shopping_list, size, rng):
+        """refresh a list while holding the lock"""
+        with self.lock:
+            shopping_list.refresh(self.pool, size, rng=rng)
+
+    def swap(self, old, new):
+        """replace one item while holding the lock"""
+        with self.lock:
+            self.pool.remove_item(old)
+            self.pool.add_item(new)
+
+
+class SnapshotPool:
+    """the same two calls on a ConcurrentItemPool"""
+    def __init__(self, pool):
+        self.pool = pool
+
+    def refresh(self, shopping_list, size, rng):
+        """refresh a list from the current snapshot"""
+        shopping_list.refresh(self.pool, size, rng=rng)
+
+    def swap(self, old, new):
+        """replace one item in one publish"""
+        with self.pool.batch() as pool:
+            pool.remove_item(old)
+            pool.add_item(new)
+
+
+def run(shared, readers, writers, seconds):
+    """reads per second and writes per second over the run"""
+    stop = threading.Event()
+    reads = [0] * readers
+    writes = [0] * writers
+
+    def reader(rid):
+        rng = random.Random(rid)
+        shopping_list = ShoppingList()
+        while not stop.is_set():
+            shared.refresh(shopping_list, 10, rng)
+            reads[rid] += 1
+
+    def writer(wid):
+        i = 0
+        while not stop.is_set():
+            shared.swap(f'item{wid}-{i}', Item(f'item{wid}-{i + 1}', '1.50'))
+            i += 1
+            writes[wid] += 1
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=reader, args=(i,))
+               for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,))
+                for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(reads) / seconds, sum(writes) / seconds
+
+
+def make_items(pool_size, writers):
+    """pool_size items, the first of every writer named item<w>-0"""
+    items = {f'item{w}-0': Item(f'item{w}-0', '1.50') for w in range(writers)}
+    for i in range(pool_size - writers):
+        items[f'item{i}'] = Item(f'item{i}', f'{i % 500 + 1}.25')
+    return items
+
+
+def main(readers=8, writers=2, seconds=3, pool_size=10000):
+    """print read and write throughput of both pools"""
+    for label, shared in (
+            ('one lock', LockedItemPool(ItemPool(
+                make_items(pool_size, writers)))),
+            ('snapshots', SnapshotPool(ConcurrentItemPool(
+                make_items(pool_size, writers))))):
+        reads, writes = run(shared, readers, writers, seconds)
+        print(f'{label:10} {reads:10.0f} refreshes/s {writes:8.0f} writes/s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,76 @@
+"""microbenchmark of command dispatch
+
+compares finding the handler and arguments of a line with the old
+if/elif chain of AppCLI.execute_command (exact matches, startswith
+checks, then slicing in the handlers) against COMMANDS.resolve, over a
+mix of commands like the one a quiz session sends
+
+run with: python benchmarks/bench_dispatch.py"""
+import random
+import timeit
+
+from shoppinglistapp.app_cli import COMMANDS
+from shoppinglistapp.commands import CommandRegistry
+
+# add and del stand for lines naming a random item, which rarely repeat
+MIX = (['list'] * 10 + ['ask'] * 20 + ['show list'] * 10 +
+       ['show items'] * 5 + ['show items page 3'] * 5 +
+       ['show items from milk'] * 2 + ['add'] * 8 + ['del'] * 8 +
+       ['a', 'l', 'q', 'stats', 'hello'])
+
+
+def make_lines(count, seed=0):
+    """count lines drawn from MIX"""
+    rng = random.Random(seed)
+    lines = []
+    for line in rng.choices(MIX, k=count):
+        if line == 'add':
+            line = f'add item{rng.randrange(10 ** 6)}: 3.25'
+        elif line == 'del':
+            line = f'del item{rng.randrange(10 ** 6)}'
+        lines.append(line)
+    return lines
+
+
+def legacy_route(cmd):
+    """the old chain, down to the argument slicing of the handlers"""
+    # pylint: disable=too-many-return-statements
+    if cmd in ('q', 'quit'):
+        return 'quit', ()
+    if cmd in ('a', 'ask'):
+        return 'ask', ()
+    if cmd in ('l', 'list'):
+        return 'list', ()
+    if cmd.startswith('show'):
+        what = cmd[5:]
+        if what == 'items':
+            return 'show', ()
+        if what.startswith('items page '):
+            return 'show', (what[11:],)
+        if what.startswith('items from '):
+            return 'show', (what[11:],)
+        return 'show', (what,)
+    if cmd.startswith('add'):
+        return 'add', tuple(cmd[4:].split(': '))
+    if cmd.startswith('del'):
+        return 'del', (cmd[4:],)
+    if cmd.startswith('stats'):
+        return 'stats', (cmd[6:],)
+    return 'invalid', (cmd,)
+
+
+def main(count=200000):
+    """print the time per line of both dispatchers"""
+    lines = make_lines(count)
+    no_memo = CommandRegistry(COMMANDS.invalid, COMMANDS.commands,
+                              cache_size=0)
+    for label, route in (('if/elif chain', legacy_route),
+                         ('registry', COMMANDS.resolve),
+                         ('no memo', no_memo.resolve)):
+        best = min(timeit.repeat(lambda: [route(line) for line in lines],
+                                 number=1, repeat=5))
+        print(f'{label:14} {best / count * 1e9:8.1f} ns per line')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""benchmark of the memory taken by many shopping lists
+
+builds the same lists (from one generate_lists batch) as ShoppingList
+objects holding (Item, quantity) tuples and as CompactShoppingList
+objects holding a row array and a quantity array, and prints the bytes
+allocated per list (measured with tracemalloc, the Items of the pool
+being shared by both) and the time to total every list
+
+run with: python benchmarks/bench_list_memory.py [lists] [lines]"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from shoppinglistapp.core.batch import generate_lists
+from shoppinglistapp.core.items import Item, ItemPool
+
+
+def measure(build, count):
+    """build count lists, return them with the bytes they take"""
+    gc.collect()
+    tracemalloc.start()
+    lists = [build(i) for i in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return lists, size
+
+
+def main(count=1000000, lines=10):
+    """print bytes per list and total time of both layouts"""
+    pool = ItemPool({f'item{i}': Item(f'item{i}', f'{i % 500 + 1}.99')
+                     for i in range(1000)})
+    batch = generate_lists(pool, count, lines, seed=1)
+    for label, build in (('ShoppingList', batch.get_list),
+                         ('CompactShoppingList', batch.get_compact)):
+        lists, size = measure(build, count)
+        start = time.perf_counter()
+        for shopping_list in lists:
+            shopping_list.get_total_price()
+        elapsed = time.perf_counter() - start
+        print(f'{label:20} {size / count:8.1f} bytes per list '
+              f'({size / 2 ** 20:7.1f} MiB), totals in {elapsed:.2f} s')
+        del lists
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
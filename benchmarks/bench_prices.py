@@ -0,0 +1,57 @@
+"""microbenchmark of price parsing: the old split-based validation that
+was copied into Item, process_add_item and process_answer against the
+shared parser in core/prices.py
+
+run with: python benchmarks/bench_prices.py"""
+import random
+import timeit
+
+from shoppinglistapp.core.prices import parse_price, parse_prices
+
+
+def legacy_parse(price):
+    """the split-on-'.' validation as it was written in process_answer"""
+    if (isinstance(price, str) and '.' in price):
+        split = price.split('.')
+        if len(split) > 2:
+            answer = None
+        elif not split[0].isdigit():
+            answer = None
+        elif (not split[1].isdigit()) or (int(split[1]) < 0):
+            answer = None
+        else:
+            answer = round(float(price), 2)
+    elif (isinstance(price, str) and not price.isdigit()):
+        answer = None
+    else:
+        answer = round(float(price), 2)
+    return answer
+
+
+def make_prices(count, seed=0):
+    """mostly valid prices with a few malformed ones mixed in"""
+    rng = random.Random(seed)
+    values = [f'{rng.randint(0, 9999)}.{rng.randint(0, 99):02}'
+              for _ in range(count)]
+    for i in range(0, count, 20):
+        values[i] = rng.choice(['3.2.6', 'm.2', '2.m', 'price', '17'])
+    return values
+
+
+def main(count=100000, repeat=5):
+    """print the best time per price of each parser"""
+    values = make_prices(count)
+    assert [legacy_parse(v) for v in values] == \
+        [parse_price(v) for v in values]
+    timings = {
+        'legacy split': lambda: [legacy_parse(v) for v in values],
+        'parse_price': lambda: [parse_price(v) for v in values],
+        'parse_prices': lambda: parse_prices(values),
+    }
+    for name, func in timings.items():
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f'{name:<14} {best / count * 1e9:8.1f} ns/price')
+
+
+if __name__ == '__main__':
+    main()
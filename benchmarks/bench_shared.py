@@ -0,0 +1,87 @@
+"""benchmark of a pool shared by worker processes
+
+publishes a pool once to shared memory, then starts worker processes
+that either attach to it (SharedItemPool) or build their own ItemPool
+of the same items, draw shopping lists and render a page of items. for
+each setup it prints the python heap every worker allocated for its
+pool (tracemalloc) and the time it took to get the pool ready. the
+workers run at the same time, so with fewer cores than workers the
+ready times include waiting for a core
+
+run with: python benchmarks/bench_shared.py [items] [workers]"""
+import multiprocessing
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from shoppinglistapp.app_cli import AppCLI
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.shared import SharedItemPool, SharedPoolPublisher
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+NAME = f'slbench{os.getpid()}'
+
+
+def make_pool(count):
+    """the pool every setup serves"""
+    return ItemPool({f'item{i:08}': Item.from_cents(f'item{i:08}',
+                                                    i % 99999 + 1)
+                     for i in range(count)})
+
+
+def get_pool(setup, count):
+    """the pool of a worker"""
+    return SharedItemPool(NAME) if setup == 'shared' else make_pool(count)
+
+
+def work(setup, count):
+    """one worker: get a pool, use it, report (seconds, heap bytes)
+
+    the pool is got twice: once timed, once under tracemalloc (which
+    slows every allocation down several times)"""
+    start = time.perf_counter()
+    pool = get_pool(setup, count)
+    elapsed = time.perf_counter() - start
+    if setup == 'shared':
+        pool.close()
+    del pool
+    tracemalloc.start()
+    pool = get_pool(setup, count)
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rng = random.Random(os.getpid())
+    app = AppCLI(ShoppingList(), pool)
+    for _ in range(100):
+        app.app_engine.shopping_list.refresh(pool, 10, rng=rng)
+        app.show_list()
+    app.execute_command('show items page 2')
+    ''.join(app.app_engine.message)
+    if setup == 'shared':
+        pool.close()
+    return elapsed, heap
+
+
+def main(count=200000, workers=4):
+    """print the per-worker cost of both setups"""
+    publisher = SharedPoolPublisher(NAME)
+    try:
+        pool = make_pool(count)
+        start = time.perf_counter()
+        publisher.publish(pool)
+        print(f'publish {count} items: {time.perf_counter() - start:.2f} s')
+        del pool
+        with multiprocessing.Pool(workers) as processes:
+            for setup in ('shared', 'own pool'):
+                results = processes.starmap(work, [(setup, count)] * workers)
+                seconds = max(elapsed for elapsed, _ in results)
+                heap = sum(heap for _, heap in results) / workers
+                print(f'{setup:9} {heap / 2 ** 20:9.1f} MiB per worker, '
+                      f'ready in {seconds:.2f} s')
+    finally:
+        publisher.close()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
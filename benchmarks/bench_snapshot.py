@@ -0,0 +1,47 @@
+"""benchmark of a warm restart from a msgpack snapshot
+
+compares rebuilding an ItemPool item by item (Item() and add_item, what
+a restart does today) with write_snapshot and read_snapshot
+
+run with: python benchmarks/bench_snapshot.py [items]"""
+import os
+import sys
+import tempfile
+import time
+
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.shoppinglist import ShoppingList
+from shoppinglistapp.core.snapshot import read_snapshot, write_snapshot
+
+
+def rebuild(rows):
+    """build the pool the way the app does it without a snapshot"""
+    pool = ItemPool()
+    for name, price in rows:
+        pool.add_item(Item(name, price))
+    return pool
+
+
+def main(count=1000000):
+    """print the time of each way to get a pool of count items back"""
+    rows = [(f'item{i:08}', f'{i % 99999 + 1}.{i % 100:02}')
+            for i in range(count)]
+    start = time.perf_counter()
+    pool = rebuild(rows)
+    print(f'rebuild with add_item  {time.perf_counter() - start:8.2f} s')
+    shopping_list = ShoppingList(size=20, item_pool=pool)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.snap')
+        start = time.perf_counter()
+        write_snapshot(path, pool, shopping_list,
+                       shopping_list.get_total_price())
+        print(f'write_snapshot         {time.perf_counter() - start:8.2f} s '
+              f'({os.path.getsize(path) / 2 ** 20:.1f} MiB)')
+        start = time.perf_counter()
+        snapshot = read_snapshot(path)
+        print(f'read_snapshot          {time.perf_counter() - start:8.2f} s')
+        assert snapshot.item_pool.get_size() == count
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
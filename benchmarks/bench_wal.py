@@ -0,0 +1,51 @@
+"""benchmark of the write-ahead log of DurableItemPool
+
+times add/del pairs on a plain ItemPool (nothing kept), on a durable
+pool that fsyncs every change (commit window 0) and on durable pools
+with group commit, and how long a background compaction and a recovery
+of the directory take
+
+run with: python benchmarks/bench_wal.py [changes]"""
+import sys
+import tempfile
+import time
+
+from shoppinglistapp.core.durable import DurableItemPool
+from shoppinglistapp.core.items import Item, ItemPool
+
+
+def churn(pool, count):
+    """count changes: adds, each followed by the del of the same item"""
+    start = time.perf_counter()
+    for i in range(count // 2):
+        pool.add_item(Item(f'item{i}', '3.25'))
+        pool.remove_item(f'item{i}')
+    return time.perf_counter() - start
+
+
+def main(count=20000):
+    """print the changes per second of every setup"""
+    elapsed = churn(ItemPool(), count)
+    print(f'{"in memory":24} {count / elapsed:10.0f} changes/s')
+    for window in (0, 0.001, 0.01):
+        with tempfile.TemporaryDirectory() as tmp:
+            pool = DurableItemPool(tmp, commit_window=window)
+            changes = count if window else count // 20
+            elapsed = churn(pool, changes)
+            pool.sync()
+            print(f'{"commit window " + str(window) + " s":24} '
+                  f'{changes / elapsed:10.0f} changes/s, '
+                  f'{pool.wal.syncs} fsyncs')
+            pool.add_items([Item(f'row{i}', '1.25') for i in range(count)])
+            start = time.perf_counter()
+            pool.compact(wait=True)
+            compacted = time.perf_counter() - start
+            pool.close()
+            start = time.perf_counter()
+            DurableItemPool(tmp).close()
+            print(f'{"":24} compaction {compacted:.2f} s, '
+                  f'recovery {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,91 @@
+"""load-test client for the asyncio AppServer
+
+opens many concurrent sessions against a server (an in-process one over
+a generated pool by default, or --host/--port of a running one), sends a
+realistic command mix on every session and reports the throughput and
+the latency percentiles of the replies
+
+run with: python benchmarks/load_server.py --sessions 2000 --commands 20"""
+import argparse
+import asyncio
+import random
+import time
+
+from shoppinglistapp.core.columnar import ColumnarItemPool
+from shoppinglistapp.core.items import Item
+from shoppinglistapp.server import AppServer, read_reply
+
+COMMAND_MIX = ['list', 'show list', 'ask', 'show items page 1', 'add']
+
+
+async def run_session(host, port, commands, seed, latencies):
+    """one client: list first, then a random mix, answering every ask
+
+    every add is followed by the del of the same item, so the pool (and
+    with it the size of the random lists) stays the same during the run"""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        cmd = 'list'
+        for i in range(commands):
+            start = time.perf_counter()
+            writer.write(cmd.encode('utf-8') + b'\n')
+            await writer.drain()
+            reply = await read_reply(reader)
+            latencies.append(time.perf_counter() - start)
+            if reply is None:
+                return
+            if cmd == 'ask':
+                cmd = '1.00'
+            elif cmd.startswith('add '):
+                cmd = f'del s{seed}-{i - 1}'
+            else:
+                cmd = rng.choice(COMMAND_MIX)
+                if cmd == 'add':
+                    cmd = f'add s{seed}-{i}: 1.25'
+        writer.write(b'quit\n')
+        await writer.drain()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def percentile(values, fraction):
+    """the value below which fraction of the sorted values fall"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def main(args):
+    """start the sessions, wait for all of them and print the report"""
+    server = None
+    host, port = args.host, args.port
+    if port is None:
+        pool = ColumnarItemPool()
+        pool.add_items([Item(f'item{i}', f'{i % 500 + 1}.99')
+                        for i in range(args.pool_size)])
+        server = AppServer(pool, max_sessions=args.sessions + 1)
+        port = await server.start()
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(host, port, args.commands, seed,
+                                       latencies)
+                           for seed in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f'{args.sessions} sessions, {len(latencies)} commands '
+          f'in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} commands/s')
+    for fraction in (0.5, 0.9, 0.99, 0.999):
+        print(f'p{fraction * 100:g}: '
+              f'{percentile(latencies, fraction) * 1000:.2f} ms')
+    if server is not None:
+        await server.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--commands', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,42 @@
+"""replay a command journal recorded with app_cli.py --journal
+
+re-runs the commands against a fresh app over the pool the recording
+started from (the same --catalog or --snapshot, the usage example pool
+by default), back to back or at the recorded pacing, and reports the
+throughput and the commands whose message differs from the recorded one
+
+run with: python benchmarks/replay_journal.py session.journal [--paced]"""
+import argparse
+
+from shoppinglistapp.app_cli import AppCLI, example_pool
+from shoppinglistapp.core.catalog import MappedItemPool
+from shoppinglistapp.core.journal import read_journal, replay
+from shoppinglistapp.core.snapshot import read_snapshot
+
+
+def main():
+    """replay the journal and print the report"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('journal')
+    parser.add_argument('--catalog', help='pool from a catalog file')
+    parser.add_argument('--snapshot', help='pool from a snapshot file')
+    parser.add_argument('--paced', action='store_true',
+                        help='keep the recorded time between commands')
+    parser.add_argument('--show', type=int, default=10,
+                        help='divergences to list')
+    args = parser.parse_args()
+    if args.snapshot:
+        pool = read_snapshot(args.snapshot).item_pool
+    elif args.catalog:
+        pool = MappedItemPool(args.catalog)
+    else:
+        pool = example_pool()
+    journal = read_journal(args.journal)
+    report = replay(journal, AppCLI(None, pool), paced=args.paced)
+    print(report)
+    for divergence in report.divergences[:args.show]:
+        print(f'  {divergence}')
+
+
+if __name__ == '__main__':
+    main()
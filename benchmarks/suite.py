@@ -0,0 +1,263 @@
+"""benchmark suite of the core hot paths across pool sizes
+
+every case is timed at pool sizes 10, 100, ... up to --max-size and
+reported as seconds per call. the table shows the curve of every case
+and its growth exponent (log of the time ratio over log of the size
+ratio, between the last two sizes): about 0 for work independent of the
+pool size, about 1 for linear work. a case growing clearly faster than
+it should is flagged, which is how something going quadratic shows up
+
+results can be written as JSON with --output and compared with an older
+results file with --baseline; a case slower than the baseline by more
+than --threshold (a fraction, 0.25 = 25%) is reported as a regression
+and the exit status is 1
+
+benchmarks/baseline.json holds the results of the suite at
+--max-size 100000 (its python and machine fields say where they were
+taken). timings only compare on the same machine: before gating on it
+elsewhere, write a fresh baseline on that machine from a known good
+commit with --max-size 100000 --output benchmarks/baseline.json, then
+check later commits with --max-size 100000 --baseline
+benchmarks/baseline.json
+
+a pool of 10^7 items needs about 4 GB of memory and a minute to build
+
+run with: python benchmarks/suite.py [--max-size N] [--cases a,b]
+          [--output new.json] [--baseline old.json] [--threshold 0.25]"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+
+from shoppinglistapp.app_cli import AppCLI
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.prices import parse_price
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+
+class Case:
+    """one timed call, set up against the pool of a given size
+
+    growth is the expected exponent of the time per call in the pool
+    size; max_size stops cases whose calls get too slow (or do not
+    depend on the pool at all) from running at every size"""
+    def __init__(self, name, setup, growth=0, max_size=None):
+        self.name = name
+        self.setup = setup
+        self.growth = growth
+        self.max_size = max_size
+
+
+class Context:
+    """the pool, shopping list and app shared by the cases of one size"""
+    def __init__(self, size):
+        self.size = size
+        self.pool = ItemPool()
+        self.pool.add_items([
+            Item(f'item{i:08}', Money(i * 7919 % 99999 + 1))
+            for i in range(size)])
+        self.rng = random.Random(0)
+        self.shopping_list = ShoppingList()
+        self.app = AppCLI(self.shopping_list, self.pool)
+        self.sink = open(os.devnull, 'w', encoding='utf-8')
+
+    def full_list(self):
+        """fill the shopping list with one line per pool item"""
+        self.shopping_list.refresh(self.pool, self.size, rng=self.rng)
+
+
+def _add_remove(ctx):
+    item = Item('item_bench', '1.00')
+
+    def call():
+        ctx.pool.add_item(item)
+        ctx.pool.remove_item('item_bench')
+    return call
+
+
+def _weighted_refresh(ctx):
+    ctx.pool.set_weights({name: 1 + row % 7 for row, name
+                          in enumerate(ctx.pool.names)})
+
+    def call():
+        ctx.shopping_list.refresh(ctx.pool, min(ctx.size, 10), rng=ctx.rng,
+                                  weighted=True)
+    return call
+
+
+def _total_price(ctx):
+    ctx.full_list()
+    return ctx.shopping_list.get_total_price
+
+
+def _edit_list(ctx):
+    ctx.full_list()
+    quantities = itertools.cycle(range(1, 10))
+
+    def call():
+        ctx.shopping_list.set_quantity(0, next(quantities))
+        return ctx.shopping_list.get_total_price()
+    return call
+
+
+def _show_list(ctx):
+    ctx.full_list()
+    return lambda: ctx.app.show_list(mask_index=0)
+
+
+def _round_trip(ctx):
+    ctx.shopping_list.refresh(ctx.pool, min(ctx.size, 10), rng=ctx.rng)
+    commands = itertools.cycle(['add item_bench: 1.00', 'show items page 1',
+                                'del item_bench', 'show list', 'ask',
+                                '1.00'])
+
+    def call():
+        ctx.app.execute_command(next(commands))
+        ctx.app.write_message(ctx.sink)
+    return call
+
+
+CASES = [
+    Case('item_init', lambda ctx: lambda: Item('bread', '3.25'),
+         max_size=10),
+    Case('parse_price', lambda ctx: lambda: parse_price('1234.56'),
+         max_size=10),
+    Case('pool_add_remove', _add_remove),
+    Case('pool_sample_10',
+         lambda ctx: lambda: ctx.pool.sample_items(min(ctx.size, 10),
+                                                   ctx.rng)),
+    Case('cheapest_10', lambda ctx: lambda: ctx.pool.cheapest(10)),
+    Case('list_refresh_10',
+         lambda ctx: lambda: ctx.shopping_list.refresh(
+             ctx.pool, min(ctx.size, 10), rng=ctx.rng)),
+    Case('list_weighted_10', _weighted_refresh),
+    Case('list_total_price', _total_price, max_size=10 ** 5),
+    Case('list_edit_total', _edit_list, max_size=10 ** 5),
+    Case('show_items', lambda ctx: ctx.app.show_items, growth=1,
+         max_size=10 ** 6),
+    Case('show_list', _show_list, growth=1, max_size=10 ** 5),
+    Case('command_round_trip', _round_trip),
+]
+
+
+def time_call(call, repeat=3):
+    """best seconds per call over repeat runs of about 0.2 s each"""
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def run(cases, max_size):
+    """time every case at every size, {case: {size: seconds}}"""
+    results = {case.name: {} for case in cases}
+    size = 10
+    while size <= max_size:
+        started = time.perf_counter()
+        ctx = Context(size)
+        built = time.perf_counter() - started
+        print(f'size {size:>9}: pool built in {built:.1f}s',
+              file=sys.stderr)
+        for case in cases:
+            if case.max_size is None or size <= case.max_size:
+                results[case.name][str(size)] = time_call(case.setup(ctx))
+        ctx.sink.close()
+        del ctx
+        size *= 10
+    return results
+
+
+def growth(curve):
+    """growth exponent between the two largest sizes of a curve"""
+    points = sorted((int(size), seconds) for size, seconds in curve.items())
+    if len(points) < 2:
+        return None
+    (size_a, time_a), (size_b, time_b) = points[-2:]
+    return math.log(time_b / time_a) / math.log(size_b / size_a)
+
+
+def _cell(seconds):
+    """seconds per call in the unit that keeps the column narrow"""
+    for unit, scale in (('us', 1e6), ('ms', 1e3)):
+        if seconds * scale < 10000:
+            return f'{seconds * scale:>9.2f}{unit}'
+    return f'{seconds:>10.2f}s'
+
+
+def report(cases, results):
+    """print the curves as a table, return the names of flagged cases"""
+    sizes = sorted({int(size) for curve in results.values()
+                    for size in curve})
+    print(f'{"case":20}' + ''.join(f'{size:>11}' for size in sizes) +
+          '   growth')
+    flagged = []
+    for case in cases:
+        curve = results[case.name]
+        cells = ''.join(
+            _cell(curve[str(size)]) if str(size) in curve
+            else ' ' * 11 for size in sizes)
+        exponent = growth(curve)
+        note = ''
+        if exponent is not None:
+            note = f'{exponent:>8.2f}'
+            if exponent > case.growth + 0.5:
+                note += f'  faster than expected ({case.growth})'
+                flagged.append(case.name)
+        print(f'{case.name:20}{cells}{note}')
+    return flagged
+
+
+def compare(results, baseline, threshold):
+    """list (case, size, old, new) of calls slower than the baseline"""
+    regressions = []
+    for name, curve in results.items():
+        old_curve = baseline.get(name, {})
+        for size, seconds in curve.items():
+            old = old_curve.get(size)
+            if old and seconds > old * (1 + threshold):
+                regressions.append((name, size, old, seconds))
+    return regressions
+
+
+def main(argv=None):
+    """run the suite, print the table, write and compare results"""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--max-size', type=int, default=10 ** 7)
+    parser.add_argument('--cases', help='comma separated case names')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args(argv)
+    cases = CASES
+    if args.cases:
+        wanted = args.cases.split(',')
+        cases = [case for case in CASES if case.name in wanted]
+    results = run(cases, args.max_size)
+    report(cases, results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'results': results}, stream, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as stream:
+            baseline = json.load(stream)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, old, new in regressions:
+            print(f'REGRESSION {name} at {size}: {old * 1e6:.2f}us -> '
+                  f'{new * 1e6:.2f}us ({new / old - 1:+.0%})')
+        if regressions:
+            return 1
+        print(f'no regression above {args.threshold:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,6 +29,9 @@ def test_invalid_item_init():
         Item('bread', '2.f')
     with pytest.raises(InvalidItemPriceError):
         Item('bread', '2.-1')
+    for price in (float('inf'), float('nan'), True):
+        with pytest.raises(InvalidItemPriceError):
+            Item('bread', price)
     with pytest.raises(InvalidItemNameError):
         Item(3, 3.25)
     with pytest.raises(InvalidItemPoolError):
@@ -181,6 +184,17 @@ def test_app_engine_process_answer_6():
     ae.process_answer(3.20)
     assert ae.message == ('Not Correct! (Expected $3.24)\nYou answered $3.20.')
 
+def test_app_engine_process_answer_7():
+    ae = AppEngine()
+    ae.correct_answer = 3.24
+    ae.process_answer('-3.24')
+    assert ae.message == 'Your answer ("-3.24") is not a number.'
+    assert ae.status == 'error' and ae.correct_answer is None
+    ae.process_answer(-2)
+    assert ae.message == 'Your answer ("-2") is not a number.'
+    ae.process_answer(float('nan'))
+    assert ae.message == 'Your answer ("nan") is not a number.'
+
 def test_process_add_item_1():
     ip = ItemPool(items = {'bread' : Item('bread', 3.25)})
     ae = AppEngine(items=ip)
@@ -257,4 +271,1006 @@ def test_process_del_item_2():
     ip = ItemPool(items = {'Bread' : Item('Bread', 3.25), 'Milk' : Item('Milk', 2.15)})
     ae = AppEngine(items=ip)
     ae.process_del_item('del Jam')
-    assert ae.message == 'Item named "Jam" is not present in the item pool.'
\ No newline at end of file
+    assert ae.message == 'Item named "Jam" is not present in the item pool.'
+
+def test_columnar_item_pool():
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    ip = ColumnarItemPool(items = {'bread' : Item('bread', 3.25)})
+    ip.add_item(Item('milk', 2.15))
+    ip.add_item(Item('jam', 4.5))
+    ip.remove_item('bread')
+    assert ip.get_size() == 2
+    assert ip.get_item('jam') == Item('jam', 4.5)
+    assert 'bread' not in ip and 'bread' not in ip.items
+    assert ip == ItemPool(items = {'milk' : Item('milk', 2.15),
+                                   'jam' : Item('jam', 4.5)})
+    assert sorted(item.name for item in ip.sample_items(5)) == ['jam', 'milk']
+    with pytest.raises(DuplicateItemError):
+        ip.add_item(Item('milk', 1.0))
+    with pytest.raises(NonExistingItemError):
+        ip.remove_item('bread')
+
+
+def test_columnar_item_pool_compacts_names():
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    ip = ColumnarItemPool()
+    for i in range(10):
+        ip.add_item(Item(f'item{i}', i + 1))
+    for i in range(8):
+        ip.remove_item(f'item{i}')
+    assert len(ip.names) < 50 and len(ip.names) - ip.dead_bytes == 10
+    assert dict(ip.items) == {'item8': Item('item8', 9),
+                              'item9': Item('item9', 10)}
+    assert ip.get_memory_usage() > 0
+
+
+def test_incomplete_item_pool_backend_cannot_be_created():
+    from shoppinglistapp.core.items import BaseItemPool
+
+    class NoRows(BaseItemPool):
+        def __contains__(self, item_name):
+            return False
+
+        def get_item(self, item_name):
+            raise NonExistingItemError(item_name)
+
+    with pytest.raises(TypeError):
+        NoRows()
+
+
+def test_sample_indices_distinct_and_seeded():
+    import random
+    from shoppinglistapp.core.sampling import sample_indices
+    rows = sample_indices(1000, 50, random.Random(7))
+    assert len(set(rows)) == 50 and all(0 <= row < 1000 for row in rows)
+    assert rows == sample_indices(1000, 50, random.Random(7))
+    assert sorted(sample_indices(5, 10)) == [0, 1, 2, 3, 4]
+
+
+def test_item_pool_dense_index_after_remove():
+    import random
+    ip = ItemPool()
+    for i in range(6):
+        ip.add_item(Item(f'item{i}', i + 1))
+    ip.remove_item('item1')
+    ip.remove_item('item5')
+    assert sorted(ip.names) == ['item0', 'item2', 'item3', 'item4']
+    assert all(ip.names[row] == name for name, row in ip.rows.items())
+    sp1 = ShoppingList(size=3, item_pool=ip, rng=random.Random(3))
+    sp2 = ShoppingList(size=3, item_pool=ip, rng=random.Random(3))
+    assert sp1.list == sp2.list
+
+
+def test_pool_index_maxima_after_remove():
+    ip = ItemPool(items = {'bread' : Item('bread', 3.25)})
+    ip.add_item(Item('Macbook Pro', 1999.99))
+    ip.add_item(Item('jam', 45.0))
+    assert ip.sorted_names() == ['Macbook Pro', 'bread', 'jam']
+    assert (ip.max_name_length(), ip.max_order()) == (11, 3)
+    ip.remove_item('Macbook Pro')
+    assert ip.sorted_names() == ['bread', 'jam']
+    assert (ip.max_name_length(), ip.max_order()) == (5, 1)
+
+
+def test_show_items_uses_pool_index():
+    from shoppinglistapp.app_cli import AppCLI
+    ip = ItemPool(items = {'milk' : Item('milk', 2.15)})
+    ip.add_item(Item('bread', 13.25))
+    ip.add_item(Item('Macbook Pro', 1999.99))
+    ip.remove_item('Macbook Pro')
+    app = AppCLI(ShoppingList(), ip)
+    assert app.show_items() == ('ITEMS\n'
+                                '- bread ... $13.25\n'
+                                '- milk .... $02.15\n')
+
+
+def test_renderer_masks_one_line_of_cached_list():
+    from shoppinglistapp.app_cli import AppCLI
+    ip = ItemPool(items = {'bread' : Item('bread', 3.25),
+                           'milk' : Item('milk', 12.15)})
+    sp = ShoppingList()
+    sp.list = [(ip.items['bread'], 2), (ip.items['milk'], 1)]
+    app = AppCLI(sp, ip)
+    assert app.show_list() == ('SHOPPING LIST\n'
+                               '- bread (2x) ... $06.50\n'
+                               '- milk (1x) .... $12.15\n'
+                               '-----------------------\n'
+                               'TOTAL .......... $18.65\n')
+    cached = app.renderer.list_lines(sp)
+    assert app.show_list(mask_index=1).splitlines()[2] == \
+        '- milk (1x) .... $??.??'
+    assert app.show_list(mask_index=2).splitlines()[-1] == \
+        'TOTAL .......... $??.??'
+    assert app.renderer.list_lines(sp) is cached
+
+
+def test_renderer_item_cache_follows_pool_version():
+    import io
+    from shoppinglistapp.app_cli import AppCLI
+    ip = ItemPool(items = {'bread' : Item('bread', 3.25)})
+    app = AppCLI(ShoppingList(), ip)
+    assert app.show_items() == 'ITEMS\n- bread ... $3.25\n'
+    ip.add_item(Item('jam', 14.0))
+    app.execute_command('show items')
+    out = io.StringIO()
+    app.write_message(out)
+    assert out.getvalue() == ('ITEMS\n- bread ... $03.25\n'
+                              '- jam ..... $14.00\n\n\n')
+    assert app.app_engine.message is None
+
+
+def test_show_items_page_and_from():
+    from shoppinglistapp.app_cli import AppCLI
+    ip = ItemPool()
+    for name in ['fig', 'apple', 'kiwi', 'date', 'banana']:
+        ip.add_item(Item(name, 2.5))
+    app = AppCLI(ShoppingList(), ip, page_size=2)
+    app.process_show('show items page 2')
+    assert ''.join(app.app_engine.message) == ('ITEMS (page 2 of 3)\n'
+                                               '- date ..... $2.50\n'
+                                               '- fig ...... $2.50\n')
+    app.process_show('show items from cherry')
+    assert ''.join(app.app_engine.message) == ('ITEMS (from cherry)\n'
+                                               '- date ..... $2.50\n'
+                                               '- fig ...... $2.50\n')
+    app.process_show('show items page 4')
+    assert app.app_engine.message == 'Page "4" does not exist (pages 1-3).'
+    for page_size in (0, -1, 2.5, True):
+        with pytest.raises(ValueError):
+            AppCLI(ShoppingList(), ip, page_size=page_size)
+
+
+def test_run_batch_buffers_and_reports():
+    import io
+    from shoppinglistapp.app_cli import AppCLI
+    ip = ItemPool(items = {'bread' : Item('bread', 3.25)})
+    app = AppCLI(ShoppingList(), ip)
+    out = io.StringIO()
+    report = app.run_batch(io.StringIO('add jam: 4.10\nlist\ndel bread\n'
+                                       'del jam\nlist\nquit\nadd x: 1.0\n'),
+                           out=out, chunk_size=8)
+    assert (report.commands, report.errors) == (6, 1)
+    assert out.getvalue().startswith('jam (4.1) added successfully.\n\n')
+    assert 'Have a nice day!' in out.getvalue()
+    quiet_out = io.StringIO()
+    report = AppCLI(ShoppingList(), ip).run_batch(
+        ['add y: 1.50', 'add y: 1.50', 'add z: 2.00', 'add : 1.00'],
+        out=quiet_out, quiet=True)
+    assert (report.commands, report.errors) == (4, 2)
+    assert quiet_out.getvalue() == ''
+
+
+def test_import_csv_reports_row_errors():
+    import io
+    from shoppinglistapp.core.importer import import_csv
+    ip = ItemPool(items = {'bread' : Item('bread', 3.25)})
+    data = ('name,price\nmilk,2.15\nbread,1.00\n,4.00\njam,-1\n'
+            'tea,1.5,x\nmilk,2.20\negg,0.30\n')
+    result = import_csv(ip, io.StringIO(data), batch_size=2)
+    assert (result.rows, result.added, result.error_count) == (7, 2, 5)
+    assert [(line, kind) for line, kind, _ in result.errors] == [
+        (3, 'duplicate'), (4, 'invalid name'), (5, 'invalid price'),
+        (6, 'malformed row'), (7, 'duplicate')]
+    assert ip.sorted_names() == ['bread', 'egg', 'milk']
+
+
+def test_import_jsonl_bulk_inserts():
+    import io
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    from shoppinglistapp.core.importer import import_jsonl
+    lines = ''.join(f'{{"name": "item{i}", "price": {i + 1}.5}}\n'
+                    for i in range(50)) + 'not json\n'
+    ip = ColumnarItemPool()
+    result = import_jsonl(ip, io.StringIO(lines), batch_size=16)
+    assert (result.rows, result.added, result.error_count) == (51, 50, 1)
+    assert ip.get_size() == 50 and ip.max_order() == 1
+    assert ip.sorted_names()[:2] == ['item0', 'item1']
+
+
+def test_import_jsonl_rejects_non_finite_and_bool_prices():
+    import io
+    from shoppinglistapp.core.importer import import_jsonl
+    lines = ('{"name": "milk", "price": 2.15}\n'
+             '{"name": "tea", "price": NaN}\n'
+             '{"name": "jam", "price": 1e999}\n'
+             '{"name": "egg", "price": 1e30}\n'
+             '{"name": "oat", "price": true}\n'
+             '{"name": "rice", "price": 3}\n')
+    ip = ItemPool()
+    result = import_jsonl(ip, io.StringIO(lines))
+    assert (result.rows, result.added, result.error_count) == (6, 2, 4)
+    assert [(line, kind) for line, kind, _ in result.errors] == [
+        (2, 'invalid price'), (3, 'invalid price'), (4, 'invalid price'),
+        (5, 'invalid price')]
+    assert ip.sorted_names() == ['milk', 'rice']
+
+
+def test_sorted_blocks_keep_order_across_blocks():
+    import random
+    from shoppinglistapp.core.index import SortedBlocks
+
+    class SmallBlocks(SortedBlocks):
+        BLOCK = 4
+    rng = random.Random(5)
+    values = rng.sample(range(1000), 200)
+    blocks = SmallBlocks(values[:100])
+    for value in values[100:110]:
+        blocks.add(value)
+    blocks.extend(values[110:120])
+    blocks.extend(values[120:])
+    for value in values[:50]:
+        blocks.remove(value)
+    flat = sorted(values[50:])
+    assert list(blocks) == flat and len(blocks) == 150
+    assert len(blocks.blocks) > 1
+    assert blocks.slice(7, 30) == flat[7:30]
+    assert blocks.slice(140, 200) == flat[140:]
+    assert [blocks.position(value) for value in (-1, flat[33], 1000)] == \
+        [0, 33, 150]
+
+
+def test_mapped_item_pool_reads_catalog(tmp_path):
+    import random
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    ip = ItemPool()
+    for i in range(20):
+        ip.add_item(Item(f'item{i:02}', i + 1.25))
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ip, path)
+    mp = MappedItemPool(path)
+    assert mp == ip and mp.get_size() == 20
+    assert mp.get_item('item07') == Item('item07', 8.25)
+    assert 'item20' not in mp
+    assert (mp.max_name_length(), mp.max_order()) == (6, 1)
+    assert mp.sorted_names_slice(3, 5) == ['item03', 'item04']
+    assert mp.sorted_position('item10') == 10
+    sample = mp.sample_items(5, random.Random(1))
+    assert len({item.name for item in sample}) == 5
+    mp.close()
+
+
+def test_mapped_item_pool_overlay_and_compact(tmp_path):
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ItemPool(items = {'bread' : Item('bread', 3.25),
+                                    'milk' : Item('milk', 2.15)}), path)
+    mp = MappedItemPool(path)
+    mp.add_item(Item('jam', 4.5))
+    mp.remove_item('milk')
+    with pytest.raises(DuplicateItemError):
+        mp.add_item(Item('jam', 1.0))
+    with pytest.raises(NonExistingItemError):
+        mp.remove_item('milk')
+    assert list(mp.sorted_names()) == ['bread', 'jam']
+    assert mp.sorted_position('jam') == 1
+    assert {item.name for item in mp.sample_items(2)} == {'bread', 'jam'}
+    assert AppCLI(ShoppingList(), mp).show_items() == ('ITEMS\n'
+                                                       '- bread ... $3.25\n'
+                                                       '- jam ..... $4.50\n')
+    mp.compact()
+    assert (mp.reader.count, mp.deleted, mp.added.get_size()) == (2, set(), 0)
+    assert mp == ItemPool(items = {'bread' : Item('bread', 3.25),
+                                   'jam' : Item('jam', 4.5)})
+    mp.close()
+
+
+def test_mapped_item_pool_pages_after_changes(tmp_path):
+    import random
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    rng = random.Random(6)
+    ip = ItemPool({f'item{i:03}': Item(f'item{i:03}', '1.25')
+                   for i in range(0, 400, 2)})
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ip, path)
+    mp = MappedItemPool(path)
+    removed = rng.sample(sorted(ip.items), 60)
+    for name in removed:
+        ip.remove_item(name)
+        mp.remove_item(name)
+    for i in rng.sample(range(1, 400, 2), 50) + [999]:
+        ip.add_item(Item(f'item{i:03}', '2.50'))
+        mp.add_item(Item(f'item{i:03}', '2.50'))
+    names = ip.sorted_names()
+    for start in (0, 1, 57, 130, 185, 189, 300):
+        assert mp.sorted_names_slice(start, start + 10) == \
+            names[start:start + 10]
+    assert mp.sorted_names_slice(185, 185) == []
+    for name in names[::7] + removed[:5] + ['a', 'item9999', 'zzz']:
+        assert mp.sorted_position(name) == ip.sorted_position(name)
+    live = sorted(set(mp.reader.name_at(row)
+                      for row in range(mp.reader.count)) - set(removed))
+    assert [mp.item_at(row).name for row in range(len(live))] == live
+    assert mp.item_at(len(live)).price == 2.5
+    mp.close()
+
+
+def test_mapped_item_pool_compact_shrinks_column_maxima(tmp_path):
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ItemPool(items = {'bread' : Item('bread', 3.25),
+                                    'Macbook Pro' : Item('Macbook Pro',
+                                                         1999.99),
+                                    'a' : Item('a', 1.5)}), path)
+    mp = MappedItemPool(path)
+    mp.remove_item('Macbook Pro')
+    mp.compact()
+    mp.close()
+    mp = MappedItemPool(path)
+    assert (mp.max_name_length(), mp.max_order()) == (5, 0)
+    assert AppCLI(ShoppingList(), mp).show_items() == ('ITEMS\n'
+                                                       '- a ....... $1.50\n'
+                                                       '- bread ... $3.25\n')
+    mp.close()
+
+
+def test_sqlite_item_pool(tmp_path):
+    import random
+    from shoppinglistapp.core.sqlitepool import SQLiteItemPool
+    ip = SQLiteItemPool(str(tmp_path / 'items.db'), readers=2)
+    ip.add_items([Item(f'item{i}', i + 0.5) for i in range(10)])
+    ip.add_item(Item('Macbook Pro', 1999.99))
+    with pytest.raises(DuplicateItemError):
+        ip.add_items([Item('new', 1.0), Item('item3', 1.0)])
+    assert 'new' not in ip
+    ip.remove_item('item0')
+    with pytest.raises(NonExistingItemError):
+        ip.remove_item('item0')
+    assert ip.get_size() == 10
+    assert sorted(ip.item_at(row).name for row in range(10)) == \
+        sorted(name for name, _ in ip.iter_items())
+    assert (ip.max_name_length(), ip.max_order()) == (11, 3)
+    assert ip.sorted_names_slice(0, 2) == ['Macbook Pro', 'item1']
+    assert ip.sorted_position('item2') == 2
+    assert len({i.name for i in ip.sample_items(4, random.Random(2))}) == 4
+    sp = ShoppingList(size=3, item_pool=ip)
+    assert len(sp) == 3
+    ip.close()
+
+
+def test_parse_price_and_batch():
+    from shoppinglistapp.core.prices import parse_price, parse_prices
+    assert parse_price('3') == 3.0 and parse_price('3.256') == 3.26
+    assert parse_price('-1') == -1.0 and parse_price(2.5) == 2.5
+    for text in ['3.2.6', 'm.2', '2.m', '2.-1', '.5', '5.', '1e3', 'inf']:
+        assert parse_price(text) is None
+    values, errors = parse_prices(['1.50', 'x', '2', None])
+    assert list(values) == [150, 0, 200, 0]
+    assert list(errors) == [0, 1, 0, 1]
+    assert Item('bread', '3') == Item('bread', 3.0)
+
+
+def test_money_is_exact_integer_cents():
+    from shoppinglistapp.core.money import Money
+    from shoppinglistapp.core.prices import parse_price
+    assert parse_price('0.1') + parse_price('0.2') == parse_price('0.3')
+    assert parse_price('2.675').cents == 268
+    assert str(Money(-5)) == '-0.05' and f'{Money(325):0>7.2f}' == '0003.25'
+    ip = ItemPool(items = {'a' : Item('a', '0.10'), 'b' : Item('b', '0.20')})
+    sp = ShoppingList()
+    sp.list = [(ip.items['a'], 3), (ip.items['b'], 1)]
+    assert sp.get_total_price().cents == 50
+    assert sp.get_item_price(0) == Money(30)
+    ae = AppEngine(items=ip)
+    ae.correct_answer = sp.get_total_price()
+    ae.process_answer('0.5')
+    assert ae.message == 'Correct!'
+
+
+def test_money_equals_and_hashes_like_numbers():
+    from shoppinglistapp.core.money import Money
+    for money, number in [(Money(150), 1.5), (Money(324), 3.24),
+                          (Money(300), 3), (Money(-5), -0.05)]:
+        assert money == number and hash(money) == hash(number)
+    assert Money(30) != 0.1 + 0.2 and Money(30) < 0.1 + 0.2
+    assert len({Money(150), 1.5, Money(150)}) == 1
+    assert {Money(300): 'a'}[3] == 'a'
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_generate_lists_batch(use_numpy):
+    from shoppinglistapp.core import batch
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    if use_numpy and batch.np is None:
+        pytest.skip('numpy is not installed')
+    ip = ColumnarItemPool()
+    for i in range(30):
+        ip.add_item(Item(f'item{i}', f'{i + 1}.05'))
+    lists = batch.generate_lists(ip, 200, 5, seed=4, use_numpy=use_numpy)
+    assert len(lists) == 200
+    for i in (0, 57, 199):
+        sp = lists.get_list(i)
+        assert len(sp) == 5 and len({item.name for item, _ in sp.list}) == 5
+        assert all(1 <= qnt <= 9 for _, qnt in sp.list)
+        assert lists.get_total_price(i) == sp.get_total_price()
+    again = batch.generate_lists(ip, 200, 5, seed=4, use_numpy=use_numpy)
+    assert list(again.totals) == list(lists.totals)
+    with pytest.raises(InvalidShoppingListSizeError):
+        batch.generate_lists(ip, 10, 31)
+
+
+def test_batch_is_pinned_to_the_pool_it_was_drawn_from():
+    from shoppinglistapp.core.batch import generate_lists
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    from shoppinglistapp.core.errors import StaleShoppingListError
+    ip = ItemPool({f'item{i}': Item(f'item{i}', f'{i + 1}.05')
+                   for i in range(20)})
+    lists = generate_lists(ip, 10, 5, seed=3, use_numpy=False)
+    ip.update_price('item3', '9.99')
+    lists.get_list(0)
+    ip.remove_item('item0')
+    with pytest.raises(StaleShoppingListError):
+        lists.get_list(0)
+    with pytest.raises(StaleShoppingListError):
+        lists.get_compact(0)
+    shared = ConcurrentItemPool(ip.items)
+    lists = generate_lists(shared, 10, 5, seed=3, use_numpy=False)
+    for name in list(ip.items)[:10]:
+        shared.remove_item(name)
+    for i in range(10):
+        assert lists.get_list(i).get_total_price() == lists.get_total_price(i)
+        assert list(lists.get_compact(i)) == lists.get_list(i).list
+
+
+def test_numpy_rows_are_distinct_near_half_the_pool(monkeypatch):
+    from shoppinglistapp.core import batch
+    if batch.np is None:
+        pytest.skip('numpy is not installed')
+    generator = batch.np.random.default_rng(2)
+    monkeypatch.setattr(batch, 'DENSE_KEYS', 1000)
+    for size in (50, 51, 100):
+        rows = batch._numpy_rows(generator, 100, 1000, size)
+        assert rows.shape == (1000, size)
+        assert all(len(set(row)) == size for row in rows.tolist())
+        assert rows.min() >= 0 and rows.max() < 100
+
+
+def test_server_sessions_are_independent():
+    import asyncio
+    from shoppinglistapp.server import AppServer, read_reply
+    ip = ItemPool()
+    for i in range(5):
+        ip.add_item(Item(f'item{i}', f'{i + 1}.00'))
+
+    async def talk():
+        server = AppServer(ip, idle_timeout=0.2, max_sessions=2)
+        port = await server.start()
+        first = await asyncio.open_connection('127.0.0.1', port)
+        second = await asyncio.open_connection('127.0.0.1', port)
+        for cmd in ('list', 'show list'):
+            first[1].write(f'{cmd}\n'.encode())
+            assert 'item' in await read_reply(first[0])
+        second[1].write(b'show list\n')
+        assert 'item' not in await read_reply(second[0])
+        second[1].write(b'add .dot: 1.50\n')
+        await read_reply(second[0])
+        assert '.dot' in ip
+        await asyncio.sleep(0.05)
+        third = await asyncio.open_connection('127.0.0.1', port)
+        assert await read_reply(third[0]) == 'Server busy, try again later.'
+        assert await read_reply(first[0]) == 'Session closed after 0.2s idle.'
+        assert await read_reply(first[0]) is None
+        for _, writer in (first, second, third):
+            writer.close()
+        await server.close()
+        return server
+
+    server = asyncio.run(talk())
+    assert server.rejected == 1 and server.evicted >= 1
+
+
+def test_concurrent_item_pool_stress():
+    import random
+    import threading
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    ip = ConcurrentItemPool()
+    ip.add_items([Item(f'item{i}', f'{i + 1}.00') for i in range(50)])
+    stop = threading.Event()
+    failures = []
+    reads = [0] * 8
+
+    def writer(wid):
+        rng = random.Random(wid)
+        for i in range(200):
+            # every batch swaps one item for another: the size never moves
+            with ip.batch() as pool:
+                pool.remove_item(pool.item_at(rng.randrange(50)).name)
+                pool.add_item(Item(f'w{wid}-{i}', '2.50'))
+
+    def reader(rid):
+        rng = random.Random(rid)
+        shopping_list = ShoppingList()
+        while not stop.is_set():
+            try:
+                view = ip.snapshot()
+                assert view.get_size() == 50
+                assert len(view.sorted_names()) == 50
+                assert all(item.name in view
+                           for item in view.sample_items(10, rng))
+                shopping_list.refresh(ip, 10, rng=rng)
+                assert len({item.name for item, _ in shopping_list.list}) \
+                    == 10
+            except Exception as exc:  # pylint: disable=broad-except
+                failures.append(exc)
+                return
+            reads[rid] += 1
+
+    readers = [threading.Thread(target=reader, args=(i,)) for i in range(8)]
+    writers = [threading.Thread(target=writer, args=(i,)) for i in range(3)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not failures
+    assert ip.get_size() == 50 and ip.publishes == 1 + 3 * 200
+    assert all(reads)
+    with pytest.raises(NonExistingItemError):
+        with ip.batch() as pool:
+            pool.add_item(Item('rolled back', '1.00'))
+            pool.remove_item('missing')
+    assert 'rolled back' not in ip
+
+
+def test_concurrent_item_pool_copies_the_given_items():
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    items = {'bread' : Item('bread', 3.25)}
+    ip = ConcurrentItemPool(items)
+    view = ip.snapshot()
+    items['milk'] = Item('milk', 2.15)
+    assert 'milk' not in ip and view.get_size() == 1
+    with pytest.raises(InvalidItemPoolError):
+        ConcurrentItemPool([('bread', Item('bread', 3.25))])
+
+
+def test_command_stats():
+    import json
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.stats import CommandStats
+    ip = ItemPool()
+    ip.add_item(Item('milk', '4.25'))
+    app = AppCLI(ShoppingList(), ip, stats=CommandStats())
+    for cmd in ('list', 'add bread: 2.50', 'add bread: 2.50', 'del jam',
+                'show items', 'bogus', 'ask', 'x'):
+        app.execute_command(cmd)
+    kinds = app.stats.kinds
+    assert kinds['add'].count == 2 and kinds['add'].errors == 1
+    assert kinds['del'].errors == 1 and kinds['invalid'].errors == 1
+    assert kinds['answer'].count == 1 and kinds['answer'].errors == 1
+    assert kinds['list'].errors == 0 and kinds['show'].count == 1
+    app.execute_command('stats')
+    assert app.app_engine.message.splitlines()[1].startswith('add')
+    app.execute_command('stats json')
+    assert json.loads(app.app_engine.message)['add']['count'] == 2
+    app.execute_command('stats prometheus')
+    assert ('shoppinglist_command_seconds_count{kind="add"} 2'
+            in app.app_engine.message)
+    assert 'shoppinglist_command_errors_total{kind="add"} 1' in \
+        app.app_engine.message
+    app.execute_command('stats reset')
+    assert list(app.stats.kinds) == ['stats']
+    off = AppCLI(ShoppingList(), ip)
+    off.execute_command('stats')
+    assert off.app_engine.message == 'Command statistics are turned off.'
+
+
+def test_command_stats_time_streamed_rendering():
+    import io
+    import time
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.stats import CommandStats
+    ip = ItemPool(items = {'milk' : Item('milk', 4.25)})
+    app = AppCLI(ShoppingList(), ip, stats=CommandStats())
+
+    def slow_lines(*args, **kwargs):
+        for line in ('ITEMS\n', '- milk ... $4.25\n'):
+            time.sleep(0.05)
+            yield line
+    app.renderer.iter_items = slow_lines
+    app.execute_command('show items')
+    assert 'show' not in app.stats.kinds
+    out = io.StringIO()
+    app.write_message(out)
+    assert out.getvalue() == 'ITEMS\n- milk ... $4.25\n\n\n'
+    assert app.stats.kinds['show'].count == 1
+    assert app.stats.kinds['show'].total >= 0.1
+    app.execute_command('show items')
+    app.app_engine.message = None
+    assert app.stats.kinds['show'].count == 2
+
+
+def test_snapshot_round_trip(tmp_path):
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    from shoppinglistapp.core.errors import InvalidSnapshotError
+    from shoppinglistapp.core.money import Money
+    from shoppinglistapp.core.snapshot import read_snapshot
+    ip = ItemPool()
+    ip.add_items([Item(f'item{i}', f'{i}.25') for i in range(1, 50)])
+    app = AppCLI(ShoppingList(size=4, item_pool=ip), ip)
+    app.execute_command('ask')
+    path = tmp_path / 'session.snap'
+    app.save_snapshot(path)
+    # removed from the pool after the list was made: kept in the list
+    ip.remove_item(app.app_engine.shopping_list.list[0][0].name)
+    app.save_snapshot(path)
+    restored = AppCLI.from_snapshot(path)
+    assert restored.app_engine.items == ip
+    assert restored.app_engine.items.sorted_names() == ip.sorted_names()
+    assert [(item.name, item.price, qnt) for item, qnt in
+            restored.app_engine.shopping_list.list] == \
+        [(item.name, item.price, qnt) for item, qnt in
+         app.app_engine.shopping_list.list]
+    answer = app.app_engine.correct_answer
+    assert restored.app_engine.correct_answer == answer
+    restored.execute_command(str(answer))
+    assert restored.app_engine.message == 'Correct!'
+    snapshot = read_snapshot(path, ColumnarItemPool())
+    assert snapshot.item_pool == ip
+    assert snapshot.correct_answer == Money(answer.cents)
+    path.write_bytes(b'\x93not a snapshot')
+    with pytest.raises(InvalidSnapshotError):
+        read_snapshot(path)
+
+
+def test_command_registry_dispatch_and_plugins():
+    from shoppinglistapp.app_cli import AppCLI, COMMANDS
+    from shoppinglistapp.commands import Command
+    kind, handler, args = COMMANDS.resolve('add a b: 1.50')
+    assert kind == 'add' and args == ('a b', '1.50')
+    assert COMMANDS.resolve('add a: b: c')[1] == AppCLI.add_usage
+    assert COMMANDS.resolve('show items page 3')[2] == ('3',)
+    assert COMMANDS.resolve('l')[0] == 'list'
+    assert COMMANDS.resolve('list now')[:2] == ('list', AppCLI.process_invalid)
+    assert COMMANDS.resolve('addx')[0] == 'invalid'
+    registry = COMMANDS.copy()
+
+    @registry.command('price', '<name>', aliases=('p',))
+    def show_price(app, name):
+        app.app_engine.message = str(app.app_engine.items.get_item(name)
+                                     .price)
+    registry.register(Command('quit', AppCLI.process_quit, aliases=('exit',)))
+    ip = ItemPool()
+    ip.add_item(Item('milk', '4.25'))
+    app = AppCLI(ShoppingList(), ip, commands=registry)
+    app.execute_command('p milk')
+    assert app.app_engine.message == '4.25'
+    app.execute_command('q')
+    assert app.app_engine.message == '"q" is not a valid command.'
+    app.execute_command('exit')
+    assert not app.app_engine.continue_execution
+    assert 'price' not in COMMANDS.table
+
+
+def test_weighted_sampling_follows_weights_and_mutations():
+    import random
+    from collections import Counter
+    from shoppinglistapp.core.sampling import price_band_weights
+    ip = ItemPool()
+    ip.add_items([Item(f'item{i}', f'{i + 1}.00') for i in range(200)])
+    ip.set_weights({'item0': 300, 'item1': 100, 'item2': 0})
+    rng = random.Random(5)
+    counts = Counter(item.name for _ in range(20000)
+                     for item in ip.sample_weighted(1, rng))
+    # 300 : 100 : 1 out of a total weight of 597
+    assert abs(counts['item0'] / 20000 - 300 / 597) < 0.02
+    assert abs(counts['item1'] / 20000 - 100 / 597) < 0.02
+    assert counts['item2'] == 0
+    for i in range(3, 150):
+        ip.remove_item(f'item{i}')
+    ip.add_item(Item('new', '1.00'))
+    ip.set_weight('new', 300)
+    ip.set_weight('item0', 0)
+    assert ip.get_weight('new') == 300 and ip.get_weight('item1') == 100
+    counts = Counter(item.name for _ in range(5000)
+                     for item in ip.sample_weighted(2, rng))
+    assert counts['item0'] == counts['item2'] == 0
+    assert counts['new'] > counts['item1'] > counts['item150']
+    assert all(name in ip for name in counts)
+    # every item of positive weight: repeats fall back to the exact draw
+    sample = ip.sample_weighted(ip.get_size() - 2, rng)
+    assert len({item.name for item in sample}) == ip.get_size() - 2
+    with pytest.raises(InvalidShoppingListSizeError):
+        ip.sample_weighted(ip.get_size(), rng)
+    with pytest.raises(ValueError):
+        ip.set_weight('new', -1)
+    copy = ip.copy()
+    copy.set_weight('item1', 0)
+    assert ip.get_weight('item1') == 100
+    bands = price_band_weights(ip, [(10, 5.0), (160, 1.0)])
+    assert bands['item1'] == 5.0 and bands['item150'] == 1.0
+    assert bands['item199'] == 0.0
+    sp = ShoppingList()
+    sp.refresh(ip, 3, rng=rng, weighted=True)
+    assert len({item.name for item, _ in sp.list}) == 3
+
+
+def test_price_queries_across_backends(tmp_path):
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    from shoppinglistapp.core.columnar import ColumnarItemPool
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    from shoppinglistapp.core.sqlitepool import SQLiteItemPool
+    items = {f'item{i:03}': Item(f'item{i:03}', f'{i * 37 % 100}.50')
+             for i in range(100)}
+    ip = ItemPool(dict(items))
+    ip.remove_item('item010')
+    ip.add_item(Item('zzz', '5.50'))
+    expected = sorted((item.price.cents, name)
+                      for name, item in ip.iter_items())
+    write_catalog(ip, str(tmp_path / 'items.cat'))
+    sql = SQLiteItemPool(str(tmp_path / 'items.db'), readers=2)
+    sql.add_items([item for _, item in ip.iter_items()])
+    columnar = ColumnarItemPool(dict(items))
+    columnar.remove_item('item010')
+    columnar.add_item(Item('zzz', '5.50'))
+    for pool in (ip, ConcurrentItemPool(ip.items), columnar, sql,
+                 MappedItemPool(str(tmp_path / 'items.cat'))):
+        assert pool.price_range(5, 10.5) == [
+            name for cents, name in expected if 500 <= cents <= 1050]
+        assert pool.cheapest(3) == [name for _, name in expected[:3]]
+        assert pool.most_expensive(2) == [name for _, name in
+                                          expected[::-1][:2]]
+        assert pool.price_range(3, 2) == pool.most_expensive(0) == []
+    app = AppCLI(ShoppingList(), ip)
+    app.execute_command('show items 5-5.50')
+    lines = ''.join(app.app_engine.message).split('\n')
+    assert lines[0] == 'ITEMS ($5.00-$5.50)'
+    assert [line.split()[1] for line in lines[1:-1]] == ['item065', 'zzz']
+    app.execute_command('show most expensive 1')
+    assert 'item027 ... $99.50' in ''.join(app.app_engine.message)
+    app.execute_command('show items 5-x')
+    assert app.app_engine.status == 'error'
+
+
+def test_journal_record_and_replay(tmp_path):
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.journal import read_journal, replay
+    from shoppinglistapp.core.errors import InvalidJournalError
+
+    def make_pool():
+        return ItemPool({f'item{i}': Item(f'item{i}', f'{i + 1}.25')
+                         for i in range(30)})
+    path = str(tmp_path / 'session.journal')
+    sp = ShoppingList(size=3, item_pool=make_pool())
+    app = AppCLI(sp, make_pool())
+    app.start_journal(path)
+    messages = []
+    for cmd in ['ask', '1.00', 'list', 'ask', '2', 'add tea: 1.10',
+                'show items 1-5', 'del item3', 'list', 'show list', 'bad']:
+        app.execute_command(cmd)
+        messages.append(app.message_text())
+        app.app_engine.message = None
+    app.stop_journal()
+    journal = read_journal(path)
+    assert [entry.cmd for entry in journal.entries][:2] == ['ask', '1.00']
+    assert journal.entries[0].seed is not None
+    assert journal.entries[1].seed is None
+    report = replay(journal, AppCLI(None, make_pool()))
+    assert report.commands == 11 and not report.divergences
+    changed = make_pool()
+    changed.remove_item('item1')
+    report = replay(journal, AppCLI(None, changed), paced=True)
+    assert report.divergences and report.elapsed >= \
+        journal.entries[-1].offset / 1e6
+    with open(path, 'rb') as stream:
+        data = stream.read()
+    with open(path, 'wb') as stream:
+        stream.write(data[:-3])
+    assert len(read_journal(path).entries) == 10
+    with open(path, 'wb') as stream:
+        stream.write(b'\x01')
+    with pytest.raises(InvalidJournalError):
+        read_journal(path)
+
+
+def test_durable_pool_recovers_and_compacts(tmp_path):
+    import os
+    from shoppinglistapp.core.durable import DurableItemPool
+    directory = str(tmp_path / 'pool')
+    pool = DurableItemPool(directory, commit_window=0.005)
+    pool.add_items([Item(f'item{i}', f'{i}.50') for i in range(50)])
+    engine = AppEngine(ShoppingList(), pool)
+    engine.process_add_item('add tea: 1.10')
+    engine.process_del_item('del item7')
+    with pytest.raises(DuplicateItemError):
+        pool.add_item(Item('tea', '2.00'))
+    with pytest.raises(NonExistingItemError):
+        pool.remove_item('item7')
+    pool.sync()
+    assert pool.wal.synced == pool.wal.appended == 3
+    expected = pool.copy()
+    # no close: recover from what is on disk, as after a crash
+    recovered = DurableItemPool(directory)
+    assert recovered == expected and recovered.generation == 2
+    recovered.remove_item('item8')
+    recovered.compact(wait=True)
+    recovered.add_item(Item('late', '9.99'))
+    recovered.close()
+    assert sorted(os.listdir(directory)) == ['checkpoint-00000003.snap',
+                                             'wal-00000003.log']
+    with open(os.path.join(directory, 'wal-00000003.log'), 'ab') as log:
+        log.write(b'\x93\xa1+')  # a record torn by a crash
+    reopened = DurableItemPool(directory, commit_window=0)
+    assert reopened.get_size() == 50 and 'late' in reopened
+    assert 'item8' not in reopened and 'tea' in reopened
+    reopened.close()
+
+
+def test_shopping_list_edits_keep_running_total(tmp_path):
+    import random
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    from shoppinglistapp.core.durable import DurableItemPool
+    from shoppinglistapp.core.money import Money
+
+    def total(sp):
+        return Money(sum(item.price.cents * qnt for item, qnt in sp.list))
+    ip = ItemPool({f'item{i}': Item(f'item{i}', f'{i + 1}.25')
+                   for i in range(20)})
+    sp = ShoppingList(size=4, quantities=[1, 2, 3, 4], item_pool=ip,
+                      rng=random.Random(3))
+    assert 'item19' not in [item.name for item, _ in sp.list]
+    sp.set_quantity(1, 7)
+    sp.replace_item(-1, Item('extra', '0.10'))
+    sp.append(ip.get_item('item19'), 2)
+    sp.remove(0)
+    assert sp.get_total_price() == total(sp) and len(sp) == 4
+    assert sp.list[0][1] == 7 and sp.get_item_price(-1) == Money(4050)
+    with pytest.raises(DuplicateItemError):
+        sp.append(Item('extra', '1.00'))
+    with pytest.raises(ValueError):
+        sp.set_quantity(0, 0)
+    name = sp.list[0][0].name
+    ip.update_price(name, '100.00')
+    assert sp.get_item_price(0) == Money(70000)
+    assert sp.get_total_price() == total(sp)
+    app = AppCLI(sp, ip)
+    assert '$700.00' in app.show_list()
+    sp.list = [(ip.get_item('item0'), 2)]
+    assert sp.get_total_price() == Money(250)
+    shared = ConcurrentItemPool(ip.items)
+    sp.refresh(shared, 3)
+    shared.update_price(sp.list[2][0].name, '0.01')
+    assert sp.get_item_price(2) == Money(sp.list[2][1])
+    directory = str(tmp_path / 'pool')
+    durable = DurableItemPool(directory, commit_window=0)
+    durable.add_item(Item('tea', '1.00'))
+    durable.update_price('tea', '2.50')
+    durable.close()
+    durable = DurableItemPool(directory)
+    assert durable.get_item('tea').price == Money(250)
+    durable.close()
+
+
+def test_compact_shopping_list_matches_list_layout():
+    import random
+    from shoppinglistapp.core.batch import generate_lists
+    from shoppinglistapp.core.concurrent import ConcurrentItemPool
+    from shoppinglistapp.core.errors import StaleShoppingListError
+    from shoppinglistapp.core.money import Money
+    from shoppinglistapp.core.shoppinglist import CompactShoppingList
+    ip = ItemPool({f'item{i}': Item(f'item{i}', f'{i + 1}.05')
+                   for i in range(40)})
+    sp = ShoppingList(item_pool=ip, rng=random.Random(5))
+    compact = CompactShoppingList.draw(ip, rng=random.Random(5))
+    assert list(compact) == list(sp) and len(compact) == len(sp)
+    assert compact.get_total_price() == sp.get_total_price()
+    assert compact.get_item_price(-1) == sp.get_item_price(-1)
+    assert compact.to_list().list == sp.list
+    batch = generate_lists(ip, 3, 5, seed=2, use_numpy=False)
+    assert list(batch.get_compact(1)) == batch.get_list(1).list
+    with pytest.raises(ValueError):
+        CompactShoppingList(ip, [1, 2], [1])
+    with pytest.raises(ValueError):
+        CompactShoppingList.draw(ip, 2, [300, 1])
+    name = next(iter(compact))[0].name
+    ip.update_price(name, '100.00')
+    assert compact.get_item_price(0) == Money(10000) * compact.quantities[0]
+    ip.remove_item('item0')
+    with pytest.raises(StaleShoppingListError):
+        compact.get_total_price()
+    shared = ConcurrentItemPool(ip.items)
+    pinned = CompactShoppingList.draw(shared, 3)
+    shared.remove_item('item1')
+    assert len(list(pinned)) == 3
+
+
+def test_encode_catalog_takes_maxima_from_rows(tmp_path):
+    from shoppinglistapp.core.catalog import (CatalogReader, MappedItemPool,
+                                              encode_catalog, write_catalog)
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ItemPool(items = {'bread' : Item('bread', 3.25),
+                                    'Macbook Pro' : Item('Macbook Pro',
+                                                         1999.99)}), path)
+    mp = MappedItemPool(path)
+    mp.remove_item('Macbook Pro')
+    data = b''.join(bytes(part) for part in encode_catalog(mp))
+    reader = CatalogReader(data)
+    assert (reader.count, reader.max_name_length, reader.max_order) == \
+        (1, 5, 0)
+    reader.release()
+    mp.close()
+
+
+def test_mapped_price_queries_merge_catalog_and_overlay(tmp_path):
+    import random
+    from shoppinglistapp.core.catalog import MappedItemPool, write_catalog
+    rng = random.Random(8)
+    ip = ItemPool({f'item{i:03}': Item(f'item{i:03}',
+                                       f'{rng.randint(1, 20)}.50')
+                   for i in range(300)})
+    path = str(tmp_path / 'items.cat')
+    write_catalog(ip, path)
+    mp = MappedItemPool(path)
+    for name in rng.sample(sorted(ip.items), 40):
+        ip.remove_item(name)
+        mp.remove_item(name)
+    for i in range(30):
+        item = Item(f'new{i}', f'{rng.randint(1, 20)}.50')
+        ip.add_item(item)
+        mp.add_item(item)
+    for low, high in ((1, 30), (3.5, 7.5), (5, 5.5), (21, 30), (8, 2)):
+        assert mp.price_range(low, high) == ip.price_range(low, high)
+    for count in (0, 1, 25, 400):
+        assert mp.cheapest(count) == ip.cheapest(count)
+        assert mp.most_expensive(count) == ip.most_expensive(count)
+    mp.compact()
+    assert mp.cheapest(50) == ip.cheapest(50)
+    mp.close()
+
+
+def _shared_pool_worker(name, queue):
+    from shoppinglistapp.core.shared import SharedItemPool
+    pool = SharedItemPool(name)
+    queue.put((pool.get_size(), pool.get_item('item5').price.cents,
+               'nope' in pool, len(pool.sample_items(3))))
+    pool.close()
+
+
+def test_shared_pool_across_processes_and_republish():
+    import multiprocessing
+    import os
+    from shoppinglistapp.app_cli import AppCLI
+    from shoppinglistapp.core.errors import ReadOnlyItemPoolError
+    from shoppinglistapp.core.shared import (SharedItemPool,
+                                             SharedPoolPublisher)
+    name = f'sltest{os.getpid()}'
+    ip = ItemPool({f'item{i}': Item(f'item{i}', f'{i + 1}.25')
+                   for i in range(200)})
+    publisher = SharedPoolPublisher(name)
+    try:
+        publisher.publish(ip)
+        queue = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=_shared_pool_worker,
+                                         args=(name, queue))
+        worker.start()
+        assert queue.get(timeout=30) == (200, 625, False, 3)
+        worker.join()
+        pool = SharedItemPool(name)
+        assert pool == ip
+        assert pool.most_expensive(5) == ip.most_expensive(5)
+        assert pool.price_range(3, 4) == ip.price_range(3, 4)
+        assert sorted(pool.price_column()) == sorted(ip.price_column())
+        assert all(name in pool for name in ip.items)
+        with pytest.raises(ReadOnlyItemPoolError):
+            pool.add_item(Item('tea', '1.00'))
+        app = AppCLI(ShoppingList(), pool)
+        app.execute_command('list')
+        app.execute_command('show items page 1')
+        assert ''.join(app.app_engine.message).startswith(
+            'ITEMS (page 1 of 10)\n- item0 ..')
+        ip.remove_item('item7')
+        ip.add_item(Item('new', '0.50'))
+        publisher.publish(ip)
+        assert 'item7' in pool
+        version = pool.version
+        app.execute_command('show cheapest 1')
+        assert 'new' in ''.join(app.app_engine.message)
+        assert pool.version > version and 'item7' not in pool
+        pool.close()
+    finally:
+        publisher.close()
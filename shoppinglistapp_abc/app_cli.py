@@ -4,17 +4,103 @@ sys.path.insert(0, 'core')
 # pylint: disable=wrong-import-position
 # pylint: disable=wildcard-import
 # pylint: disable=unused-wildcard-import
+import io  # noqa: E402
 import random  # noqa: E402
+import time  # noqa: E402
+from shoppinglistapp.commands import Command, CommandRegistry  # noqa: E402
+from shoppinglistapp.render import Renderer  # noqa: E402
+from shoppinglistapp.core.prices import parse_price  # noqa: E402
+from shoppinglistapp.core.snapshot import (read_snapshot,  # noqa: E402
+                                           write_snapshot)
+from shoppinglistapp.core.journal import JournalWriter  # noqa: E402
 from shoppinglistapp.core.errors import *  # noqa: E402
 from shoppinglistapp.core.items import *  # noqa: E402
 from shoppinglistapp.core.shoppinglist import *  # noqa: E402
 from shoppinglistapp.core.appengine import *  # noqa: E402
 
 
+class BatchReport:
+    """class used to hold the totals of a batch run"""
+    def __init__(self, commands=0, errors=0, elapsed=0.0):
+        self.commands = commands
+        self.errors = errors
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return (f'{self.commands} commands, {self.errors} errors '
+                f'in {self.elapsed:.3f}s')
+
+
 class AppCLI:
     """main class for the operation"""
-    def __init__(self, shopping_list=None, items=None):
+    # pylint: disable=too-many-arguments
+    def __init__(self, shopping_list=None, items=None, page_size=20,
+                 stats=None, commands=None):
+        if isinstance(page_size, bool) or not isinstance(page_size, int) or \
+                page_size < 1:
+            raise ValueError()
         self.app_engine = AppEngine(shopping_list, items)
+        self.renderer = Renderer()
+        self.page_size = page_size
+        # a CommandStats timing every command, None turns timing off
+        self.stats = stats
+        # the CommandRegistry of the app, COMMANDS unless given
+        self.commands = COMMANDS if commands is None else commands
+        # a JournalWriter recording every command, None when not recording
+        self.journal = None
+        # seed of the random generator of the running command: drawn when
+        # a recorded command needs one, set by a replay
+        self.seed = None
+
+    @classmethod
+    def from_snapshot(cls, path, item_pool=None, page_size=20, stats=None):
+        """function to start an app from a snapshot file, with the pool,
+        the shopping list and a pending question as they were saved"""
+        snapshot = read_snapshot(path, item_pool)
+        app = cls(snapshot.shopping_list, snapshot.item_pool, page_size,
+                  stats)
+        app.app_engine.correct_answer = snapshot.correct_answer
+        return app
+
+    def save_snapshot(self, path):
+        """function to save the session to a snapshot file"""
+        write_snapshot(path, self.app_engine.items,
+                       self.app_engine.shopping_list,
+                       self.app_engine.correct_answer)
+
+    def start_journal(self, path):
+        """function to record the commands of the session from now on
+        to a journal file (see core.journal)"""
+        self.stop_journal()
+        self.journal = JournalWriter(path, self.app_engine.shopping_list,
+                                     self.app_engine.correct_answer)
+
+    def stop_journal(self):
+        """function to close the journal, if one is recorded"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def command_rng(self):
+        """function to get the random generator a command draws from
+
+        without a journal this is the random module; a recorded or
+        replayed command gets a generator of its own, seeded by seed"""
+        if self.seed is None:
+            if self.journal is None:
+                return random
+            self.seed = random.getrandbits(32)
+        return random.Random(self.seed)
+
+    def message_text(self):
+        """function to get the pending message as one string
+
+        a streamed message is joined (and kept joined), so this costs the
+        memory of the whole message"""
+        message = self.app_engine.message
+        if message is not None and not isinstance(message, str):
+            message = self.app_engine.message = ''.join(message)
+        return f'{message}'
 
     def run(self):
         """function to run the app"""
@@ -24,39 +110,202 @@ class AppCLI:
                 prompt = 'What amount should replace the questionmarks? $'
             cmd = input(prompt)
             self.execute_command(cmd)
-            print(f'{self.app_engine.message}\n')
-            self.app_engine.message = None
+            self.write_message(sys.stdout)
+            sys.stdout.flush()
+
+            if not self.app_engine.continue_execution:
+                break
+
+    def run_batch(self, lines, out=None, quiet=False, chunk_size=65536):
+        """function to run commands read from a file or pipe
 
+        output is buffered and written to out in chunks of about
+        chunk_size characters; quiet drops the per-command messages.
+        a command raising an exception or rejected by the engine (status
+        'error') is counted as an error and the batch goes on. returns a
+        BatchReport"""
+        if out is None:
+            out = sys.stdout
+        buffer = io.StringIO()
+        report = BatchReport()
+        start = time.perf_counter()
+        for line in lines:
+            report.commands += 1
+            try:
+                self.execute_command(line.rstrip('\r\n'))
+            # pylint: disable=broad-except
+            except Exception as exc:
+                report.errors += 1
+                self.app_engine.message = f'Error: {exc}'
+            else:
+                if self.app_engine.status == 'error':
+                    report.errors += 1
+            if quiet:
+                self.app_engine.message = None
+            else:
+                self.write_message(buffer)
+                if buffer.tell() >= chunk_size:
+                    out.write(buffer.getvalue())
+                    buffer.seek(0)
+                    buffer.truncate()
             if not self.app_engine.continue_execution:
                 break
+        out.write(buffer.getvalue())
+        out.flush()
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def write_message(self, stream):
+        """function to write the pending message to a stream and clear it
+
+        the message is either a string or an iterable of rendered lines"""
+        message = self.app_engine.message
+        if message is None or isinstance(message, str):
+            stream.write(f'{message}\n\n')
+        else:
+            self.renderer.write(message, stream)
+            stream.write('\n\n')
+        self.app_engine.message = None
 
     def execute_command(self, cmd):
-        """function to execute command"""
+        """function to execute command
+
+        with stats on, the command is timed and recorded under its kind,
+        as an error when it raised or was rejected; a streamed message is
+        timed as it is consumed (see _timed_stream). with a journal, the
+        command is appended to it with its seed and message digest"""
+        kind, handler, args = self.resolve(cmd)
+        self.app_engine.status = None
+        if self.stats is None and self.journal is None:
+            handler(self, *args)
+            return
+        start = time.perf_counter()
+        try:
+            handler(self, *args)
+        except Exception:
+            self.observe(cmd, kind, start, True)
+            raise
+        message = self.app_engine.message
+        if self.journal is None and message is not None and \
+                not isinstance(message, str):
+            stream = self._timed_stream(message, kind,
+                                        time.perf_counter() - start)
+            next(stream)
+            self.app_engine.message = stream
+            return
+        self.observe(cmd, kind, start, False)
+
+    def _timed_stream(self, lines, kind, elapsed):
+        """generator passing the lines of a streamed message through
+
+        the lines are rendered while the message is written, so the time
+        spent producing them is added to the elapsed time of the handler;
+        the command is recorded once the stream is used up, or dropped.
+        the first next() only starts the generator"""
+        error = self.app_engine.status == 'error'
+        lines = iter(lines)
+        try:
+            yield None
+            while True:
+                start = time.perf_counter()
+                try:
+                    line = next(lines)
+                except StopIteration:
+                    return
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield line
+        finally:
+            self.stats.observe(kind, elapsed, error)
+
+    def observe(self, cmd, kind, start, raised):
+        """function to time and journal a command that has run
+
+        the message is joined for the journal before the clock is read,
+        so the time of a streamed message includes its rendering"""
+        text = None
+        if self.journal is not None and not raised:
+            text = self.message_text()
+        if self.stats is not None:
+            self.stats.observe(kind, time.perf_counter() - start,
+                               raised or self.app_engine.status == 'error')
+        if self.journal is not None:
+            self.journal.record(cmd, self.seed, text)
+            self.seed = None
+
+    def resolve(self, cmd):
+        """function to get (kind, handler, args) for a command line
+
+        a pending question takes the line as its answer, anything else
+        goes through the command registry"""
         if self.app_engine.correct_answer is not None:
-            self.app_engine.process_answer(cmd)
-        elif cmd in ('q', 'quit'):
-            self.app_engine.continue_execution = False
-            self.app_engine.message = 'Have a nice day!'
-        elif cmd in ('a', 'ask'):
-            self.process_ask()
-        elif cmd in ('l', 'list'):
-            self.app_engine.shopping_list.refresh(
-                item_pool=self.app_engine.items)
-            self.app_engine.message = ('Shopping list with '
-                                       f'{len(self.app_engine.shopping_list)} '
-                                       'items has been created.')
-        elif cmd.startswith('show'):
-            self.process_show(cmd)
-        elif cmd.startswith('add'):
-            self.app_engine.process_add_item(cmd)
-        elif cmd.startswith('del'):
-            self.app_engine.process_del_item(cmd)
+            return 'answer', AppCLI.process_answer, (cmd,)
+        return self.commands.resolve(cmd)
+
+    def dispatch(self, cmd):
+        """function to run the command without timing it"""
+        _, handler, args = self.resolve(cmd)
+        handler(self, *args)
+
+    def process_answer(self, cmd):
+        """function to check the answer to the pending question"""
+        self.app_engine.process_answer(cmd)
+
+    def process_quit(self):
+        """function to end the app"""
+        self.app_engine.continue_execution = False
+        self.app_engine.message = 'Have a nice day!'
+
+    def process_list(self):
+        """function to create a new random shopping list"""
+        self.app_engine.shopping_list.refresh(item_pool=self.app_engine.items,
+                                              rng=self.command_rng())
+        self.app_engine.message = ('Shopping list with '
+                                   f'{len(self.app_engine.shopping_list)} '
+                                   'items has been created.')
+
+    def process_add(self, name, price):
+        """function to add an item from the parsed add arguments"""
+        self.app_engine.add_item(name, price)
+
+    def add_usage(self, _cmd, item_str):
+        """function to explain an add command that cannot be parsed"""
+        self.app_engine.add_usage(item_str)
+
+    def process_del(self, item_name):
+        """function to delete an item by the parsed del argument"""
+        self.app_engine.del_item(item_name)
+
+    def process_invalid(self, cmd):
+        """function to reject a line that is no valid command"""
+        self.app_engine.message = f'"{cmd}" is not a valid command.'
+        self.app_engine.status = 'error'
+
+    def process_stats(self, form=''):
+        """function to show or export the command statistics"""
+        if self.stats is None:
+            self.app_engine.message = 'Command statistics are turned off.'
+        elif form == '':
+            self.app_engine.message = self.stats.to_text()
+        elif form == 'json':
+            self.app_engine.message = self.stats.to_json()
+        elif form == 'prometheus':
+            self.app_engine.message = self.stats.to_prometheus()
+        elif form == 'reset':
+            self.stats.reset()
+            self.app_engine.message = 'Command statistics cleared.'
         else:
-            self.app_engine.message = f'"{cmd}" is not a valid command.'
+            self.app_engine.message = (f'Cannot show stats {form}.\n'
+                                       'Usage: stats [json|prometheus|reset]')
+            self.app_engine.status = 'error'
 
     def process_ask(self):
         """function to process the process the shopping list"""
-        question = random.randint(0, len(self.app_engine.shopping_list.list))
+        question = self.command_rng().randint(
+            0, len(self.app_engine.shopping_list.list))
         self.app_engine.message = self.show_list(mask_index=question)
         if question < len(self.app_engine.shopping_list.list):
             self.app_engine.correct_answer = (self.app_engine.
@@ -68,77 +317,116 @@ class AppCLI:
 
     def show_items(self):
         """function to display all the items when input is show items"""
-        max_name, max_order = 0, 0
-        for item in self.app_engine.items.items.values():
-            max_name = max(max_name, len(item.name))
-            max_order = max(max_order, item.get_order())
-        out = 'ITEMS\n'
-        for item_name in sorted(self.app_engine.items.items.keys()):
-            item = self.app_engine.items.items[item_name]
-            padding = max_name - len(item_name)
-            out += (item.get_list_item_str() + " " + "..." + "." * padding
-                    + " " + item.get_price_str(order=max_order) + '\n')
-#            out += item.item2line(padding=max_name - len(item_name),
-#                                   order=max_order) + '\n'
-        return out
+        return ''.join(
+            self.renderer.iter_items(self.app_engine.items.snapshot()))
 
     def show_list(self, mask_index=None):
         """function to show list"""
-#        line_base_len = len('TOTAL') - 4
-# pylint: disable=too-many-locals
-        max_item = max(len(item.name)
-                       for item, _ in self.app_engine.shopping_list.list)
-        line_base_len = max(max_item, len('TOTAL') - 4)
-        total = Item('TOTAL', self.app_engine.shopping_list.get_total_price())
-        max_order = total.get_order()
-        max_name = len(total.name)
-        for item, _ in self.app_engine.shopping_list.list:
-            max_name = max(max_name, len(item.name))
-            max_order = max(max_order, item.get_order())
-        out = 'SHOPPING LIST\n'
-        i = 0
-        for i, (item, quantity) in enumerate(self.app_engine.
-                                             shopping_list.list):
-            hide_price = mask_index == i
-            padding = line_base_len - len(item.name)
-            out += (item.get_list_item_str(quantity) + " " + "..."
-                    + "." * padding + " "
-                    + item.get_price_str(quantity, hide_price, max_order)
-                    + '\n')
-#            out += item.item2line(quantity, hide_price,
-#                                   max_order, padding) + '\n'
-        i += 1
-        hide_price = mask_index == i
-        q_len = 5
-        d_len = 2
-        padding = max_name - len(total.name) + q_len + d_len
-        total_line = (total.get_list_item_str(leading_dash=False)
-                      + " " + "..." + "." * padding + " "
-                      + total.get_price_str(hide_price=hide_price,
-                                            order=max_order))
-#        total_line = total.item2line(
-#            padding = max_name - len(total.name) + q_len + d_len,
-#            order = max_order,
-#            hide_price = hide_price,
-#            leading_dash = False
-#        )
-        hline = '-'*len(total_line) + '\n'
-        return out+hline+total_line + '\n'
+        return ''.join(self.renderer.iter_list(self.app_engine.shopping_list,
+                                               mask_index))
 
     def process_show(self, cmd):
         """function to process different condition to show list"""
-        what = cmd[5:]
-        if what == 'items':
-            self.app_engine.message = self.show_items()
-        elif what == 'list':
-            self.app_engine.message = self.show_list()
-        else:
-            self.app_engine.message = f'Cannot show {what}.\n'
-            self.app_engine.message += 'Usage: show list|items'
+        self.dispatch(cmd)
 
+    def show_items_all(self):
+        """function to show the whole items table"""
+        # streamed by write_message instead of joined into one string
+        self.app_engine.message = self.renderer.iter_items(
+            self.app_engine.items.snapshot())
 
-if __name__ == '__main__':
-    # usage example
+    def show_list_unmasked(self):
+        """function to show the shopping list with every price"""
+        self.app_engine.message = self.show_list()
+
+    def show_usage(self, _cmd, what):
+        """function to explain a show command that cannot be parsed"""
+        self.app_engine.message = f'Cannot show {what}.\n'
+        self.app_engine.message += ('Usage: show list|items'
+                                    '|items page <n>|items from <name>'
+                                    '|items <min>-<max>|cheapest <n>'
+                                    '|most expensive <n>')
+        self.app_engine.status = 'error'
+
+    def show_items_page(self, page):
+        """function to show one page of page_size items"""
+        pool = self.app_engine.items.snapshot()
+        pages = max(1, -(-pool.get_size() // self.page_size))
+        if not page.isdigit() or not 1 <= int(page) <= pages:
+            self.app_engine.message = (f'Page "{page}" does not exist '
+                                       f'(pages 1-{pages}).')
+            self.app_engine.status = 'error'
+            return
+        start = (int(page) - 1) * self.page_size
+        names = pool.sorted_names_slice(start, start + self.page_size)
+        self.app_engine.message = self.renderer.iter_items(
+            pool, names, f'ITEMS (page {page} of {pages})')
+
+    def show_items_from(self, item_name):
+        """function to show page_size items starting at a name"""
+        pool = self.app_engine.items.snapshot()
+        start = pool.sorted_position(item_name)
+        names = pool.sorted_names_slice(start, start + self.page_size)
+        self.app_engine.message = self.renderer.iter_items(
+            pool, names, f'ITEMS (from {item_name})')
+
+    def show_items_priced(self, low, high):
+        """function to show the items priced from low to high, cheapest
+        first"""
+        low_price, high_price = parse_price(low), parse_price(high)
+        if low_price is None or high_price is None:
+            self.app_engine.message = (f'Price range "{low}-{high}" '
+                                       'is not valid.')
+            self.app_engine.status = 'error'
+            return
+        pool = self.app_engine.items.snapshot()
+        names = pool.price_range(low_price, high_price)
+        self.app_engine.message = self.renderer.iter_items(
+            pool, names, f'ITEMS (${low_price}-${high_price})')
+
+    def _show_top(self, count, title, top):
+        if not count.isdigit():
+            self.app_engine.message = f'Count "{count}" is not valid.'
+            self.app_engine.status = 'error'
+            return
+        pool = self.app_engine.items.snapshot()
+        self.app_engine.message = self.renderer.iter_items(
+            pool, top(pool)(int(count)), f'ITEMS ({title} {count})')
+
+    def show_cheapest(self, count):
+        """function to show the count cheapest items"""
+        self._show_top(count, 'cheapest', lambda pool: pool.cheapest)
+
+    def show_most_expensive(self, count):
+        """function to show the count most expensive items"""
+        self._show_top(count, 'most expensive',
+                       lambda pool: pool.most_expensive)
+
+
+# the built-in commands; register more on COMMANDS (or on a copy passed
+# to AppCLI as commands) to extend the app without editing AppCLI
+COMMANDS = CommandRegistry(AppCLI.process_invalid, [
+    Command('quit', AppCLI.process_quit, aliases=('q',)),
+    Command('ask', AppCLI.process_ask, aliases=('a',)),
+    Command('list', AppCLI.process_list, aliases=('l',)),
+    Command('show', {'items': AppCLI.show_items_all,
+                     'items page <page>': AppCLI.show_items_page,
+                     'items from <name>': AppCLI.show_items_from,
+                     'items <low>-<high>': AppCLI.show_items_priced,
+                     'cheapest <count>': AppCLI.show_cheapest,
+                     'most expensive <count>': AppCLI.show_most_expensive,
+                     'list': AppCLI.show_list_unmasked},
+            usage=AppCLI.show_usage),
+    Command('add', {'<name>: <price>': AppCLI.process_add},
+            usage=AppCLI.add_usage),
+    Command('del', {'<name>': AppCLI.process_del}),
+    Command('stats', {'': AppCLI.process_stats,
+                      '<form>': AppCLI.process_stats}),
+])
+
+
+def example_pool():
+    """function to build the item pool of the usage example"""
     item2 = Item('Macbook', 1999.99)
     item3 = Item('Milk', 4.25)
     item4 = Item('Hotel Room', 255.00)
@@ -148,6 +436,66 @@ if __name__ == '__main__':
     ip.add_item(item3)
     ip.add_item(item4)
     ip.add_item(item5)
-    sp = ShoppingList(size=3, quantities=[3, 2, 4], item_pool=ip)
-    app = AppCLI(sp, ip)
-    app.run()
+    return ip
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    from shoppinglistapp.core.catalog import MappedItemPool
+    from shoppinglistapp.core.durable import DurableItemPool
+    from shoppinglistapp.core.stats import CommandStats
+
+    parser = argparse.ArgumentParser(description='Shopping list practice')
+    parser.add_argument('script', nargs='?',
+                        help='run commands from a file (- for stdin)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='drop per-command output in batch mode')
+    parser.add_argument('--catalog', help='serve items from a catalog file')
+    parser.add_argument('--snapshot',
+                        help='start from this snapshot file when it exists '
+                             '(instead of the catalog) and save the session '
+                             'to it on exit')
+    parser.add_argument('--durable', metavar='DIR',
+                        help='keep the item pool in this directory, with '
+                             'every add and del logged (a new directory '
+                             'starts with the usage example items)')
+    parser.add_argument('--stats', action='store_true',
+                        help='time every command (see the stats command)')
+    parser.add_argument('--journal',
+                        help='record the commands of the session to this '
+                             'journal file (see benchmarks/replay_journal.py)')
+    args = parser.parse_args()
+    if args.durable and (args.catalog or args.snapshot):
+        parser.error('--durable cannot be used with --catalog or --snapshot')
+    stats = CommandStats() if args.stats else None
+    if args.snapshot and os.path.exists(args.snapshot):
+        app = AppCLI.from_snapshot(args.snapshot, stats=stats)
+    elif args.durable:
+        ip = DurableItemPool(args.durable)
+        if not ip.get_size():
+            ip.add_items([item for _, item in example_pool().iter_items()])
+    elif args.catalog:
+        ip = MappedItemPool(args.catalog)
+    else:
+        ip = example_pool()
+    if not args.snapshot or not os.path.exists(args.snapshot):
+        sp = ShoppingList(size=min(3, ip.get_size()), quantities=[3, 2, 4],
+                          item_pool=ip)
+        app = AppCLI(sp, ip, stats=stats)
+    if args.journal:
+        app.start_journal(args.journal)
+    if args.script == '-':
+        print(app.run_batch(sys.stdin, quiet=args.quiet), file=sys.stderr)
+    elif args.script:
+        with open(args.script, encoding='utf-8') as script:
+            print(app.run_batch(script, quiet=args.quiet), file=sys.stderr)
+    else:
+        app.run()
+    app.stop_journal()
+    if args.durable:
+        ip.close()
+    if args.snapshot:
+        app.save_snapshot(args.snapshot)
+    if args.stats and args.script:
+        print(app.stats.to_text(), file=sys.stderr)
@@ -0,0 +1,156 @@
+"""This module holds the command registry used by app_cli
+
+a command is looked up by the first word of the line (its name or one of
+its aliases) in one dict, then the rest of the line is matched against
+the argument grammars of the command, compiled to regular expressions
+when the command is registered. a grammar is a string of literal text
+and <placeholders>::
+
+    ''                   no arguments
+    '<name>'             the whole rest of the line
+    '<name>: <price>'    two arguments around one ': '
+    'items page <page>'  a literal sub-command and one argument
+
+a placeholder never spans a literal of its grammar, so 'a: b: c' does
+not match '<name>: <price>'. a literal form wins over the patterns,
+which are tried in order, and a lone '<placeholder>' form is tried last.
+handlers are called as handler(app, *args) with the matched arguments
+in order."""
+import re
+
+PLACEHOLDER = re.compile(r'<(\w+)>')
+
+
+def compile_grammar(grammar):
+    """function to compile an argument grammar to a regular expression"""
+    literals = [text for text in PLACEHOLDER.split(grammar)[::2] if text]
+    if literals:
+        blocked = '|'.join(re.escape(text) for text in literals)
+        capture = f'((?:(?!{blocked}).)*)'
+    else:
+        capture = '(.*)'
+    parts = PLACEHOLDER.split(grammar)
+    pattern = ''.join(capture if i % 2 else re.escape(part)
+                      for i, part in enumerate(parts))
+    return re.compile(pattern, re.DOTALL)
+
+
+class Command:
+    """class used to declare a command: its name, aliases and forms
+
+    forms maps every argument grammar to the handler run when the rest
+    of the line matches it (a bare handler is the same as {'': handler}).
+    usage(app, cmd, rest) is run when no grammar matches; without it the
+    line is reported as not a valid command"""
+    def __init__(self, name, forms, aliases=(), usage=None):
+        self.name = name
+        if callable(forms):
+            forms = {'': forms}
+        self.forms = forms
+        self.aliases = tuple(aliases)
+        self.usage = usage
+        # forms sorted by how they are matched: no arguments, a literal
+        # rest of line (one dict lookup), one placeholder taking the whole
+        # rest (no regex), and the compiled patterns in declaration order
+        self.bare = None
+        self.literals = {}
+        self.rest = None
+        self.patterns = []
+        for grammar, handler in forms.items():
+            if not grammar:
+                self.bare = handler
+            elif not PLACEHOLDER.search(grammar):
+                self.literals[grammar] = handler
+            elif PLACEHOLDER.fullmatch(grammar):
+                self.rest = handler
+            else:
+                self.patterns.append((compile_grammar(grammar), handler))
+
+    def parse(self, has_args, rest):
+        """function to get (handler, args) for the rest of a line, None
+        when no grammar matches"""
+        if not has_args:
+            if self.bare is not None:
+                return self.bare, ()
+        else:
+            handler = self.literals.get(rest)
+            if handler is not None:
+                return handler, ()
+        for pattern, handler in self.patterns:
+            match = pattern.fullmatch(rest)
+            if match is not None:
+                return handler, match.groups()
+        if self.rest is not None:
+            return self.rest, (rest,)
+        return None
+
+    def __repr__(self):
+        return f'Command({self.name!r}, aliases={self.aliases!r})'
+
+
+class CommandRegistry:
+    """class used to map command words to commands
+
+    invalid(app, cmd) handles lines whose first word is no command.
+    resolved lines are remembered (up to cache_size of them, then the
+    memo starts over), since sessions send the same lines again and
+    again; registering a command clears the memo"""
+    def __init__(self, invalid, commands=(), cache_size=4096):
+        self.invalid = invalid
+        self.table = {}
+        self.commands = []
+        self.cache = {}
+        self.cache_size = cache_size
+        for command in commands:
+            self.register(command)
+
+    def register(self, command):
+        """function to add a command, replacing the commands registered
+        under the same words; returns the command"""
+        for word in (command.name, *command.aliases):
+            old = self.table.get(word)
+            if old is not None and old is not command:
+                self.commands.remove(old)
+                for key in [key for key, value in self.table.items()
+                            if value is old]:
+                    del self.table[key]
+            self.table[word] = command
+        self.commands.append(command)
+        self.cache = {}
+        return command
+
+    def command(self, name, grammar='', aliases=(), usage=None):
+        """decorator registering a function as a one-form command"""
+        def decorate(handler):
+            self.register(Command(name, {grammar: handler}, aliases, usage))
+            return handler
+        return decorate
+
+    def copy(self):
+        """function to get a registry that can be extended on its own"""
+        return CommandRegistry(self.invalid, self.commands)
+
+    def resolve(self, cmd):
+        """function to find what to run for a line
+
+        returns (kind, handler, args): kind is the name of the command
+        ('invalid' for unknown words) and handler(app, *args) runs it"""
+        resolved = self.cache.get(cmd)
+        if resolved is not None:
+            return resolved
+        word, space, rest = cmd.partition(' ')
+        command = self.table.get(word)
+        if command is None:
+            resolved = 'invalid', self.invalid, (cmd,)
+        else:
+            found = command.parse(bool(space), rest)
+            if found is not None:
+                resolved = command.name, found[0], found[1]
+            elif command.usage is None:
+                resolved = command.name, self.invalid, (cmd,)
+            else:
+                resolved = command.name, command.usage, (cmd, rest)
+        if len(self.cache) >= self.cache_size:
+            self.cache = {}
+        self.cache[cmd] = resolved
+        return resolved
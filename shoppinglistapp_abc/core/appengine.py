@@ -6,6 +6,7 @@ sys.path.insert(0, 'core')
 # pylint: disable=unused-wildcard-import
 from shoppinglistapp.core.items import *  # noqa: E402
 from shoppinglistapp.core.shoppinglist import *  # noqa: E402
+from shoppinglistapp.core.prices import parse_price  # noqa: E402
 
 
 class AppEngine:
@@ -16,25 +17,13 @@ class AppEngine:
         self.continue_execution = True
         self.message = None
         self.correct_answer = None
+        # set to 'error' by a command that was rejected
         self.status = None
 
     def process_answer(self, cmd):
         """this function is used to determine if input is integer or float"""
-        if (isinstance(cmd, str) and '.' in cmd):
-            split = cmd.split('.')
-            if len(split) > 2:
-                answer = None
-            elif not split[0].isdigit():
-                answer = None
-            elif (not split[1].isdigit()) or (int(split[1]) < 0):
-                answer = None
-            else:
-                answer = round(float(cmd), 2)
-        elif (isinstance(cmd, str) and not cmd.isdigit()):
-            answer = None
-        else:
-            answer = round(float(cmd), 2)
-        if answer is not None:
+        answer = parse_price(cmd)
+        if answer is not None and answer >= 0:
             if answer == self.correct_answer:
                 self.message = 'Correct!'
             else:
@@ -43,63 +32,53 @@ class AppEngine:
                                 'You answered '
                                 f'${answer:.02f}.')
         else:
-            self.message = 'Your answer ("' + cmd + '") is not a number.'
+            self.message = f'Your answer ("{cmd}") is not a number.'
+            self.status = 'error'
 #            self.message = 'The provided answer is not a valid number!'
         self.correct_answer = None
 
     def process_add_item(self, cmd):
         """this function is used to process when command needs to add items"""
-        # pylint: disable=too-many-branches
         item_str = cmd[4:]
         item_tuple = item_str.split(': ')
-        if len(item_tuple) == 2:
-            if (isinstance(item_tuple[1], str) and '.' in item_tuple[1]):
-                split = item_tuple[1].split('.')
-                if len(split) > 2:
-                    answer = None
-                elif not split[0].isdigit():
-                    answer = None
-                elif (not split[1].isdigit()) or (int(split[1]) < 0):
-                    answer = None
-                else:
-                    answer = round(float(item_tuple[1]), 2)
-            elif (isinstance(item_tuple[1], str) and not item_tuple[1].isdigit()):
-                try:
-                    answer = round(float(item_tuple[1]), 2)
-                except ValueError:
-                    answer = None
-            else:
-                answer = round(float(item_tuple[1]), 2)
-        else:
-            answer = item_tuple
+        if len(item_tuple) != 2:
+            self.add_usage(item_str)
+            return
+        self.add_item(*item_tuple)
 
-        if answer is not None:
-            if len(item_tuple) == 2:
-                name, price = item_tuple
-                if not name:
-                    self.message = "Item name string cannot be empty."
-                elif name in self.items.items:
-                    self.message = "Duplicate!"
-                elif float(price) < 0:
-                    price = str(round(float(price), 1))
-                    self.message = (f'The price argument ("{price}") does not appear to be any of the following: float, an integer, or a string that can be parsed to a non-negative float.')
-                else:
-                    item = Item(name, price)
-                    self.items.add_item(item)
-                    self.message = f'{name} ({float(price)}) added successfully.'
-#                    self.message = f'{item} added successfully.'
-            else:
-                self.message = f'Cannot add "{item_str}".\n'
-                self.message += 'Usage: add <item_name>: <item_price>'
-        else:
+    def add_usage(self, item_str):
+        """this function is used when an add command cannot be parsed"""
+        self.message = f'Cannot add "{item_str}".\n'
+        self.message += 'Usage: add <item_name>: <item_price>'
+        self.status = 'error'
+
+    def add_item(self, name, price_str):
+        """this function is used to add an item from its parsed arguments"""
+        price = parse_price(price_str)
+        if price is None:
             self.message = ("could not convert string to float: '" +
-                            item_tuple[1] + "'")
+                            price_str + "'")
+        elif not name:
+            self.message = "Item name string cannot be empty."
+        elif name in self.items:
+            self.message = "Duplicate!"
+        elif price <= 0:
+            self.message = (f'The price argument ("{round(float(price), 1)}") does not appear to be any of the following: float, an integer, or a string that can be parsed to a non-negative float.')
+        else:
+            self.items.add_item(Item(name, price))
+            self.message = f'{name} ({float(price)}) added successfully.'
+            return
+        self.status = 'error'
 
     def process_del_item(self, cmd):
         """this function is used when command wants to delete item from pool"""
-        item_name = cmd[4:]
-        if item_name in self.items.items:
+        self.del_item(cmd[4:])
+
+    def del_item(self, item_name):
+        """this function is used to delete an item by its parsed name"""
+        if item_name in self.items:
             self.items.remove_item(item_name)
             self.message = f'{item_name} removed successfully.'
         else:
             self.message = f'Item named "{item_name}" is not present in the item pool.'
+            self.status = 'error'
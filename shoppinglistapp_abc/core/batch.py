@@ -0,0 +1,164 @@
+"""module used to generate shopping lists in bulk
+
+a batch of N lists of k lines is held as an N x k matrix of pool rows and
+an N x k matrix of quantities. line prices and totals are computed for
+the whole batch at once: gather the price column at the row matrix,
+multiply by the quantities, sum every row. NumPy is used when it is
+installed; otherwise the same matrices are kept in flat arrays and
+filled by plain loops"""
+import random
+from array import array
+
+from shoppinglistapp.core.errors import (InvalidShoppingListSizeError,
+                                         StaleShoppingListError)
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.sampling import sample_indices
+from shoppinglistapp.core.shoppinglist import (CompactShoppingList,
+                                             ShoppingList, pool_layout)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+# random keys drawn at once when a list takes most of the pool
+DENSE_KEYS = 2 ** 20
+
+
+class ShoppingListBatch:
+    """class used to hold a batch of generated shopping lists
+
+    indices, quantities and line_prices are count x size matrices (NumPy
+    arrays, or flat row-major arrays without NumPy) and totals holds the
+    total of every list in cents. the indices are rows of the pool
+    snapshot the batch was drawn from: building a list after rows of
+    that pool moved raises StaleShoppingListError"""
+    def __init__(self, pool, size, indices, quantities, line_prices, totals):
+        self.pool = pool
+        self.layout = pool_layout(pool)
+        self.size = size
+        self.indices = indices
+        self.quantities = quantities
+        self.line_prices = line_prices
+        self.totals = totals
+
+    def __len__(self):
+        return len(self.totals)
+
+    def _row(self, matrix, i):
+        if np is not None and isinstance(matrix, np.ndarray):
+            return matrix[i].tolist()
+        return matrix[i * self.size:(i + 1) * self.size].tolist()
+
+    def get_total_price(self, i):
+        """function to get the total of the i-th list"""
+        return Money(int(self.totals[i]))
+
+    def _checked_pool(self):
+        if pool_layout(self.pool) != self.layout:
+            raise StaleShoppingListError()
+        return self.pool
+
+    def get_list(self, i):
+        """function to build the i-th list as a ShoppingList on demand"""
+        pool = self._checked_pool()
+        shopping_list = ShoppingList()
+        shopping_list.list = [
+            (pool.item_at(row), quantity)
+            for row, quantity in zip(self._row(self.indices, i),
+                                     self._row(self.quantities, i))]
+        shopping_list.version += 1
+        shopping_list.watch(pool)
+        return shopping_list
+
+    def get_compact(self, i):
+        """function to build the i-th list as a CompactShoppingList"""
+        return CompactShoppingList(self._checked_pool(),
+                                   self._row(self.indices, i),
+                                   self._row(self.quantities, i))
+
+
+def _check_size(pool, size):
+    if not isinstance(size, int) or size < 1:
+        raise ValueError()
+    if size > pool.get_size():
+        raise InvalidShoppingListSizeError()
+
+
+def _numpy_rows(generator, population, count, size):
+    """draw count rows of size distinct indices in a few vector steps"""
+    if size * 2 > population:
+        return _dense_rows(generator, population, count, size)
+    rows = generator.integers(0, population, size=(count, size))
+    pending = np.arange(count)
+    while pending.size:
+        # redraw only the entries repeating an earlier entry of their row;
+        # at most half the population is drawn, so every round redraws
+        # at most half of the entries of the round before
+        drawn = rows[pending]
+        order = np.argsort(drawn, axis=1, kind='stable')
+        ordered = np.take_along_axis(drawn, order, axis=1)
+        clash_rows, clash_cols = np.nonzero(ordered[:, 1:] == ordered[:, :-1])
+        drawn[clash_rows, order[clash_rows, clash_cols + 1]] = \
+            generator.integers(0, population, size=clash_rows.size)
+        rows[pending] = drawn
+        pending = pending[np.unique(clash_rows)]
+    return rows
+
+
+def _dense_rows(generator, population, count, size):
+    """draw rows holding more than half the population: the size first
+    indices of a random permutation, taken by sorting random keys
+
+    the keys are drawn DENSE_KEYS at a time (whole rows) and only the size
+    smallest of a row are sorted"""
+    rows = np.empty((count, size), dtype=np.int64)
+    step = max(1, DENSE_KEYS // population)
+    for start in range(0, count, step):
+        keys = generator.random((min(step, count - start), population))
+        smallest = np.argpartition(keys, size - 1, axis=1)[:, :size]
+        order = np.argsort(np.take_along_axis(keys, smallest, axis=1),
+                           axis=1)
+        rows[start:start + len(keys)] = np.take_along_axis(smallest, order,
+                                                           axis=1)
+    return rows
+
+
+def generate_lists(pool, count, size, seed=None, use_numpy=None):
+    """function to create count shopping lists of size distinct items
+
+    quantities are drawn from 1-9 like ShoppingList.refresh does. the
+    same seed gives the same batch (for a given use_numpy setting)"""
+    pool = pool.snapshot()
+    _check_size(pool, size)
+    if use_numpy is None:
+        use_numpy = np is not None
+    prices = pool.price_column()
+    population = len(prices)
+    if use_numpy:
+        generator = np.random.default_rng(seed)
+        indices = _numpy_rows(generator, population, count, size)
+        quantities = generator.integers(1, 10, size=(count, size),
+                                        dtype=np.uint8)
+        line_prices = np.frombuffer(prices, dtype=np.int64)[indices] * \
+            quantities
+        totals = line_prices.sum(axis=1)
+        return ShoppingListBatch(pool, size, indices, quantities,
+                                 line_prices, totals)
+    rng = random.Random(seed)
+    indices = array('q')
+    quantities = array('B')
+    line_prices = array('q')
+    totals = array('q')
+    for _ in range(count):
+        total = 0
+        for row in sample_indices(population, size, rng):
+            quantity = rng.randint(1, 9)
+            line = prices[row] * quantity
+            indices.append(row)
+            quantities.append(quantity)
+            line_prices.append(line)
+            total += line
+        totals.append(total)
+    return ShoppingListBatch(pool, size, indices, quantities, line_prices,
+                             totals)
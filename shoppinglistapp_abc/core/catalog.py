@@ -0,0 +1,421 @@
+"""module used for the memory-mapped binary item catalog
+
+a catalog file is laid out as (all integers little-endian)::
+
+    header   magic, format version, item count, max name length,
+             max price order, names blob size
+    offsets  count + 1 uint64 offsets of every name in the names blob
+    prices   count int64 prices in cents
+    order    count uint32 rows sorted by (price, name)
+    names    utf-8 names, sorted, back to back
+
+row i of the catalog is the i-th name in sorted order, so lookups are a
+binary search over the mapped name table and sorted output is a plain
+scan of the rows. the price queries binary search the order section
+the same way."""
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import islice
+
+from shoppinglistapp.core.errors import (InvalidItemPoolError,
+                                         NonExistingItemError,
+                                         DuplicateItemError,
+                                         InvalidCatalogError)
+from shoppinglistapp.core.index import SortedBlocks
+from shoppinglistapp.core.items import Item, ItemPool, BaseItemPool
+from shoppinglistapp.core.money import Money
+
+MAGIC = b'SLCATLG\0'
+FORMAT_VERSION = 3
+HEADER = struct.Struct('<8sIQIiQ')
+
+
+def write_catalog(pool, path):
+    """function to write the items of any pool to a catalog file
+
+    the file is written next to path and moved over it once complete, so
+    an existing catalog is replaced atomically"""
+    count = pool.get_size()
+    names_start = HEADER.size + (2 * count + 1) * 8 + count * 4
+    offsets = array('Q', [0])
+    prices = array('q')
+    # the maxima are taken from the rows written: those a pool reports
+    # can still count removed items
+    max_name, max_order = 0, 0
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.seek(names_start)
+        for item_name in pool.sorted_names():
+            item = pool.get_item(item_name)
+            encoded = item_name.encode('utf-8')
+            out.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            prices.append(item.price.cents)
+            max_name = max(max_name, len(item_name))
+            max_order = max(max_order, item.get_order())
+        order = price_order(prices)
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, max_name,
+                              max_order, offsets[-1]))
+        if sys.byteorder != 'little':
+            offsets.byteswap()
+            prices.byteswap()
+            order.byteswap()
+        out.write(offsets.tobytes())
+        out.write(prices.tobytes())
+        out.write(order.tobytes())
+    os.replace(tmp_path, path)
+
+
+def encode_catalog(pool):
+    """function to lay out the items of any pool as a catalog in memory
+
+    returns the parts of the catalog (header, offsets, prices, order,
+    names) as bytes-like objects, to be written back to back"""
+    names = []
+    offsets = array('Q', [0])
+    prices = array('q')
+    total = 0
+    max_name, max_order = 0, 0
+    for item_name in pool.sorted_names():
+        item = pool.get_item(item_name)
+        encoded = item_name.encode('utf-8')
+        names.append(encoded)
+        total += len(encoded)
+        offsets.append(total)
+        prices.append(item.price.cents)
+        max_name = max(max_name, len(item_name))
+        max_order = max(max_order, item.get_order())
+    order = price_order(prices)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(names), max_name,
+                         max_order, total)
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+        prices.byteswap()
+        order.byteswap()
+    return [header, offsets, prices, order, b''.join(names)]
+
+
+def price_order(prices):
+    """function to get the rows sorted by (price, name) from the prices of
+    rows in name order: the sort is stable, so rows of one price keep
+    their name order"""
+    return array('I', sorted(range(len(prices)), key=prices.__getitem__))
+
+
+class CatalogReader:
+    """class used to read a catalog laid out in any bytes-like buffer
+
+    nothing is copied: names, offsets, prices and the price order are
+    read straight from the buffer (an mmap, or a shared memory block)"""
+    def __init__(self, buffer, path='<buffer>'):
+        if len(buffer) < HEADER.size:
+            raise InvalidCatalogError(path)
+        (magic, version, self.count, self.max_name_length, self.max_order,
+         names_size) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise InvalidCatalogError(path)
+        self.buffer = buffer
+        view = memoryview(buffer)
+        offsets_start = HEADER.size
+        prices_start = offsets_start + (self.count + 1) * 8
+        order_start = prices_start + self.count * 8
+        self.names_start = order_start + self.count * 4
+        if len(buffer) < self.names_start + names_size or \
+                sys.byteorder != 'little':
+            raise InvalidCatalogError(path)
+        self.offsets = view[offsets_start:prices_start].cast('Q')
+        self.prices = view[prices_start:order_start].cast('q')
+        self.order = view[order_start:self.names_start].cast('I')
+
+    def name_bytes(self, row):
+        """function to get the utf-8 bytes of the name at a row"""
+        start = self.names_start
+        return bytes(self.buffer[start + self.offsets[row]:
+                                 start + self.offsets[row + 1]])
+
+    def name_at(self, row):
+        """function to decode the name stored at a row"""
+        return self.name_bytes(row).decode('utf-8')
+
+    def item_at(self, row):
+        """function to build the Item stored at a row"""
+        item = Item.__new__(Item)
+        item.name = self.name_at(row)
+        item.price = Money(self.prices[row])
+        return item
+
+    def position(self, item_name):
+        """function to binary search the row a name has or would have"""
+        key = item_name.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.name_bytes(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def price_position(self, cents):
+        """function to binary search the first position of the price order
+        priced at cents or more"""
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self.prices[self.order[mid]] < cents:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def find(self, item_name):
+        """function to get the row of a name, None when it is absent"""
+        row = self.position(item_name)
+        if row < self.count and self.name_at(row) == item_name:
+            return row
+        return None
+
+    def release(self):
+        """function to release the views held on the buffer"""
+        self.offsets.release()
+        self.prices.release()
+        self.order.release()
+
+
+class MappedItemPool(BaseItemPool):
+    """class used to serve an item pool straight from a catalog file
+
+    the catalog is opened through mmap and only the pages touched by a
+    lookup, a sample or a rendered page are read. mutations go to an
+    in-memory overlay (an ItemPool of added items and a set of removed
+    catalog rows) until compact() writes them back to disk. the column
+    maxima of removed catalog rows are kept until the next compaction.
+    the removed rows are also kept in sorted order, so dense rows and
+    sorted positions are found by binary search over the catalog and
+    the removed rows"""
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.reader = None
+        self.added = ItemPool()
+        self.deleted = set()
+        self._deleted_rows = SortedBlocks()
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        except ValueError as exc:
+            self.file.close()
+            raise InvalidCatalogError(self.path) from exc
+        self.reader = CatalogReader(self.map, self.path)
+
+    def close(self):
+        """function to unmap the catalog file"""
+        if self.reader is not None:
+            self.reader.release()
+            self.map.close()
+            self.file.close()
+            self.reader = None
+
+    def _live_row(self, item_name):
+        row = self.reader.find(item_name)
+        if row is None or row in self.deleted:
+            return None
+        return row
+
+    def __contains__(self, item_name):
+        return (item_name in self.added or
+                self._live_row(item_name) is not None)
+
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+        if item_name in self.added:
+            return self.added.get_item(item_name)
+        row = self._live_row(item_name)
+        if row is None:
+            raise NonExistingItemError(item_name)
+        return self.reader.item_at(row)
+
+    def add_item(self, item):
+        """function to add item to the pool overlay"""
+        if not isinstance(item, Item):
+            raise InvalidItemPoolError()
+        if item.name in self:
+            raise DuplicateItemError()
+        self.added.add_item(item)
+        self.version += 1
+
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+        if item_name in self.added:
+            self.added.remove_item(item_name)
+        else:
+            row = self._live_row(item_name)
+            if row is None:
+                raise NonExistingItemError(item_name)
+            self.deleted.add(row)
+            self._deleted_rows.add(row)
+        self.version += 1
+
+    def get_size(self):
+        """function to get the size of the pool"""
+        return (self.reader.count - len(self.deleted) +
+                self.added.get_size())
+
+    def item_at(self, row):
+        """function to get the item at a dense row: the live catalog rows
+        in order, followed by the overlay rows"""
+        live = self.reader.count - len(self.deleted)
+        if row >= live:
+            return self.added.item_at(row - live)
+        return self.reader.item_at(self._catalog_row(row))
+
+    def _catalog_row(self, live_row):
+        """the catalog row holding the live_row-th live catalog row: the
+        smallest row with live_row + 1 live rows up to it"""
+        deleted = self._deleted_rows
+        if not deleted:
+            return live_row
+        low, high = live_row, live_row + len(deleted)
+        while low < high:
+            mid = (low + high) // 2
+            if mid + 1 - deleted.position(mid + 1) <= live_row:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+        for row in range(self.reader.count):
+            if row not in self.deleted:
+                item = self.reader.item_at(row)
+                yield item.name, item
+        yield from self.added.iter_items()
+
+    def _catalog_names(self, start=0):
+        for row in range(start, self.reader.count):
+            if row not in self.deleted:
+                yield self.reader.name_at(row)
+
+    def sorted_names(self):
+        """function to iterate over the item names in sorted order"""
+        if not self.added.get_size():
+            return self._catalog_names()
+        return heapq.merge(self._catalog_names(),
+                           self.added.sorted_names())
+
+    def sorted_names_slice(self, start, stop):
+        """function to get the sorted names between two positions
+
+        the number of live catalog names before start is binary searched
+        (a catalog name sits at its live row plus the overlay names below
+        it), then the page is merged from both sides"""
+        live = self.reader.count - len(self.deleted)
+        added = self.added
+        stop = min(stop, live + added.get_size())
+        if start >= stop:
+            return []
+        low, high = max(start - added.get_size(), 0), min(start, live)
+        while low < high:
+            mid = (low + high) // 2
+            name = self.reader.name_at(self._catalog_row(mid))
+            if mid + added.sorted_position(name) < start:
+                low = mid + 1
+            else:
+                high = mid
+        count = stop - start
+        catalog = ()
+        if low < live:
+            catalog = islice(self._catalog_names(self._catalog_row(low)),
+                             count)
+        return list(islice(heapq.merge(
+            catalog, added.sorted_names_slice(start - low,
+                                              start - low + count)),
+            count))
+
+    def sorted_position(self, item_name):
+        """function to get the sorted position of a (possibly absent) name"""
+        row = self.reader.position(item_name)
+        return (row - self._deleted_rows.position(row) +
+                self.added.sorted_position(item_name))
+
+    def max_name_length(self):
+        """function to get the length of the longest item name"""
+        return max(self.reader.max_name_length,
+                   self.added.max_name_length())
+
+    def max_order(self):
+        """function to get the largest price order of the pool"""
+        return max(self.reader.max_order, self.added.max_order())
+
+    def _by_price(self, positions):
+        """(cents, name) of the live catalog rows at positions of the price
+        order"""
+        reader = self.reader
+        for position in positions:
+            row = reader.order[position]
+            if row not in self.deleted:
+                yield reader.prices[row], reader.name_at(row)
+
+    def price_range(self, low, high):
+        """function to get the names of the items priced from low to high
+        (both included), cheapest first; the catalog order section and
+        the overlay index are both searched in O(log n)"""
+        low = Money.from_value(low).cents
+        high = Money.from_value(high).cents
+        start = self.reader.price_position(low)
+        stop = self.reader.price_position(high + 1)
+        return [name for _, name in heapq.merge(
+            self._by_price(range(start, stop)),
+            self.added.index.by_price.irange(low, high))]
+
+    def cheapest(self, count):
+        """function to get the names of the count cheapest items"""
+        return [name for _, name in islice(heapq.merge(
+            self._by_price(range(self.reader.count)),
+            self.added.index.by_price.head(count)), max(count, 0))]
+
+    def most_expensive(self, count):
+        """function to get the names of the count most expensive items,
+        most expensive first"""
+        return [name for _, name in islice(heapq.merge(
+            self._by_price(range(self.reader.count - 1, -1, -1)),
+            self.added.index.by_price.tail(count), reverse=True),
+            max(count, 0))]
+
+    def compact(self, path=None):
+        """function to write catalog and overlay back to a catalog file
+
+        the pool then serves the new file with an empty overlay"""
+        path = path or self.path
+        write_catalog(self, f'{path}.compact')
+        self.close()
+        os.replace(f'{path}.compact', path)
+        self.path = path
+        self.added = ItemPool()
+        self.deleted = set()
+        self._deleted_rows = SortedBlocks()
+        self._open()
+        self.version += 1
+
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes
+
+        the mapped file is not counted: its pages belong to the page
+        cache and are only read in when touched"""
+        return (sys.getsizeof(self) + self.added.get_memory_usage() +
+                sys.getsizeof(self.deleted) +
+                self._deleted_rows.get_memory_usage())
+
+    def __repr__(self):
+        return f'MappedItemPool({self.path!r})'
@@ -0,0 +1,173 @@
+"""module used for the columnar, array-backed item pool"""
+import sys
+from array import array
+from collections.abc import Mapping
+
+from shoppinglistapp.core.errors import (InvalidItemPoolError,
+                                         NonExistingItemError,
+                                         DuplicateItemError)
+from shoppinglistapp.core.index import PoolIndex
+from shoppinglistapp.core.items import Item, BaseItemPool
+from shoppinglistapp.core.money import Money
+
+
+class ColumnarItemsView(Mapping):
+    """read-only name -> Item mapping over the columns of a pool"""
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getitem__(self, item_name):
+        row = self._pool.rows.get(item_name)
+        if row is None:
+            raise KeyError(item_name)
+        return self._pool.item_at(row)
+
+    def __iter__(self):
+        return iter(self._pool.rows)
+
+    def __len__(self):
+        return len(self._pool.rows)
+
+    def __contains__(self, item_name):
+        return item_name in self._pool.rows
+
+
+class ColumnarItemPool(BaseItemPool):
+    """class used to store the item pool as columns
+
+    names are kept utf-8 encoded in one contiguous buffer, prices as
+    integer cents in a typed array and ``rows`` maps every name to its
+    row; removing an item moves the last row into the freed slot so rows
+    stay dense"""
+    def __init__(self, items=None):
+        if not items:
+            items = {}
+        if not isinstance(items, dict):
+            raise InvalidItemPoolError()
+        for key, val in items.items():
+            if not isinstance(key, str) or not isinstance(val, Item):
+                raise InvalidItemPoolError()
+        self.names = bytearray()
+        self.offsets = array('Q')
+        self.lengths = array('I')
+        self.prices = array('q')
+        self.rows = {}
+        self.dead_bytes = 0
+        self.index = PoolIndex()
+        for val in items.values():
+            self.add_item(val)
+
+    @property
+    def items(self):
+        """name -> Item view, kept for code written against ItemPool"""
+        return ColumnarItemsView(self)
+
+    def add_item(self, item):
+        """function to add item to the pool"""
+        if not isinstance(item, Item):
+            raise InvalidItemPoolError()
+        if item.name in self.rows:
+            raise DuplicateItemError()
+        encoded = item.name.encode('utf-8')
+        self.rows[item.name] = len(self.prices)
+        self.offsets.append(len(self.names))
+        self.lengths.append(len(encoded))
+        self.prices.append(item.price.cents)
+        self.names += encoded
+        self.index.add(item)
+        self.version += 1
+
+    def add_items(self, items):
+        """function to add a batch of items to the pool
+
+        nothing is added when any item of the batch is invalid"""
+        self.check_new_items(items)
+        for item in items:
+            encoded = item.name.encode('utf-8')
+            self.rows[item.name] = len(self.prices)
+            self.offsets.append(len(self.names))
+            self.lengths.append(len(encoded))
+            self.prices.append(item.price.cents)
+            self.names += encoded
+        self.index.add_many(items)
+        self.version += 1
+
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+        row = self.rows.pop(item_name, None)
+        if row is None:
+            raise NonExistingItemError(item_name)
+        self.index.remove(self.item_at(row))
+        self.dead_bytes += self.lengths[row]
+        last = len(self.prices) - 1
+        if row != last:
+            self.offsets[row] = self.offsets[last]
+            self.lengths[row] = self.lengths[last]
+            self.prices[row] = self.prices[last]
+            self.rows[self.name_at(row)] = row
+        self.offsets.pop()
+        self.lengths.pop()
+        self.prices.pop()
+        self.version += 1
+        if self.dead_bytes > len(self.names) // 2:
+            self.compact()
+
+    def compact(self):
+        """function to drop the bytes of removed names from the buffer"""
+        names = bytearray()
+        for row, offset in enumerate(self.offsets):
+            self.offsets[row] = len(names)
+            names += self.names[offset:offset + self.lengths[row]]
+        self.names = names
+        self.dead_bytes = 0
+
+    def name_at(self, row):
+        """function to decode the name stored at a row"""
+        offset = self.offsets[row]
+        return self.names[offset:offset + self.lengths[row]].decode('utf-8')
+
+    def item_at(self, row):
+        """function to build the Item stored at a row"""
+        item = Item.__new__(Item)
+        item.name = self.name_at(row)
+        item.price = Money(self.prices[row])
+        return item
+
+    def __contains__(self, item_name):
+        return item_name in self.rows
+
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+        row = self.rows.get(item_name)
+        if row is None:
+            raise NonExistingItemError(item_name)
+        return self.item_at(row)
+
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+        for row in range(len(self.prices)):
+            item = self.item_at(row)
+            yield item.name, item
+
+    def get_size(self):
+        """function to get the size of the pool"""
+        return len(self.prices)
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents
+
+        this is the pool's own column, it must not be modified"""
+        return self.prices
+
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes"""
+        size = (sys.getsizeof(self.names) + sys.getsizeof(self.offsets) +
+                sys.getsizeof(self.lengths) + sys.getsizeof(self.prices) +
+                sys.getsizeof(self.rows) +
+                self.index.get_memory_usage())
+        for name in self.rows:
+            size += sys.getsizeof(name)
+        return size
+
+    def __repr__(self):
+        return f'ColumnarItemPool({dict(self.items)})'
@@ -0,0 +1,171 @@
+"""module used for the item pool shared between threads"""
+import threading
+from contextlib import contextmanager
+
+from shoppinglistapp.core.items import BaseItemPool, ItemPool
+
+
+class ConcurrentItemPool(BaseItemPool):
+    """class used to share one item pool between reader and writer threads
+
+    the items live in an ItemPool that is never changed once published.
+    readers take the current snapshot (one attribute read) and work on
+    it without any lock; writers copy it under a lock, change the copy
+    and publish it in one assignment. the Item objects are shared by the
+    snapshots, so they must not be changed in place
+
+    a single read method is always consistent; several reads that must
+    agree with each other (size then rows, sorted names then items)
+    should go through one snapshot()"""
+    def __init__(self, items=None):
+        # the first snapshot must not share the caller's dict either
+        if isinstance(items, dict):
+            items = dict(items)
+        self._snapshot = ItemPool(items)
+        self._write_lock = threading.RLock()
+        self._draft = None
+        self.publishes = 0
+
+    def snapshot(self):
+        """function to get the current published ItemPool"""
+        return self._snapshot
+
+    @property
+    def version(self):
+        """version of the published snapshot"""
+        return self._snapshot.version
+
+    @property
+    def price_version(self):
+        """price version of the published snapshot"""
+        return self._snapshot.price_version
+
+    @contextmanager
+    def batch(self):
+        """context manager grouping writes under one publish
+
+        yields a private copy of the pool to change; it is published when
+        the block ends and dropped when the block raises, so a batch is
+        applied whole or not at all. nested batches share the outer copy"""
+        with self._write_lock:
+            if self._draft is not None:
+                yield self._draft
+                return
+            self._draft = self._snapshot.copy()
+            try:
+                yield self._draft
+                if self._draft.version != self._snapshot.version:
+                    self._snapshot = self._draft
+                    self.publishes += 1
+            finally:
+                self._draft = None
+
+    def add_item(self, item):
+        """function to add item to the pool"""
+        with self.batch() as pool:
+            pool.add_item(item)
+
+    def add_items(self, items):
+        """function to add a batch of items to the pool
+
+        nothing is added when any item of the batch is invalid"""
+        with self.batch() as pool:
+            pool.add_items(items)
+
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+        with self.batch() as pool:
+            pool.remove_item(item_name)
+
+    def update_price(self, item_name, price):
+        """function to change the price of an item"""
+        with self.batch() as pool:
+            pool.update_price(item_name, price)
+
+    def set_weight(self, item_name, weight):
+        """function to set the sampling weight of an item"""
+        with self.batch() as pool:
+            pool.set_weight(item_name, weight)
+
+    def set_weights(self, weights):
+        """function to set the sampling weights of several items"""
+        with self.batch() as pool:
+            pool.set_weights(weights)
+
+    def get_weight(self, item_name):
+        """function to get the sampling weight of an item"""
+        return self._snapshot.get_weight(item_name)
+
+    def __contains__(self, item_name):
+        return item_name in self._snapshot
+
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+        return self._snapshot.get_item(item_name)
+
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+        return self._snapshot.iter_items()
+
+    def get_size(self):
+        """function to get the size of the pool"""
+        return self._snapshot.get_size()
+
+    def item_at(self, row):
+        """function to get the item stored at a dense row index"""
+        return self._snapshot.item_at(row)
+
+    def sample_items(self, sample_size, rng=None):
+        """function to get a random number of item pool"""
+        return self._snapshot.sample_items(sample_size, rng)
+
+    def sample_weighted(self, sample_size, rng=None):
+        """function to get a random number of items drawn by weight"""
+        return self._snapshot.sample_weighted(sample_size, rng)
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents"""
+        return self._snapshot.price_column()
+
+    def sorted_names(self):
+        """function to get the item names in sorted order"""
+        return self._snapshot.sorted_names()
+
+    def sorted_names_slice(self, start, stop):
+        """function to get the sorted names between two positions"""
+        return self._snapshot.sorted_names_slice(start, stop)
+
+    def sorted_position(self, item_name):
+        """function to get the sorted position of a (possibly absent) name"""
+        return self._snapshot.sorted_position(item_name)
+
+    def max_name_length(self):
+        """function to get the length of the longest item name"""
+        return self._snapshot.max_name_length()
+
+    def max_order(self):
+        """function to get the largest price order of the pool"""
+        return self._snapshot.max_order()
+
+    def price_range(self, low, high):
+        """function to get the names of the items priced from low to high
+        (both included), cheapest first"""
+        return self._snapshot.price_range(low, high)
+
+    def cheapest(self, count):
+        """function to get the names of the count cheapest items"""
+        return self._snapshot.cheapest(count)
+
+    def most_expensive(self, count):
+        """function to get the names of the count most expensive items,
+        most expensive first"""
+        return self._snapshot.most_expensive(count)
+
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes
+
+        only the published snapshot is counted"""
+        return self._snapshot.get_memory_usage()
+
+    def __repr__(self):
+        return f'ConcurrentItemPool({self._snapshot.items})'
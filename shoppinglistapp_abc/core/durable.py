@@ -0,0 +1,308 @@
+"""module used to keep an item pool on disk with a write-ahead log
+
+a pool directory holds checkpoints and logs numbered by generation::
+
+    checkpoint-<n>.snap   snapshot (core.snapshot) of every change logged
+                          before generation n
+    wal-<n>.log           msgpack records ['+', name, cents] (add),
+                          ['-', name] (remove) and ['=', name, cents]
+                          (price change) of the changes of generation n
+
+the pool is recovered by reading the newest checkpoint and replaying the
+logs from its generation on; a record cut short by a crash ends its log.
+every open starts a new generation, so nothing is ever appended after a
+torn record. compaction seals the current log, and a background thread
+folds the sealed logs into the next checkpoint, then deletes them"""
+import os
+import re
+import threading
+import time
+
+import msgpack
+
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.snapshot import read_snapshot, write_snapshot
+
+FILE_NAME = re.compile(r'(checkpoint|wal)-(\d+)\.(snap|log)')
+
+
+def _fsync_dir(directory):
+    """make the creation, rename or deletion of directory entries durable"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """class used to append records to a log file with group commit
+
+    a record is written to the file when it is appended, so it survives a
+    crash of the process; it is on disk once a flusher thread fsyncs the
+    file, which it does at most once every commit_window seconds for all
+    the records appended meanwhile. sync() waits until every record
+    appended before it is on disk. a commit_window of 0 fsyncs every
+    record before append returns"""
+    def __init__(self, path, commit_window=0.01):
+        self.path = path
+        self.commit_window = commit_window
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                          0o644)
+        self.packer = msgpack.Packer()
+        self.size = os.fstat(self.fd).st_size
+        self.appended = 0
+        self.synced = 0
+        self.syncs = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.flusher = None
+        if commit_window > 0:
+            self.flusher = threading.Thread(target=self._flush_loop,
+                                            daemon=True)
+            self.flusher.start()
+
+    def append(self, records):
+        """function to append a list of records in one write"""
+        data = b''.join(self.packer.pack(record) for record in records)
+        with self.cond:
+            os.write(self.fd, data)
+            self.size += len(data)
+            self.appended += 1
+            if self.flusher is None:
+                self._fsync(self.appended)
+            else:
+                self.cond.notify_all()
+
+    def _fsync(self, target):
+        os.fsync(self.fd)
+        self.syncs += 1
+        self.synced = max(self.synced, target)
+
+    def _flush_loop(self):
+        while True:
+            with self.cond:
+                while self.synced == self.appended and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+            # let the commit window fill up before paying for the fsync
+            time.sleep(self.commit_window)
+            with self.cond:
+                if self.closed:
+                    return
+                target = self.appended
+            os.fsync(self.fd)
+            with self.cond:
+                self.syncs += 1
+                self.synced = max(self.synced, target)
+                self.cond.notify_all()
+
+    def sync(self):
+        """function to wait until the appended records are on disk"""
+        with self.cond:
+            target = self.appended
+            while self.synced < target and not self.closed:
+                self.cond.wait()
+
+    def close(self):
+        """function to fsync what is left and close the log"""
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        if self.flusher is not None:
+            self.flusher.join()
+        with self.cond:
+            self._fsync(self.appended)
+            os.close(self.fd)
+            self.cond.notify_all()
+
+
+def read_log(path):
+    """generator yielding the records of a log, up to the first torn one"""
+    with open(path, 'rb') as stream:
+        unpacker = msgpack.Unpacker(stream, raw=False)
+        try:
+            yield from unpacker
+        except (msgpack.ExtraData, ValueError):
+            return
+
+
+def apply_log(path, item_pool):
+    """function to replay the records of a log on an item pool"""
+    for record in read_log(path):
+        if record[0] == '+':
+            item_pool.add_item(Item.from_cents(record[1], record[2]))
+        elif record[0] == '=':
+            item_pool.update_price(record[1], Money(record[2]))
+        else:
+            item_pool.remove_item(record[1])
+
+
+def list_generations(directory):
+    """function to get the sorted checkpoint and log generations of a
+    pool directory"""
+    checkpoints, logs = [], []
+    for name in os.listdir(directory):
+        match = FILE_NAME.fullmatch(name)
+        if match is not None:
+            kind, generation = match.group(1), int(match.group(2))
+            (checkpoints if kind == 'checkpoint' else logs).append(generation)
+    return sorted(checkpoints), sorted(logs)
+
+
+class DurableItemPool(ItemPool):
+    """class used to keep an ItemPool durable in a directory
+
+    add_item, add_items, remove_item and update_price append their
+    change to a WriteAheadLog before applying it, so a change is lost in
+    a crash of the machine only if it was made less than commit_window
+    seconds before (call sync() to wait for it). once the log reaches
+    compact_bytes a background compaction is started. weights are not
+    logged"""
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, directory, commit_window=0.01,
+                 compact_bytes=64 * 2 ** 20):
+        super().__init__()
+        self.directory = directory
+        self.commit_window = commit_window
+        self.compact_bytes = compact_bytes
+        self.wal = None
+        self.compactions = 0
+        self._compactor = None
+        self._write_lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        last = self._load(self)
+        checkpoints, logs = list_generations(directory)
+        self.generation = max([last, *checkpoints, *logs]) + 1
+        self.wal = WriteAheadLog(self._path('wal', self.generation),
+                                 commit_window)
+        _fsync_dir(directory)
+
+    def _path(self, kind, generation):
+        extension = 'snap' if kind == 'checkpoint' else 'log'
+        return os.path.join(self.directory,
+                            f'{kind}-{generation:08}.{extension}')
+
+    def _load(self, item_pool, upto=None):
+        """load the newest checkpoint and the later logs (up to generation
+        upto) into item_pool, return the newest generation loaded"""
+        checkpoints, logs = list_generations(self.directory)
+        start = checkpoints[-1] if checkpoints else 0
+        if checkpoints:
+            read_snapshot(self._path('checkpoint', start), item_pool)
+        last = start
+        for generation in logs:
+            if generation >= start and (upto is None or generation <= upto):
+                apply_log(self._path('wal', generation), item_pool)
+                last = generation
+        return last
+
+    def add_item(self, item):
+        """function to add item to the pool"""
+        if self.wal is None:
+            super().add_item(item)
+            return
+        with self._write_lock:
+            self.check_new_items([item])
+            self._log([['+', item.name, item.price.cents]])
+            super().add_item(item)
+
+    def add_items(self, items):
+        """function to add a batch of items to the pool
+
+        nothing is added when any item of the batch is invalid"""
+        if self.wal is None:
+            super().add_items(items)
+            return
+        with self._write_lock:
+            self.check_new_items(items)
+            self._log([['+', item.name, item.price.cents]
+                       for item in items])
+            super().add_items(items)
+
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+        if self.wal is None:
+            super().remove_item(item_name)
+            return
+        with self._write_lock:
+            self.get_item(item_name)
+            self._log([['-', item_name]])
+            super().remove_item(item_name)
+
+    def update_price(self, item_name, price):
+        """function to change the price of an item"""
+        if self.wal is None:
+            super().update_price(item_name, price)
+            return
+        with self._write_lock:
+            cents = Item(item_name, price).price.cents
+            self.get_item(item_name)
+            self._log([['=', item_name, cents]])
+            super().update_price(item_name, Money(cents))
+
+    def _log(self, records):
+        self.wal.append(records)
+        if self.wal.size >= self.compact_bytes:
+            self.compact()
+
+    def sync(self):
+        """function to wait until every change made so far is on disk"""
+        self.wal.sync()
+
+    def compact(self, wait=False):
+        """function to fold the logs into a new checkpoint
+
+        the current log is sealed and a new one started; the checkpoint
+        is written by a background thread (one at a time) which is
+        returned, or joined first when wait is true"""
+        with self._write_lock:
+            thread = self._compactor
+            if thread is None or not thread.is_alive():
+                self.wal.close()
+                sealed = self.generation
+                self.generation += 1
+                self.wal = WriteAheadLog(self._path('wal', self.generation),
+                                         self.commit_window)
+                _fsync_dir(self.directory)
+                thread = threading.Thread(target=self._compact,
+                                          args=(sealed,), daemon=True)
+                self._compactor = thread
+                thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def _compact(self, sealed):
+        # the live pool is not touched: the checkpoint is rebuilt from the
+        # previous one and the sealed logs
+        pool = ItemPool()
+        self._load(pool, upto=sealed)
+        path = self._path('checkpoint', sealed + 1)
+        write_snapshot(path, pool)
+        with open(path, 'rb') as stream:
+            os.fsync(stream.fileno())
+        _fsync_dir(self.directory)
+        checkpoints, logs = list_generations(self.directory)
+        for generation in checkpoints:
+            if generation <= sealed:
+                os.remove(self._path('checkpoint', generation))
+        for generation in logs:
+            if generation <= sealed:
+                os.remove(self._path('wal', generation))
+        _fsync_dir(self.directory)
+        self.compactions += 1
+
+    def close(self):
+        """function to finish a running compaction and close the log"""
+        with self._write_lock:
+            if self._compactor is not None:
+                self._compactor.join()
+            self.wal.close()
+
+    def __repr__(self):
+        return f'DurableItemPool({self.directory!r})'
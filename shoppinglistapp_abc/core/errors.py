@@ -47,3 +47,34 @@ class InvalidShoppingListSizeError(Exception):
     """this class is used when the list size input is invalid"""
     def __init__(self):
         super().__init__('Invalid List Size!')
+
+
+class InvalidCatalogError(Exception):
+    """this class is used when a file is not a readable item catalog"""
+    def __init__(self, path):
+        super().__init__(f'"{path}" is not a valid item catalog file.')
+
+
+class InvalidSnapshotError(Exception):
+    """this class is used when a file is not a readable session snapshot"""
+    def __init__(self, path):
+        super().__init__(f'"{path}" is not a valid session snapshot file.')
+
+
+class InvalidJournalError(Exception):
+    """this class is used when a file is not a readable command journal"""
+    def __init__(self, path):
+        super().__init__(f'"{path}" is not a valid command journal file.')
+
+
+class StaleShoppingListError(Exception):
+    """this class is used when a compact shopping list is read after its
+    item pool changed"""
+    def __init__(self):
+        super().__init__('The item pool changed since the list was drawn.')
+
+
+class ReadOnlyItemPoolError(Exception):
+    """this class is used when a read-only item pool is asked to change"""
+    def __init__(self):
+        super().__init__('The item pool is read-only.')
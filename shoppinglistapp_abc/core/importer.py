@@ -0,0 +1,112 @@
+"""module used to bulk import item catalogs from CSV or JSON Lines"""
+import csv
+import json
+
+from shoppinglistapp.core.errors import (InvalidItemNameError,
+                                         InvalidItemPriceError)
+from shoppinglistapp.core.items import Item
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.prices import parse_prices
+
+
+class ImportResult:
+    """class used to report the outcome of an import
+
+    errors holds (line number, kind, message) tuples, kind being one of
+    'duplicate', 'invalid name', 'invalid price' or 'malformed row'; only
+    the first max_errors are kept but error_count counts them all"""
+    def __init__(self, max_errors=1000):
+        self.rows = 0
+        self.added = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, line, kind, message):
+        """function to record a rejected row"""
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, kind, message))
+
+    def __repr__(self):
+        return (f'ImportResult(rows={self.rows}, added={self.added}, '
+                f'errors={self.error_count})')
+
+
+def _flush(pool, batch, result):
+    """validate one batch of (line, name, price) rows and bulk insert it"""
+    prices, bad_prices = parse_prices([price for _, _, price in batch])
+    items = []
+    seen = set()
+    for (line, name, raw_price), price, bad_price in zip(batch, prices,
+                                                          bad_prices):
+        if not isinstance(name, str) or not name:
+            result.add_error(line, 'invalid name',
+                             str(InvalidItemNameError(name)))
+        elif bad_price or price <= 0:
+            result.add_error(line, 'invalid price',
+                             str(InvalidItemPriceError(raw_price)))
+        elif name in seen or name in pool:
+            result.add_error(line, 'duplicate', f'Duplicate item "{name}".')
+        else:
+            seen.add(name)
+            items.append(Item(name, Money(price)))
+    pool.add_items(items)
+    result.added += len(items)
+    batch.clear()
+
+
+def import_rows(pool, rows, batch_size=10000, result=None):
+    """function to import (line, name, price) rows into a pool
+
+    rows are consumed lazily and validated batch_size at a time, so the
+    memory used does not depend on the size of the input"""
+    if result is None:
+        result = ImportResult()
+    batch = []
+    for row in rows:
+        result.rows += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _flush(pool, batch, result)
+    _flush(pool, batch, result)
+    return result
+
+
+def import_csv(pool, stream, batch_size=10000):
+    """function to import name,price rows from a CSV text stream
+
+    a first row reading name,price is skipped as a header"""
+    result = ImportResult()
+
+    def rows():
+        for line, row in enumerate(csv.reader(stream), 1):
+            if line == 1 and [col.strip().lower() for col in row] == \
+                    ['name', 'price']:
+                continue
+            if len(row) != 2:
+                result.rows += 1
+                result.add_error(line, 'malformed row',
+                                 f'Expected 2 columns, got {len(row)}.')
+                continue
+            yield line, row[0], row[1].strip()
+    return import_rows(pool, rows(), batch_size, result)
+
+
+def import_jsonl(pool, stream, batch_size=10000):
+    """function to import {"name": ..., "price": ...} lines"""
+    result = ImportResult()
+
+    def rows():
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+                name, price = record['name'], record['price']
+            except (ValueError, KeyError, TypeError) as exc:
+                result.rows += 1
+                result.add_error(line, 'malformed row', str(exc))
+                continue
+            yield line, name, price
+    return import_rows(pool, rows(), batch_size, result)
@@ -0,0 +1,237 @@
+"""module used for the incrementally maintained item pool indexes"""
+import sys
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain, islice
+
+
+class SortedBlocks:
+    """class used to keep values in sorted order
+
+    the values are held in sorted blocks of at most 2 * BLOCK values, with
+    the last value of every block in a separate list. an insert or delete
+    finds its block by bisect and only shifts that block, where one flat
+    sorted list would shift every value above it"""
+    BLOCK = 512
+
+    def __init__(self, values=()):
+        self._build(sorted(values))
+
+    def _build(self, values):
+        self.blocks = [values[i:i + self.BLOCK]
+                       for i in range(0, len(values), self.BLOCK)]
+        self.maxes = [block[-1] for block in self.blocks]
+        self.size = len(values)
+
+    def copy(self):
+        """function to get an independent copy of the order"""
+        order = type(self).__new__(type(self))
+        order.blocks = [list(block) for block in self.blocks]
+        order.maxes = list(self.maxes)
+        order.size = self.size
+        return order
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return chain.from_iterable(self.blocks)
+
+    def add(self, value):
+        """function to insert a value"""
+        self.size += 1
+        if not self.blocks:
+            self.blocks.append([value])
+            self.maxes.append(value)
+            return
+        i = min(bisect_left(self.maxes, value), len(self.maxes) - 1)
+        block = self.blocks[i]
+        insort(block, value)
+        self.maxes[i] = block[-1]
+        if len(block) > 2 * self.BLOCK:
+            self.blocks[i:i + 1] = [block[:self.BLOCK], block[self.BLOCK:]]
+            self.maxes.insert(i, block[self.BLOCK - 1])
+
+    def extend(self, values):
+        """function to insert a batch of values
+
+        a small batch is inserted value by value, each shifting one block;
+        a batch of at least an eighth of the order is merged by one sort"""
+        values = sorted(values)
+        if len(values) * 8 < self.size:
+            for value in values:
+                self.add(value)
+        else:
+            self._build(sorted(chain(self, values)))
+
+    def remove(self, value):
+        """function to delete a value that is in the order"""
+        i = bisect_left(self.maxes, value)
+        block = self.blocks[i]
+        del block[bisect_left(block, value)]
+        self.size -= 1
+        if block:
+            self.maxes[i] = block[-1]
+        else:
+            del self.blocks[i]
+            del self.maxes[i]
+
+    def position(self, value):
+        """function to get the number of values below value"""
+        i = bisect_left(self.maxes, value)
+        if i == len(self.blocks):
+            return self.size
+        return (sum(map(len, self.blocks[:i])) +
+                bisect_left(self.blocks[i], value))
+
+    def slice(self, start, stop):
+        """function to get the values between two positions"""
+        values = []
+        skipped = 0
+        for block in self.blocks:
+            if skipped >= stop:
+                break
+            if skipped + len(block) > start:
+                values.extend(block[max(start - skipped, 0):stop - skipped])
+            skipped += len(block)
+        return values
+
+    def head(self, count):
+        """function to get the count first values"""
+        return list(islice(self, max(count, 0)))
+
+    def tail(self, count):
+        """function to get the count last values, last first"""
+        return list(islice(chain.from_iterable(
+            reversed(block) for block in reversed(self.blocks)),
+            max(count, 0)))
+
+    def get_memory_usage(self):
+        """function to get the approximate footprint of the blocks in bytes
+        (the values themselves are not counted)"""
+        return (sys.getsizeof(self.blocks) + sys.getsizeof(self.maxes) +
+                sum(map(sys.getsizeof, self.blocks)))
+
+
+class PriceOrder(SortedBlocks):
+    """class used to keep (cents, name) pairs in price order"""
+    def irange(self, low, high):
+        """function to iterate over the pairs from low to high cents"""
+        i = bisect_left(self.maxes, (low,))
+        if i == len(self.blocks):
+            return
+        block = self.blocks[i]
+        for pair in chain(islice(block, bisect_left(block, (low,)), None),
+                          chain.from_iterable(self.blocks[i + 1:])):
+            if pair[0] > high:
+                return
+            yield pair
+
+    def get_memory_usage(self):
+        """function to get the approximate footprint in bytes"""
+        size = super().get_memory_usage()
+        for block in self.blocks:
+            size += len(block) * sys.getsizeof(block[0])
+        return size
+
+
+class PoolIndex:
+    """class used to keep the sorted names and column maxima of a pool
+
+    the names and the (cents, name) pairs in price order are kept in
+    SortedBlocks, and name lengths and price orders are kept as
+    multisets so that their maxima stay correct after deletions without
+    rescanning the pool"""
+    def __init__(self, items=()):
+        items = list(items)
+        names = [item.name for item in items]
+        self.names = SortedBlocks(names)
+        self.by_price = PriceOrder((item.price.cents, item.name)
+                                   for item in items)
+        self.name_lengths = Counter(map(len, names))
+        self.orders = Counter(item.get_order() for item in items)
+        self._max_name = max(self.name_lengths, default=0)
+        self._max_order = max(self.orders, default=0)
+
+    def copy(self):
+        """function to get an independent copy of the index"""
+        index = PoolIndex.__new__(PoolIndex)
+        index.names = self.names.copy()
+        index.by_price = self.by_price.copy()
+        index.name_lengths = Counter(self.name_lengths)
+        index.orders = Counter(self.orders)
+        index._max_name = self._max_name
+        index._max_order = self._max_order
+        return index
+
+    def add(self, item):
+        """function to index an item added to the pool"""
+        self.names.add(item.name)
+        self.by_price.add((item.price.cents, item.name))
+        name_length = len(item.name)
+        order = item.get_order()
+        self.name_lengths[name_length] += 1
+        self.orders[order] += 1
+        self._max_name = max(self._max_name, name_length)
+        self._max_order = max(self._max_order, order)
+
+    def add_many(self, items):
+        """function to index a batch of items added to the pool
+
+        a small batch is inserted item by item, a large one merged by one
+        sort"""
+        names = [item.name for item in items]
+        self.names.extend(names)
+        self.by_price.extend((item.price.cents, item.name) for item in items)
+        self.name_lengths.update(map(len, names))
+        self.orders.update(item.get_order() for item in items)
+        self._max_name = max(self.name_lengths, default=0)
+        self._max_order = max(self.orders, default=0)
+
+    def remove(self, item):
+        """function to drop an item removed from the pool"""
+        self.names.remove(item.name)
+        self.by_price.remove((item.price.cents, item.name))
+        name_length = len(item.name)
+        order = item.get_order()
+        if self._decrement(self.name_lengths, name_length) and \
+                name_length == self._max_name:
+            self._max_name = max(self.name_lengths, default=0)
+        if self._decrement(self.orders, order) and order == self._max_order:
+            self._max_order = max(self.orders, default=0)
+
+    @staticmethod
+    def _decrement(counter, key):
+        """decrement a multiset count, return True when the key is gone"""
+        counter[key] -= 1
+        if counter[key]:
+            return False
+        del counter[key]
+        return True
+
+    def price_range(self, low, high):
+        """function to get the names priced from low to high cents, in
+        price order, in O(log n + k)"""
+        return [name for _, name in self.by_price.irange(low, high)]
+
+    def cheapest(self, count):
+        """function to get the names of the count cheapest items"""
+        return [name for _, name in self.by_price.head(count)]
+
+    def most_expensive(self, count):
+        """function to get the names of the count most expensive items"""
+        return [name for _, name in self.by_price.tail(count)]
+
+    def get_memory_usage(self):
+        """function to get the approximate footprint of the index in bytes
+        (the names themselves belong to the pool)"""
+        return (self.names.get_memory_usage() +
+                self.by_price.get_memory_usage())
+
+    def max_name_length(self):
+        """function to get the length of the longest name"""
+        return self._max_name
+
+    def max_order(self):
+        """function to get the largest price order (never below 0)"""
+        return max(self._max_order, 0)
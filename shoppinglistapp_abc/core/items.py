@@ -1,35 +1,56 @@
 """module used for item list operations"""
-import math
-import random
+import sys
+from abc import ABC, abstractmethod
+from array import array
 
 from shoppinglistapp.core.errors import (InvalidItemNameError, InvalidItemPriceError,
                          InvalidItemPoolError, NonExistingItemError,
                          DuplicateItemError)
+from shoppinglistapp.core.index import PoolIndex
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.prices import parse_price
+from shoppinglistapp.core.sampling import sample_indices, WeightedSampler
 
 
 class Item:
     """this class is used for editing existing item list from command"""
+    __slots__ = ('name', '_price', '_order')
+
     def __init__(self, name, price):
         if not isinstance(name, str) or not name:
             raise InvalidItemNameError(name)
         self.name = name
-        if isinstance(price, str) and '.' in price:
-            split = price.split('.')
-            if len(split) > 2:
-                raise InvalidItemPriceError(price)
-            if not split[0].isdigit():
-                raise InvalidItemPriceError(price)
-            if (not split[1].isdigit()) or (int(split[1]) < 0):
-                raise InvalidItemPriceError(price)
-            price = float(price)
-
-        if not isinstance(price, (float, int)) or price <= 0:
+        parsed = parse_price(price)
+        if parsed is None or parsed <= 0:
             raise InvalidItemPriceError(price)
-        self.price = round(price, 2)
+        self.price = parsed
+
+    @classmethod
+    def from_cents(cls, name, cents):
+        """function to build an item read back from storage, skipping the
+        validation of name and price"""
+        item = cls.__new__(cls)
+        item.name = name
+        item._price = Money(cents)
+        item._order = None
+        return item
+
+    @property
+    def price(self):
+        """price of the item as Money"""
+        return self._price
+
+    @price.setter
+    def price(self, price):
+        self._price = Money.from_value(price)
+        self._order = None
 
     def get_order(self):
         """get the order from the rounding up the log of price"""
-        return math.floor(round(math.log(self.price, 10), 10))
+        if self._order is None:
+            # floor(log10(price)) from the digits of the integer cents
+            self._order = len(str(self._price.cents)) - 3
+        return self._order
 
     def get_price_str(self, quantity=None, hide_price=False, order=None):
         """get the price when different command is used"""
@@ -95,9 +116,149 @@ class Item:
                 self.price == other.price)
 
 
-class ItemPool:
-    """class used to store item pool"""
-    def __init__(self, items=None):
+class BaseItemPool(ABC):
+    """base class shared by the item pool storage backends
+
+    subclasses store the items and provide ``__contains__``, ``get_item``,
+    ``iter_items``, ``get_size``, ``item_at``, ``add_item``,
+    ``remove_item`` and ``get_memory_usage``; a backend missing one of
+    them cannot be created. ``version`` is bumped on every mutation so
+    views of the pool can tell when to refresh, and ``price_version`` on
+    every price change"""
+    version = 0
+    price_version = 0
+
+    @abstractmethod
+    def __contains__(self, item_name):
+        pass
+
+    @abstractmethod
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+
+    @abstractmethod
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+
+    @abstractmethod
+    def get_size(self):
+        """function to get the size of the pool"""
+
+    @abstractmethod
+    def item_at(self, row):
+        """function to get the item stored at a dense row index"""
+
+    @abstractmethod
+    def add_item(self, item):
+        """function to add item to the pool"""
+
+    @abstractmethod
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+
+    @abstractmethod
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes"""
+
+    def snapshot(self):
+        """function to get a view of the pool that does not change while
+        it is read; a plain pool is its own snapshot"""
+        return self
+
+    def check_new_items(self, items):
+        """function to validate a batch of items before a bulk insert"""
+        seen = set()
+        for item in items:
+            if not isinstance(item, Item):
+                raise InvalidItemPoolError()
+            if item.name in self or item.name in seen:
+                raise DuplicateItemError()
+            seen.add(item.name)
+
+    def add_items(self, items):
+        """function to add a batch of items to the pool
+
+        nothing is added when any item of the batch is invalid"""
+        self.check_new_items(items)
+        for item in items:
+            self.add_item(item)
+
+    def update_price(self, item_name, price):
+        """function to change the price of an item
+
+        the item is replaced by a new Item, since items are shared with
+        shopping lists and snapshots and must not change in place"""
+        item = Item(item_name, price)
+        self.remove_item(item_name)
+        self.add_item(item)
+        self.price_version += 1
+
+    def sample_items(self, sample_size, rng=None):
+        """function to get a random number of item pool
+
+        draws the rows in O(sample_size) without copying the pool"""
+        rows = sample_indices(self.get_size(), sample_size, rng)
+        return [self.item_at(row) for row in rows]
+
+    def sample_weighted(self, sample_size, rng=None):
+        """function to get a random number of items drawn by weight
+
+        pools without per-item weights sample uniformly"""
+        return self.sample_items(sample_size, rng)
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents"""
+        return array('q', (self.item_at(row).price.cents
+                           for row in range(self.get_size())))
+
+    def sorted_names(self):
+        """function to get the item names in sorted order"""
+        return list(self.index.names)
+
+    def sorted_names_slice(self, start, stop):
+        """function to get the sorted names between two positions"""
+        return self.index.names.slice(start, stop)
+
+    def sorted_position(self, item_name):
+        """function to get the sorted position of a (possibly absent) name"""
+        return self.index.names.position(item_name)
+
+    def max_name_length(self):
+        """function to get the length of the longest item name"""
+        return self.index.max_name_length()
+
+    def max_order(self):
+        """function to get the largest price order of the pool"""
+        return self.index.max_order()
+
+    def price_range(self, low, high):
+        """function to get the names of the items priced from low to high
+        (both included), cheapest first"""
+        return self.index.price_range(Money.from_value(low).cents,
+                                      Money.from_value(high).cents)
+
+    def cheapest(self, count):
+        """function to get the names of the count cheapest items"""
+        return self.index.cheapest(count)
+
+    def most_expensive(self, count):
+        """function to get the names of the count most expensive items,
+        most expensive first"""
+        return self.index.most_expensive(count)
+
+    def __eq__(self, other):
+        return (isinstance(other, BaseItemPool) and
+                self.get_size() == other.get_size() and
+                all(name in other and other.get_item(name) == item
+                    for name, item in self.iter_items()))
+
+
+class ItemPool(BaseItemPool):
+    """class used to store item pool
+
+    items can be given weights (1.0 by default) for sample_weighted; the
+    WeightedSampler behind it is only created once weights are used"""
+    def __init__(self, items=None, weights=None):
         if not items:
             items = {}
         if not isinstance(items, dict):
@@ -106,6 +267,56 @@ class ItemPool:
             if not isinstance(key, str) or not isinstance(val, Item):
                 raise InvalidItemPoolError()
         self.items = items
+        # dense row index: names[row] is an item name, rows[name] its row
+        self.names = list(items)
+        self.rows = {name: row for row, name in enumerate(self.names)}
+        self.index = PoolIndex(items.values())
+        self.sampler = None
+        if weights:
+            self.set_weights(weights)
+
+    def _weighted_sampler(self):
+        if self.sampler is None:
+            self.sampler = WeightedSampler(
+                (name, 1.0) for name in self.names)
+        return self.sampler
+
+    def get_weight(self, item_name):
+        """function to get the sampling weight of an item"""
+        if item_name not in self.items:
+            raise NonExistingItemError(item_name)
+        if self.sampler is None:
+            return 1.0
+        return self.sampler.weight(item_name)
+
+    def set_weight(self, item_name, weight):
+        """function to set the sampling weight of an item
+
+        weights are relative, non-negative numbers; an item of weight 0
+        is never drawn by sample_weighted"""
+        self.set_weights({item_name: weight})
+
+    def set_weights(self, weights):
+        """function to set the sampling weights of several items"""
+        for item_name, weight in weights.items():
+            if item_name not in self.items:
+                raise NonExistingItemError(item_name)
+            if isinstance(weight, bool) or \
+                    not isinstance(weight, (int, float)) or \
+                    not 0 <= weight < float('inf'):
+                raise ValueError(f'Invalid weight {weight!r}.')
+        sampler = self._weighted_sampler()
+        for item_name, weight in weights.items():
+            sampler.add(item_name, float(weight))
+        self.version += 1
+
+    def sample_weighted(self, sample_size, rng=None):
+        """function to get a random number of items drawn by weight
+
+        without replacement, in about O(sample_size) per call"""
+        items = self.items
+        return [items[name] for name in
+                self._weighted_sampler().sample(sample_size, rng)]
 
     def add_item(self, item):
         """function to add item to the pool"""
@@ -114,21 +325,103 @@ class ItemPool:
         if item.name in self.items:
             raise DuplicateItemError()
         self.items[item.name] = item
+        self.rows[item.name] = len(self.names)
+        self.names.append(item.name)
+        self.index.add(item)
+        if self.sampler is not None:
+            self.sampler.add(item.name, 1.0)
+        self.version += 1
+
+    def add_items(self, items):
+        """function to add a batch of items to the pool
+
+        nothing is added when any item of the batch is invalid"""
+        self.check_new_items(items)
+        for item in items:
+            self.items[item.name] = item
+            self.rows[item.name] = len(self.names)
+            self.names.append(item.name)
+        self.index.add_many(items)
+        if self.sampler is not None:
+            for item in items:
+                self.sampler.add(item.name, 1.0)
+        self.version += 1
+
+    def update_price(self, item_name, price):
+        """function to change the price of an item, keeping its row and
+        weight
+
+        the item is replaced by a new Item, since items are shared with
+        shopping lists and snapshots and must not change in place"""
+        item = Item(item_name, price)
+        old = self.get_item(item_name)
+        self.items[item_name] = item
+        self.index.remove(old)
+        self.index.add(item)
+        self.version += 1
+        self.price_version += 1
+
+    def copy(self):
+        """function to get a copy of the pool sharing the Item objects"""
+        pool = ItemPool.__new__(ItemPool)
+        pool.items = dict(self.items)
+        pool.names = list(self.names)
+        pool.rows = dict(self.rows)
+        pool.index = self.index.copy()
+        pool.sampler = None if self.sampler is None else self.sampler.copy()
+        pool.version = self.version
+        pool.price_version = self.price_version
+        return pool
 
     def remove_item(self, item_name):
         """function to remove item in the pool"""
         if item_name not in self.items:
             raise NonExistingItemError(item_name)
-        del self.items[item_name]
+        self.index.remove(self.items.pop(item_name))
+        if self.sampler is not None:
+            self.sampler.remove(item_name)
+        row = self.rows.pop(item_name)
+        last = self.names.pop()
+        if last != item_name:
+            self.names[row] = last
+            self.rows[last] = row
+        self.version += 1
+
+    def __contains__(self, item_name):
+        return item_name in self.items
+
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+        if item_name not in self.items:
+            raise NonExistingItemError(item_name)
+        return self.items[item_name]
+
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+        return iter(self.items.items())
 
     def get_size(self):
         """function to get the size of the pool"""
         return len(self.items)
 
-    def sample_items(self, sample_size):
-        """function to get a random number of item pool"""
-        return (random.sample(list(self.items.values()),
-                              min(sample_size, len(self.items))))
+    def item_at(self, row):
+        """function to get the item stored at a dense row index"""
+        return self.items[self.names[row]]
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents"""
+        items = self.items
+        return array('q', (items[name].price.cents for name in self.names))
+
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes"""
+        size = (sys.getsizeof(self.items) + sys.getsizeof(self.names) +
+                sys.getsizeof(self.rows) +
+                self.index.get_memory_usage())
+        for name, item in self.items.items():
+            size += (sys.getsizeof(name) + sys.getsizeof(item) +
+                     sys.getsizeof(item.price))
+        return size
 
 #    def show_items(self):
 #        max_name, max_order = 0, 0
@@ -149,4 +442,6 @@ class ItemPool:
         return f'ItemPool({self.items})'
 
     def __eq__(self, other):
-        return isinstance(other, ItemPool) and self.items == other.items
+        if isinstance(other, ItemPool):
+            return self.items == other.items
+        return super().__eq__(other)
@@ -0,0 +1,196 @@
+"""module used to record the commands of a session and replay them
+
+a journal file is a stream of msgpack objects::
+
+    header   {'magic': ..., 'version': ...,
+              'list': [names, cents, quantities] or None,
+              'answer': cents of the pending answer or None}
+    entries  [offset, command, seed, digest] for every command, offset
+             being the microseconds since the journal was started, seed
+             the seed of the random generator the command drew from (None
+             when it drew nothing) and digest the crc32 of the message it
+             left (None when it raised)
+
+entries are only ever appended. the item pool is not saved: a journal is
+replayed against a pool in the state the recorded session started from
+(the same catalog or snapshot)"""
+import time
+import zlib
+
+import msgpack
+
+from shoppinglistapp.core.errors import InvalidJournalError
+from shoppinglistapp.core.items import Item
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+MAGIC = 'shoppinglist-journal'
+FORMAT_VERSION = 1
+
+
+def message_digest(text):
+    """function to get the digest recorded for a message text"""
+    return zlib.crc32(text.encode('utf-8'))
+
+
+class JournalWriter:
+    """class used to append the commands of a session to a journal file
+
+    the file is started with the shopping list and the pending answer the
+    session starts from. entries go through the buffer of the file, so
+    the last ones are only on disk after flush() or close()"""
+    def __init__(self, path, shopping_list=None, correct_answer=None):
+        self.path = path
+        self.packer = msgpack.Packer()
+        self.file = open(path, 'wb')
+        rows = None
+        if shopping_list is not None and shopping_list.list:
+            rows = [[item.name for item, _ in shopping_list.list],
+                    [item.price.cents for item, _ in shopping_list.list],
+                    [quantity for _, quantity in shopping_list.list]]
+        answer = None
+        if correct_answer is not None:
+            answer = Money.from_value(correct_answer).cents
+        self.file.write(self.packer.pack({'magic': MAGIC,
+                                          'version': FORMAT_VERSION,
+                                          'list': rows, 'answer': answer}))
+        self.start = time.perf_counter()
+        self.entries = 0
+
+    def record(self, cmd, seed, text):
+        """function to append one command, the seed it used and the text
+        of its message (None when it raised)"""
+        offset = int((time.perf_counter() - self.start) * 1e6)
+        digest = None if text is None else message_digest(text)
+        self.file.write(self.packer.pack([offset, cmd, seed, digest]))
+        self.entries += 1
+
+    def flush(self):
+        """function to push the buffered entries to the file"""
+        self.file.flush()
+
+    def close(self):
+        """function to flush and close the journal file"""
+        self.file.close()
+
+
+class JournalEntry:
+    """class used to hold one recorded command"""
+    __slots__ = ('offset', 'cmd', 'seed', 'digest')
+
+    def __init__(self, offset, cmd, seed, digest):
+        self.offset = offset
+        self.cmd = cmd
+        self.seed = seed
+        self.digest = digest
+
+
+class Journal:
+    """class used to hold what read_journal restored"""
+    def __init__(self, rows, answer, entries):
+        self.rows = rows
+        self.answer = answer
+        self.entries = entries
+
+    def start_state(self, item_pool):
+        """function to get the shopping list and pending answer the
+        session started from; list lines share the Item of the pool when
+        it is unchanged"""
+        shopping_list = ShoppingList()
+        if self.rows is not None:
+            for name, cents, quantity in zip(*self.rows):
+                item = Item.from_cents(name, cents)
+                if name in item_pool and item_pool.get_item(name) == item:
+                    item = item_pool.get_item(name)
+                shopping_list.list.append((item, quantity))
+            shopping_list.version += 1
+        shopping_list.watch(item_pool)
+        answer = None if self.answer is None else Money(self.answer)
+        return shopping_list, answer
+
+
+def read_journal(path):
+    """function to read a journal written by JournalWriter
+
+    a journal cut short by a crash is read up to its last whole entry.
+    returns a Journal"""
+    with open(path, 'rb') as stream:
+        unpacker = msgpack.Unpacker(stream, raw=False)
+        try:
+            header = unpacker.unpack()
+            if not isinstance(header, dict) or \
+                    header.get('magic') != MAGIC or \
+                    header.get('version') != FORMAT_VERSION:
+                raise InvalidJournalError(path)
+            entries = [JournalEntry(*entry) for entry in unpacker]
+            return Journal(header['list'], header['answer'], entries)
+        except (msgpack.OutOfData, msgpack.ExtraData, ValueError,
+                TypeError, KeyError) as exc:
+            raise InvalidJournalError(path) from exc
+
+
+class Divergence:
+    """class used to hold a replayed command whose message differs from
+    the recorded one"""
+    def __init__(self, position, cmd, text):
+        self.position = position
+        self.cmd = cmd
+        self.text = text
+
+    def __str__(self):
+        got = 'an exception' if self.text is None else repr(self.text[:60])
+        return f'#{self.position} {self.cmd!r}: got {got}'
+
+
+class ReplayReport:
+    """class used to hold the totals of a replay"""
+    def __init__(self, commands=0, elapsed=0.0, divergences=None):
+        self.commands = commands
+        self.elapsed = elapsed
+        self.divergences = [] if divergences is None else divergences
+
+    def throughput(self):
+        """function to get the replayed commands per second"""
+        return self.commands / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f'{self.commands} commands in {self.elapsed:.3f}s '
+                f'({self.throughput():.0f}/s), '
+                f'{len(self.divergences)} divergences')
+
+
+def replay(journal, app, paced=False):
+    """function to run the commands of a journal on an AppCLI
+
+    app should hold a pool in the state the recording started from; its
+    shopping list and pending answer are set from the journal. every
+    command draws from a generator seeded as recorded, so a replay takes
+    the same random decisions. commands run back to back, or at the
+    recorded offsets when paced. returns a ReplayReport"""
+    engine = app.app_engine
+    engine.shopping_list, engine.correct_answer = \
+        journal.start_state(engine.items)
+    report = ReplayReport()
+    start = time.perf_counter()
+    for position, entry in enumerate(journal.entries):
+        if paced:
+            delay = start + entry.offset / 1e6 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        app.seed = entry.seed
+        try:
+            app.execute_command(entry.cmd)
+            text = app.message_text()
+        # pylint: disable=broad-except
+        except Exception:
+            text = None
+        app.seed = None
+        engine.message = None
+        report.commands += 1
+        digest = None if text is None else message_digest(text)
+        if digest != entry.digest:
+            report.divergences.append(Divergence(position, entry.cmd, text))
+        if not engine.continue_execution:
+            break
+    report.elapsed = time.perf_counter() - start
+    return report
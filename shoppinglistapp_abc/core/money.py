@@ -0,0 +1,99 @@
+"""module used for the fixed-point money type of the app"""
+from functools import total_ordering
+from math import isfinite
+
+
+@total_ordering
+class Money:
+    """class used to hold an amount of money as integer cents
+
+    sums and multiples by integer quantities stay exact integers, so
+    totals need no rounding. an amount equals the int or float of the
+    same value (Money(150) == 1.5, Money(324) == 3.24: the float nearest
+    to it) and hashes like it, which keeps code and tests that still pass
+    float prices working"""
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = cents
+
+    @classmethod
+    def from_value(cls, value):
+        """function to convert Money, an int or a float to Money
+
+        floats are rounded to the nearest cent; nan and inf raise
+        ValueError"""
+        if isinstance(value, Money):
+            return value
+        if isinstance(value, int):
+            return cls(value * 100)
+        if not isfinite(value):
+            raise ValueError()
+        return cls(round(value * 100))
+
+    def __eq__(self, other):
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        if isinstance(other, int):
+            return self.cents == other * 100
+        if isinstance(other, float):
+            return self.cents / 100 == other
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        if isinstance(other, int):
+            return self.cents < other * 100
+        if isinstance(other, float):
+            return self.cents / 100 < other
+        return NotImplemented
+
+    def __hash__(self):
+        # equal to an int or a float, the amount must hash like it
+        if self.cents % 100 == 0:
+            return hash(self.cents // 100)
+        return hash(self.cents / 100)
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if isinstance(other, int):
+            return Money(self.cents + other * 100)
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, quantity):
+        if isinstance(quantity, int):
+            return Money(self.cents * quantity)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __str__(self):
+        sign = '-' if self.cents < 0 else ''
+        whole, cents = divmod(abs(self.cents), 100)
+        return f'{sign}{whole}.{cents:02}'
+
+    def __format__(self, spec):
+        if not spec:
+            return str(self)
+        return format(self.cents / 100, spec)
+
+    def __repr__(self):
+        return f'Money({self})'
@@ -0,0 +1,75 @@
+"""module used to parse prices typed by users or read from catalogs
+
+a price string is an optional minus sign, decimal digits and optionally
+a dot followed by more decimal digits ("3", "3.25", "-1"); anything else
+(exponents, "inf", a bare ".5", several dots) is rejected. prices are
+parsed straight to integer cents, without going through float"""
+import re
+from array import array
+from math import isfinite
+
+from shoppinglistapp.core.money import Money
+
+_PRICE = re.compile(r'(-?)(\d+)(?:\.(\d+))?').fullmatch
+
+
+def parse_cents(value):
+    """function to parse one price to integer cents, None if invalid
+
+    more than two decimals are rounded half up; ints, finite floats and
+    Money are converted as they are (bools, nan and inf are not prices)"""
+    if isinstance(value, str):
+        # fast path for the common "<digits>.<two digits>" form
+        dot = len(value) - 3
+        if dot > 0 and value[dot] == '.':
+            digits = value[:dot] + value[dot + 1:]
+            if digits.isdecimal():
+                return int(digits)
+        match = _PRICE(value)
+        if match is None:
+            return None
+        sign, whole, frac = match.groups()
+        if frac is None:
+            cents = int(whole) * 100
+        else:
+            cents = int(whole + frac[:2].ljust(2, '0'))
+            if frac[2:3] >= '5':
+                cents += 1
+        return -cents if sign else cents
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and not isfinite(value):
+        return None
+    if isinstance(value, (Money, float, int)):
+        return Money.from_value(value).cents
+    return None
+
+
+def parse_price(value):
+    """function to parse one price to Money, None if it is not a price"""
+    cents = parse_cents(value)
+    return None if cents is None else Money(cents)
+
+
+def parse_prices(values):
+    """function to parse a column of prices in one pass
+
+    returns an array of integer cents and a bytearray mask, where a 1
+    marks a value that is not a price or does not fit in 64 bits (its
+    slot in the array holds 0)"""
+    parsed = array('q')
+    errors = bytearray()
+    append_price, append_error = parsed.append, errors.append
+    for value in values:
+        cents = parse_cents(value)
+        if cents is not None:
+            try:
+                append_price(cents)
+            except OverflowError:
+                pass
+            else:
+                append_error(0)
+                continue
+        append_price(0)
+        append_error(1)
+    return parsed, errors
@@ -0,0 +1,211 @@
+"""module used for random sampling over dense row indices and weights"""
+import heapq
+import random
+from array import array
+from bisect import bisect_left, bisect_right
+
+from shoppinglistapp.core.errors import InvalidShoppingListSizeError
+from shoppinglistapp.core.money import Money
+
+
+def sample_indices(population, sample_size, rng=None):
+    """draw sample_size distinct indices from range(population) in O(k)
+
+    uses Floyd's algorithm, so only the drawn indices are ever touched,
+    and shuffles the result so that its order is random as well; rng can
+    be a seeded random.Random to make the draw reproducible"""
+    if rng is None:
+        rng = random
+    sample_size = min(sample_size, population)
+    selected = set()
+    result = []
+    for j in range(population - sample_size, population):
+        row = rng.randrange(j + 1)
+        if row in selected:
+            row = j
+        selected.add(row)
+        result.append(row)
+    rng.shuffle(result)
+    return result
+
+
+def price_band_weights(item_pool, bands):
+    """function to weight every item of a pool by its price band
+
+    bands is a sorted sequence of (upper price, weight) pairs: an item
+    gets the weight of the first band its price does not exceed, and
+    prices above the last band get weight 0. the result can be passed to
+    ItemPool.set_weights"""
+    bounds = [Money.from_value(upper).cents for upper, _ in bands]
+    weights = [weight for _, weight in bands] + [0.0]
+    return {name: weights[bisect_left(bounds, item.price.cents)]
+            for name, item in item_pool.iter_items()}
+
+
+class AliasTable:
+    """class used to draw indices in O(1) with the Vose alias method
+
+    index i is drawn with probability weights[i] / sum(weights); the
+    table takes O(n) to build and is never changed afterwards"""
+    def __init__(self, weights):
+        count = len(weights)
+        total = sum(weights)
+        self.size = count
+        self.prob = array('d', bytes(8 * count))
+        self.alias = array('q', bytes(8 * count))
+        if not total:
+            return
+        scaled = [weight * count / total for weight in weights]
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # what is left is 1.0 up to rounding errors (or a zero weight
+        # left over by them, which then only ever draws itself)
+        for i in small + large:
+            self.prob[i] = 1.0 if scaled[i] > 0 else 0.0
+            self.alias[i] = i
+
+    def draw(self, rng):
+        """function to draw one index"""
+        i = int(rng.random() * self.size)
+        if rng.random() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+
+class WeightedSampler:
+    """class used to sample names by weight without replacement
+
+    the names are kept in an AliasTable plus a list of pending entries
+    (names added or re-weighted since the table was built, drawn by a
+    bisect over their cumulative weights). every entry carries a token;
+    removing or re-weighting a name drops its token, so its old entry is
+    rejected when drawn. the table is rebuilt once the pending and
+    dropped entries reach a quarter of it, which keeps the rejections
+    rare and the rebuilds O(1) amortized per change"""
+    def __init__(self, weights=()):
+        # name -> (token, weight, entry is in the table)
+        self.current = {}
+        self._token = 0
+        self.rebuild(weights)
+
+    def rebuild(self, weights=None):
+        """function to rebuild the alias table from the live weights"""
+        if weights is None:
+            weights = ((name, weight) for name, (_, weight, _) in
+                       self.current.items())
+        self.current = {}
+        self.names = []
+        self.tokens = []
+        table_weights = []
+        for name, weight in weights:
+            self._token += 1
+            self.current[name] = (self._token, weight, True)
+            self.names.append(name)
+            self.tokens.append(self._token)
+            table_weights.append(weight)
+        self.table = AliasTable(table_weights)
+        self.table_mass = float(sum(table_weights))
+        self.pending_names = []
+        self.pending_tokens = []
+        self.pending_cumulative = []
+        self.dropped = 0
+        self.positive = sum(1 for weight in table_weights if weight > 0)
+
+    def copy(self):
+        """function to get a sampler that changes independently (the
+        alias table itself is shared, it is never changed in place)"""
+        sampler = WeightedSampler.__new__(WeightedSampler)
+        sampler.__dict__.update(self.__dict__)
+        sampler.current = dict(self.current)
+        sampler.pending_names = list(self.pending_names)
+        sampler.pending_tokens = list(self.pending_tokens)
+        sampler.pending_cumulative = list(self.pending_cumulative)
+        return sampler
+
+    def weight(self, name):
+        """function to get the weight of a name"""
+        return self.current[name][1]
+
+    def add(self, name, weight):
+        """function to add a name (or a new weight of a name)"""
+        if name in self.current:
+            self.remove(name)
+        self._token += 1
+        self.current[name] = (self._token, weight, False)
+        self.pending_names.append(name)
+        self.pending_tokens.append(self._token)
+        self.pending_cumulative.append(self.pending_mass() + weight)
+        if weight > 0:
+            self.positive += 1
+        self._maybe_rebuild()
+
+    def remove(self, name):
+        """function to drop a name"""
+        _, weight, _ = self.current.pop(name)
+        if weight > 0:
+            self.positive -= 1
+        self.dropped += 1
+        self._maybe_rebuild()
+
+    def pending_mass(self):
+        """function to get the weight held by the pending entries"""
+        return self.pending_cumulative[-1] if self.pending_cumulative \
+            else 0.0
+
+    def _maybe_rebuild(self):
+        changes = len(self.pending_names) + self.dropped
+        if changes > max(64, len(self.names) // 4):
+            self.rebuild()
+
+    def draw(self, rng):
+        """function to draw one live name by weight (with replacement)"""
+        pending_mass = self.pending_mass()
+        total = self.table_mass + pending_mass
+        while True:
+            point = rng.random() * total
+            if point < self.table_mass:
+                i = self.table.draw(rng)
+                name, token = self.names[i], self.tokens[i]
+            else:
+                i = bisect_right(self.pending_cumulative,
+                                 point - self.table_mass)
+                i = min(i, len(self.pending_names) - 1)
+                name, token = self.pending_names[i], self.pending_tokens[i]
+            entry = self.current.get(name)
+            if entry is not None and entry[0] == token and entry[1] > 0:
+                return name
+
+    def sample(self, sample_size, rng=None):
+        """function to draw sample_size distinct names by weight
+
+        names are drawn one at a time and repeats are drawn again, which
+        is O(sample_size) while the sample holds a small part of the
+        total weight; when repeats pile up the rest is drawn exactly
+        with one pass of weighted random keys (Efraimidis-Spirakis)"""
+        if rng is None:
+            rng = random
+        if sample_size > self.positive:
+            raise InvalidShoppingListSizeError()
+        chosen = set()
+        result = []
+        budget = 4 * sample_size + 32
+        while len(result) < sample_size and budget:
+            name = self.draw(rng)
+            if name in chosen:
+                budget -= 1
+                continue
+            chosen.add(name)
+            result.append(name)
+        if len(result) < sample_size:
+            keyed = ((rng.random() ** (1.0 / weight), name)
+                     for name, (_, weight, _) in self.current.items()
+                     if weight > 0 and name not in chosen)
+            result += [name for _, name in
+                       heapq.nlargest(sample_size - len(result), keyed)]
+        return result
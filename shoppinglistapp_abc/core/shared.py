@@ -0,0 +1,226 @@
+"""module used to share one item pool between processes
+
+a publisher lays a pool out in a shared memory block named
+<name>.<generation>::
+
+    catalog  the catalog layout of core.catalog (header, offsets, prices,
+             price order, sorted names)
+    index    padding to 8 bytes, the uint64 slot count (a power of two)
+             and the uint32 slots of an open addressing hash table: a
+             slot holds row + 1 (0 for empty) and a name starts probing
+             at the crc32 of its utf-8 bytes
+
+and writes the generation (uint64) to a small control block named
+<name>. a SharedItemPool attaches to the block of the current generation
+read-only: names, prices and the index are read from the shared pages,
+so a worker adds no copy of the pool. a republish writes a new block,
+switches the control block over and unlinks the old block; attached
+pools keep their mapping until they pick up the new generation"""
+import struct
+import zlib
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+from shoppinglistapp.core.catalog import (CatalogReader, MappedItemPool,
+                                          encode_catalog)
+from shoppinglistapp.core.errors import ReadOnlyItemPoolError
+from shoppinglistapp.core.index import SortedBlocks
+from shoppinglistapp.core.items import ItemPool
+
+UINT64 = struct.Struct('<Q')
+
+
+def _attach(name):
+    """attach to an existing block without making this process its owner"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        pass
+    # before python 3.13 every attach is registered with the resource
+    # tracker, which unlinks the block when the process exits; forked
+    # workers share the tracker of their parent, so the registration
+    # is skipped rather than undone
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+def slot_count(count):
+    """function to get the hash table size for count names (at most half
+    of the slots are used)"""
+    size = 1
+    while size < 2 * count:
+        size *= 2
+    return size
+
+
+def build_index(reader, slots):
+    """function to fill the (zeroed) hash table slots of a catalog"""
+    mask = len(slots) - 1
+    for row in range(reader.count):
+        slot = zlib.crc32(reader.name_bytes(row)) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = row + 1
+
+
+class SharedPoolPublisher:
+    """class used to publish item pools to shared memory under one name
+
+    the publisher owns the blocks: close() unlinks them, after which no
+    new SharedItemPool can attach"""
+    def __init__(self, name):
+        self.name = name
+        self.control = shared_memory.SharedMemory(
+            name, create=True, size=UINT64.size)
+        UINT64.pack_into(self.control.buf, 0, 0)
+        self.generation = 0
+        self.block = None
+
+    def publish(self, pool):
+        """function to publish the items of any pool as the next
+        generation, returns the generation"""
+        parts = [memoryview(part).cast('B') for part in encode_catalog(pool)]
+        index_start = -(-sum(len(part) for part in parts) // 8) * 8
+        slots = slot_count(pool.get_size())
+        generation = self.generation + 1
+        block = shared_memory.SharedMemory(
+            f'{self.name}.{generation}', create=True,
+            size=index_start + UINT64.size + slots * 4)
+        position = 0
+        for part in parts:
+            block.buf[position:position + len(part)] = part
+            position += len(part)
+        UINT64.pack_into(block.buf, index_start, slots)
+        start = index_start + UINT64.size
+        reader = CatalogReader(block.buf, self.name)
+        index = block.buf[start:start + slots * 4].cast('I')
+        build_index(reader, index)
+        index.release()
+        reader.release()
+        UINT64.pack_into(self.control.buf, 0, generation)
+        self.generation = generation
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+        self.block = block
+        return generation
+
+    def close(self):
+        """function to unlink the published blocks"""
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+        self.control.close()
+        self.control.unlink()
+
+
+class SharedItemPool(MappedItemPool):
+    """class used to read an item pool published by SharedPoolPublisher
+
+    lookups go through the shared hash index, sampling and rendering read
+    rows straight from the block. snapshot() (used by refresh and the
+    show commands) moves the pool to the latest generation, which bumps
+    version; other reads stay on the generation already attached. the
+    pool cannot be changed"""
+    # pylint: disable=super-init-not-called
+    def __init__(self, name):
+        self.name = name
+        self.path = name
+        self.added = ItemPool()
+        self.deleted = set()
+        self._deleted_rows = SortedBlocks()
+        self.control = _attach(name)
+        self.block = None
+        self.reader = None
+        self.slots = None
+        self.mask = 0
+        self.generation = None
+        self._open()
+
+    def _current_generation(self):
+        return UINT64.unpack_from(self.control.buf, 0)[0]
+
+    def _open(self):
+        while True:
+            generation = self._current_generation()
+            try:
+                block = _attach(f'{self.name}.{generation}')
+                break
+            except FileNotFoundError:
+                # republished between reading the control block and
+                # attaching: read the control block again
+                continue
+        self.block = block
+        self.reader = CatalogReader(block.buf, self.name)
+        names_end = self.reader.names_start + \
+            self.reader.offsets[self.reader.count]
+        index_start = -(-names_end // 8) * 8
+        slots = UINT64.unpack_from(block.buf, index_start)[0]
+        start = index_start + UINT64.size
+        self.slots = block.buf[start:start + slots * 4].cast('I')
+        self.mask = slots - 1
+        self.generation = generation
+        self.version += 1
+
+    def _detach(self):
+        self.slots.release()
+        self.reader.release()
+        self.block.close()
+        self.reader = None
+
+    def snapshot(self):
+        """function to move to the latest published generation (when
+        there is a newer one) and get the pool"""
+        if self._current_generation() != self.generation:
+            self._detach()
+            self._open()
+        return self
+
+    def _live_row(self, item_name):
+        key = item_name.encode('utf-8')
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            row = self.slots[slot]
+            if not row:
+                return None
+            if self.reader.name_bytes(row - 1) == key:
+                return row - 1
+            slot = (slot + 1) & self.mask
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents"""
+        return array('q', self.reader.prices)
+
+    def add_item(self, item):
+        """function to refuse a change: the pool is read-only"""
+        raise ReadOnlyItemPoolError()
+
+    def add_items(self, items):
+        """function to refuse a change: the pool is read-only"""
+        raise ReadOnlyItemPoolError()
+
+    def remove_item(self, item_name):
+        """function to refuse a change: the pool is read-only"""
+        raise ReadOnlyItemPoolError()
+
+    def update_price(self, item_name, price):
+        """function to refuse a change: the pool is read-only"""
+        raise ReadOnlyItemPoolError()
+
+    def compact(self, path=None):
+        """function to refuse a change: the pool is read-only"""
+        raise ReadOnlyItemPoolError()
+
+    def close(self):
+        """function to detach from the shared blocks"""
+        if self.reader is not None:
+            self._detach()
+            self.control.close()
+
+    def __repr__(self):
+        return f'SharedItemPool({self.name!r})'
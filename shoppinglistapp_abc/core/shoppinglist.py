@@ -2,47 +2,260 @@
 # pylint: disable=wildcard-import
 # pylint: disable=unused-wildcard-import
 import random
+from array import array
 from shoppinglistapp.core.errors import *
 from shoppinglistapp.core.items import *
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.sampling import sample_indices
+
+
+def draw_shape(item_pool, size=None, quantities=None, rng=random):
+    """function to check (or draw) the size and quantities of a new list
+
+    returns size and a list of size quantities"""
+    if size is None:
+        size = rng.randint(1, item_pool.get_size())
+    if not isinstance(size, int) or size < 1:
+        raise ValueError()
+    if size > item_pool.get_size():
+        raise InvalidShoppingListSizeError()
+    if quantities is None:
+        quantities = rng.choices(range(1, 10), k=size)
+    if not isinstance(quantities, list):
+        raise ValueError()
+    for elem in quantities:
+        if not isinstance(elem, int) or elem < 1:
+            raise ValueError()
+    if len(quantities) < size:
+        quantities = quantities + [1] * (size - len(quantities))
+    if len(quantities) > size:
+        quantities = quantities[:size]
+    return size, quantities
+
+
+def pool_layout(item_pool):
+    """function to get a stamp of the row layout of a pool: it moves when
+    rows may have moved, but not on a price change keeping every row
+    (which bumps version and price_version together)"""
+    return item_pool.version - item_pool.price_version
 
 
 class ShoppingList:
-    """this class is used for shopping list operation"""
-    def __init__(self, size=None, quantities=None, item_pool=None):
+    """this class is used for shopping list operation
+
+    the price of every line and the total are kept in integer cents and
+    updated by the editing functions, so they are read in O(1). an edit
+    adjusts the total by the one line it changes, but append and
+    replace_item scan the list for a duplicate name and remove shifts the
+    lines after it, so those cost O(len). code that changes list directly
+    must assign a new list or bump version, the cached prices are then
+    computed again on the next read. the list follows price changes of
+    the pool it was drawn from (see watch)"""
+    version = 0
+
+    def __init__(self, size=None, quantities=None, item_pool=None, rng=None):
         self.list = []
+        self.item_pool = None
+        self._price_version = 0
+        # line prices and total of the list object and version in _lines
+        self._lines = None
+        self._version = None
+        self._line_cents = []
+        self._total = 0
         if item_pool is not None:
-            self.refresh(item_pool, size, quantities)
+            self.refresh(item_pool, size, quantities, rng)
 
-    def refresh(self, item_pool, size=None, quantities=None):
-        """this function is used to refresh shopping list"""
-        if size is None:
-            size = random.randint(1, item_pool.get_size())
-        if not isinstance(size, int) or size < 1:
-            raise ValueError()
-        if size > item_pool.get_size():
-            raise InvalidShoppingListSizeError()
-        if quantities is None:
-            quantities = random.choices(range(1, 10), k=size)
-        if not isinstance(quantities, list):
-            raise ValueError()
-        for elem in quantities:
-            if not isinstance(elem, int) or elem < 1:
-                raise ValueError()
-        if len(quantities) < size:
-            quantities = quantities + [1] * (size - len(quantities))
-        if len(quantities) > size:
-            quantities = quantities[:size]
-        items_list = item_pool.sample_items(size)
+    # pylint: disable=too-many-arguments
+    def refresh(self, item_pool, size=None, quantities=None, rng=None,
+                weighted=False):
+        """this function is used to refresh shopping list
+
+        rng can be a seeded random.Random to reproduce a list; weighted
+        draws the items by the weights of the pool"""
+        self.watch(item_pool)
+        item_pool = item_pool.snapshot()
+        if rng is None:
+            rng = random
+        size, quantities = draw_shape(item_pool, size, quantities, rng)
+        if weighted:
+            items_list = item_pool.sample_weighted(size, rng)
+        else:
+            items_list = item_pool.sample_items(size, rng)
         self.list = list(zip(items_list, quantities))
+        self.version += 1
 #        self.list = [(item, q) for item, q in zip(items_list, quantities)]
 
+    def watch(self, item_pool):
+        """this function is used to make the list follow the price changes
+        of item_pool (None to stop)"""
+        self.item_pool = item_pool
+        if item_pool is not None:
+            self._price_version = item_pool.price_version
+
+    def sync(self):
+        """this function is used to bring the cached prices up to date
+
+        once the watched pool changed prices, lines whose item differs
+        from the item of the same name in the pool take the pool item"""
+        pool = self.item_pool
+        if pool is not None and pool.price_version != self._price_version:
+            self._price_version = pool.price_version
+            self._follow_pool(pool)
+        if self._lines is not self.list or self._version != self.version:
+            self._line_cents = [item.price.cents * quantity
+                                for item, quantity in self.list]
+            self._total = sum(self._line_cents)
+            self._lines = self.list
+            self._version = self.version
+
+    def _follow_pool(self, pool):
+        changed = [(i, pool.get_item(item.name), quantity)
+                   for i, (item, quantity) in enumerate(self.list)
+                   if item.name in pool and pool.get_item(item.name) != item]
+        for i, item, quantity in changed:
+            self._set_line(i, item, quantity)
+
+    def _set_line(self, i, item, quantity):
+        """replace line i, keeping the cached prices in step"""
+        self.sync()
+        cents = item.price.cents * quantity
+        self._total += cents - self._line_cents[i]
+        self._line_cents[i] = cents
+        self.list[i] = (item, quantity)
+        self._edited()
+
+    def _edited(self):
+        self.version += 1
+        self._version = self.version
+
+    @staticmethod
+    def _check_quantity(quantity):
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or \
+                quantity < 1:
+            raise ValueError()
+
+    def _check_new_item(self, item, skip=None):
+        if not isinstance(item, Item):
+            raise InvalidItemPoolError()
+        for i, (line_item, _) in enumerate(self.list):
+            if i != skip and line_item.name == item.name:
+                raise DuplicateItemError()
+
+    def set_quantity(self, i, quantity):
+        """this function is used to change the quantity of line i"""
+        self._check_quantity(quantity)
+        self._set_line(i, self.list[i][0], quantity)
+
+    def replace_item(self, i, item):
+        """this function is used to put another item on line i, keeping
+        its quantity"""
+        quantity = self.list[i][1]
+        self._check_new_item(item, skip=i % len(self.list))
+        self._set_line(i, item, quantity)
+
+    def append(self, item, quantity=1):
+        """this function is used to add a line at the end of the list"""
+        self._check_quantity(quantity)
+        self._check_new_item(item)
+        self.sync()
+        cents = item.price.cents * quantity
+        self.list.append((item, quantity))
+        self._line_cents.append(cents)
+        self._total += cents
+        self._edited()
+
+    def remove(self, i):
+        """this function is used to delete line i"""
+        self.sync()
+        del self.list[i]
+        self._total -= self._line_cents.pop(i)
+        self._edited()
+
     def get_total_price(self):
-        """this function is used for total price calculation"""
-        return round(sum(list(item.price * qnt for item, qnt in self.list)), 2)
+        """this function is used for total price calculation
+
+        the total is an exact sum of integer cents, kept up to date by
+        the editing functions"""
+        self.sync()
+        return Money(self._total)
 
     def get_item_price(self, i):
         """this function is used to get price for individual item"""
-        return round(self.list[i][0].price * self.list[i][1], 2)
+        self.sync()
+        return Money(self._line_cents[i])
 
     def __len__(self):
         return len(self.list)
+
+    def __iter__(self):
+        return iter(self.list)
+
+
+class CompactShoppingList:
+    """this class is used to hold a shopping list in two typed arrays
+
+    rows holds the pool row of every line (array('I')) and quantities
+    its quantity (array('B'), 1-255, a larger quantity raises
+    ValueError), which takes a fraction of the memory of a list of
+    (Item, quantity) tuples. the rows belong to the pool snapshot the
+    list was drawn from: reading the list after items were added to or
+    removed from that pool raises StaleShoppingListError (the snapshots
+    of a ConcurrentItemPool never change). prices are read from the pool,
+    so a price change that keeps the rows in place (ItemPool.update_price)
+    is followed, like ShoppingList.watch does"""
+    __slots__ = ('pool', 'pool_layout', 'rows', 'quantities')
+
+    def __init__(self, item_pool, rows=(), quantities=()):
+        self.pool = item_pool.snapshot()
+        self.pool_layout = pool_layout(self.pool)
+        self.rows = array('I', rows)
+        try:
+            self.quantities = array('B', quantities)
+        except OverflowError as exc:
+            raise ValueError() from exc
+        if len(self.rows) != len(self.quantities):
+            raise ValueError()
+
+    @classmethod
+    def draw(cls, item_pool, size=None, quantities=None, rng=None):
+        """this function is used to draw a new random list; the same rng
+        state gives the lines ShoppingList.refresh would draw"""
+        item_pool = item_pool.snapshot()
+        if rng is None:
+            rng = random
+        size, quantities = draw_shape(item_pool, size, quantities, rng)
+        rows = sample_indices(item_pool.get_size(), size, rng)
+        return cls(item_pool, rows, quantities)
+
+    def _checked_pool(self):
+        if pool_layout(self.pool) != self.pool_layout:
+            raise StaleShoppingListError()
+        return self.pool
+
+    def get_item_price(self, i):
+        """this function is used to get price for individual item"""
+        item = self._checked_pool().item_at(self.rows[i])
+        return item.price * self.quantities[i]
+
+    def get_total_price(self):
+        """this function is used for total price calculation"""
+        pool = self._checked_pool()
+        return Money(sum(pool.item_at(row).price.cents * quantity
+                         for row, quantity in zip(self.rows,
+                                                  self.quantities)))
+
+    def to_list(self):
+        """this function is used to get the list as a ShoppingList"""
+        shopping_list = ShoppingList()
+        shopping_list.list = list(self)
+        shopping_list.version += 1
+        shopping_list.watch(self.pool)
+        return shopping_list
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        pool = self._checked_pool()
+        for row, quantity in zip(self.rows, self.quantities):
+            yield pool.item_at(row), quantity
@@ -0,0 +1,130 @@
+"""module used to save and restore a session as a msgpack snapshot
+
+a snapshot file is a stream of msgpack objects::
+
+    header   {'magic': ..., 'version': ..., 'items': item count}
+    chunks   [names, prices] for every chunk_size items, names being a
+             list of strings and prices the int64 cents of the same rows
+             packed little-endian into one bytes object
+    state    {'list': [names, prices, quantities] or None,
+              'answer': cents of the pending answer or None}
+
+the items are written and read one chunk at a time, so neither side
+holds more than a chunk of encoded data in memory"""
+import os
+import sys
+from array import array
+
+import msgpack
+
+from shoppinglistapp.core.errors import InvalidSnapshotError
+from shoppinglistapp.core.items import Item, ItemPool
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+MAGIC = 'shoppinglist-snapshot'
+FORMAT_VERSION = 1
+
+
+class SessionSnapshot:
+    """class used to hold what read_snapshot restored"""
+    def __init__(self, item_pool, shopping_list, correct_answer=None):
+        self.item_pool = item_pool
+        self.shopping_list = shopping_list
+        self.correct_answer = correct_answer
+
+
+def _pack_cents(cents):
+    column = array('q', cents)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+
+def _unpack_cents(data):
+    column = array('q')
+    column.frombytes(data)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def write_snapshot(path, item_pool, shopping_list=None,
+                   correct_answer=None, chunk_size=65536):
+    """function to save a pool, a shopping list and a pending answer
+
+    the file is written next to path and moved over it once complete"""
+    packer = msgpack.Packer()
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(packer.pack({'magic': MAGIC, 'version': FORMAT_VERSION,
+                               'items': item_pool.get_size()}))
+        names, cents = [], []
+        for name, item in item_pool.iter_items():
+            names.append(name)
+            cents.append(item.price.cents)
+            if len(names) == chunk_size:
+                out.write(packer.pack([names, _pack_cents(cents)]))
+                names, cents = [], []
+        if names:
+            out.write(packer.pack([names, _pack_cents(cents)]))
+        rows = None
+        if shopping_list is not None and shopping_list.list:
+            rows = [[item.name for item, _ in shopping_list.list],
+                    _pack_cents(item.price.cents
+                                for item, _ in shopping_list.list),
+                    [quantity for _, quantity in shopping_list.list]]
+        answer = None
+        if correct_answer is not None:
+            answer = Money.from_value(correct_answer).cents
+        out.write(packer.pack({'list': rows, 'answer': answer}))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, item_pool=None):
+    """function to restore a snapshot written by write_snapshot
+
+    the items go into a new ItemPool, or are bulk added to item_pool
+    (any pool backend) chunk by chunk. list lines share the Item of the
+    pool when it is unchanged. returns a SessionSnapshot"""
+    with open(path, 'rb') as stream:
+        unpacker = msgpack.Unpacker(stream, raw=False)
+        try:
+            header = unpacker.unpack()
+            if not isinstance(header, dict) or \
+                    header.get('magic') != MAGIC or \
+                    header.get('version') != FORMAT_VERSION:
+                raise InvalidSnapshotError(path)
+            items = {}
+            remaining = header['items']
+            while remaining > 0:
+                names, cents = unpacker.unpack()
+                chunk = [Item.from_cents(name, price) for name, price in
+                         zip(names, _unpack_cents(cents))]
+                if not chunk:
+                    raise InvalidSnapshotError(path)
+                if item_pool is None:
+                    items.update((item.name, item) for item in chunk)
+                else:
+                    item_pool.add_items(chunk)
+                remaining -= len(chunk)
+            state = unpacker.unpack()
+        except (msgpack.OutOfData, msgpack.ExtraData, ValueError,
+                TypeError, KeyError) as exc:
+            raise InvalidSnapshotError(path) from exc
+    if item_pool is None:
+        item_pool = ItemPool(items)
+    shopping_list = ShoppingList()
+    if state['list'] is not None:
+        names, cents, quantities = state['list']
+        for name, price, quantity in zip(names, _unpack_cents(cents),
+                                         quantities):
+            item = Item.from_cents(name, price)
+            if name in item_pool and item_pool.get_item(name) == item:
+                item = item_pool.get_item(name)
+            shopping_list.list.append((item, quantity))
+        shopping_list.version += 1
+    shopping_list.watch(item_pool)
+    answer = state['answer']
+    return SessionSnapshot(item_pool, shopping_list,
+                           None if answer is None else Money(answer))
@@ -0,0 +1,268 @@
+"""module used for the SQLite-backed item pool
+
+statements are kept as constants so that the per-connection statement
+cache of the sqlite3 module prepares each of them only once"""
+import queue
+import sqlite3
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+
+from shoppinglistapp.core.errors import (InvalidItemPoolError,
+                                         NonExistingItemError,
+                                         DuplicateItemError)
+from shoppinglistapp.core.items import Item, BaseItemPool
+from shoppinglistapp.core.money import Money
+from shoppinglistapp.core.sampling import sample_indices
+
+# every row keeps a dense position ("row") so that random rows can be
+# drawn by index, and its name length so that the longest name is an
+# index lookup instead of a table scan
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS items (
+    name TEXT PRIMARY KEY,
+    cents INTEGER NOT NULL,
+    row INTEGER NOT NULL UNIQUE,
+    name_length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_cents ON items (cents);
+CREATE INDEX IF NOT EXISTS items_name_length ON items (name_length);
+'''
+SQL_SIZE = 'SELECT COALESCE(MAX(row) + 1, 0) FROM items'
+SQL_CONTAINS = 'SELECT 1 FROM items WHERE name = ?'
+SQL_GET = 'SELECT cents FROM items WHERE name = ?'
+SQL_GET_ROW = 'SELECT row FROM items WHERE name = ?'
+SQL_AT = 'SELECT name, cents FROM items WHERE row = ?'
+SQL_INSERT = ('INSERT INTO items (name, cents, row, name_length) '
+              'VALUES (?, ?, ?, ?)')
+SQL_DELETE = 'DELETE FROM items WHERE name = ?'
+SQL_MOVE = 'UPDATE items SET row = ? WHERE row = ?'
+SQL_ITER = 'SELECT name, cents FROM items ORDER BY row'
+SQL_PRICES = 'SELECT cents FROM items ORDER BY row'
+SQL_SORTED = 'SELECT name FROM items ORDER BY name'
+SQL_SORTED_SLICE = 'SELECT name FROM items ORDER BY name LIMIT ? OFFSET ?'
+SQL_POSITION = 'SELECT COUNT(*) FROM items WHERE name < ?'
+SQL_MAX_NAME = 'SELECT COALESCE(MAX(name_length), 0) FROM items'
+SQL_MAX_PRICE = 'SELECT MAX(cents) FROM items'
+SQL_PRICE_RANGE = ('SELECT name FROM items WHERE cents BETWEEN ? AND ? '
+                   'ORDER BY cents, name')
+SQL_CHEAPEST = 'SELECT name FROM items ORDER BY cents, name LIMIT ?'
+SQL_MOST_EXPENSIVE = ('SELECT name FROM items ORDER BY cents DESC, name DESC '
+                      'LIMIT ?')
+# SQLite's default limit on host parameters in one statement
+MAX_PARAMS = 999
+
+
+class ConnectionPool:
+    """class used to hand out a small set of SQLite connections
+
+    every connection is opened with check_same_thread=False and only
+    used by one thread at a time, so readers on several threads do not
+    wait for each other"""
+    def __init__(self, path, size=4):
+        self.path = path
+        self.connections = queue.Queue()
+        for _ in range(size):
+            self.connections.put(self.open())
+
+    def open(self):
+        """function to open one connection to the database"""
+        connection = sqlite3.connect(self.path, check_same_thread=False,
+                                     cached_statements=64)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """context manager lending a connection from the pool"""
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    def close(self):
+        """function to close every pooled connection"""
+        while not self.connections.empty():
+            self.connections.get().close()
+
+
+class SQLiteItemPool(BaseItemPool):
+    """class used to store the item pool in a local SQLite file
+
+    reads use pooled connections, writes go through one writer
+    connection under a lock, and add_items() inserts a whole batch in a
+    single transaction. removing an item moves the last row into its
+    position so that rows stay dense and can be sampled by index"""
+    def __init__(self, path, readers=4):
+        self.path = path
+        self.writer = sqlite3.connect(path, check_same_thread=False,
+                                      cached_statements=64)
+        self.writer.execute('PRAGMA journal_mode=WAL')
+        self.writer.executescript(SCHEMA)
+        self.write_lock = threading.Lock()
+        self.readers = ConnectionPool(path, readers)
+
+    def close(self):
+        """function to close the database connections"""
+        self.readers.close()
+        self.writer.close()
+
+    def _query(self, sql, params=()):
+        with self.readers.connection() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def _scalar(self, sql, params=()):
+        rows = self._query(sql, params)
+        return rows[0][0] if rows else None
+
+    @staticmethod
+    def _item(name, cents):
+        item = Item.__new__(Item)
+        item.name = name
+        item.price = Money(cents)
+        return item
+
+    def __contains__(self, item_name):
+        return self._scalar(SQL_CONTAINS, (item_name,)) is not None
+
+    def get_item(self, item_name):
+        """function to get the item stored under a name"""
+        cents = self._scalar(SQL_GET, (item_name,))
+        if cents is None:
+            raise NonExistingItemError(item_name)
+        return self._item(item_name, cents)
+
+    def get_size(self):
+        """function to get the size of the pool"""
+        return self._scalar(SQL_SIZE)
+
+    def item_at(self, row):
+        """function to get the item stored at a dense row index"""
+        name, cents = self._query(SQL_AT, (row,))[0]
+        return self._item(name, cents)
+
+    def iter_items(self):
+        """function to iterate over (name, item) pairs of the pool"""
+        for name, cents in self._query(SQL_ITER):
+            yield name, self._item(name, cents)
+
+    def price_column(self):
+        """function to get the prices of the dense rows as integer cents"""
+        return array('q', (cents for (cents,) in self._query(SQL_PRICES)))
+
+    def add_item(self, item):
+        """function to add item to the pool"""
+        self.add_items([item])
+
+    def add_items(self, items):
+        """function to add a batch of items in one transaction
+
+        nothing is added when any item of the batch is invalid"""
+        for item in items:
+            if not isinstance(item, Item):
+                raise InvalidItemPoolError()
+        with self.write_lock:
+            size = self.writer.execute(SQL_SIZE).fetchone()[0]
+            try:
+                with self.writer:
+                    self.writer.executemany(
+                        SQL_INSERT,
+                        ((item.name, item.price.cents, size + i,
+                          len(item.name))
+                         for i, item in enumerate(items)))
+            except sqlite3.IntegrityError as exc:
+                raise DuplicateItemError() from exc
+            self.version += 1
+
+    def remove_item(self, item_name):
+        """function to remove item in the pool"""
+        with self.write_lock:
+            with self.writer:
+                found = self.writer.execute(SQL_GET_ROW,
+                                            (item_name,)).fetchone()
+                if found is None:
+                    raise NonExistingItemError(item_name)
+                last = self.writer.execute(SQL_SIZE).fetchone()[0] - 1
+                self.writer.execute(SQL_DELETE, (item_name,))
+                if found[0] != last:
+                    self.writer.execute(SQL_MOVE, (found[0], last))
+            self.version += 1
+
+    def sample_items(self, sample_size, rng=None):
+        """function to get a random number of item pool
+
+        rows are drawn in O(sample_size) and fetched through the row
+        index, so the table is never scanned"""
+        rows = sample_indices(self.get_size(), sample_size, rng)
+        found = {}
+        for start in range(0, len(rows), MAX_PARAMS):
+            chunk = rows[start:start + MAX_PARAMS]
+            marks = ', '.join('?' * len(chunk))
+            for name, cents, row in self._query(
+                    'SELECT name, cents, row FROM items '
+                    f'WHERE row IN ({marks})', chunk):
+                found[row] = self._item(name, cents)
+        return [found[row] for row in rows]
+
+    def sorted_names(self):
+        """function to iterate over the item names in sorted order"""
+        with self.readers.connection() as connection:
+            cursor = connection.execute(SQL_SORTED)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for (name,) in rows:
+                    yield name
+
+    def sorted_names_slice(self, start, stop):
+        """function to get the sorted names between two positions"""
+        return [name for (name,) in
+                self._query(SQL_SORTED_SLICE, (stop - start, start))]
+
+    def sorted_position(self, item_name):
+        """function to get the sorted position of a (possibly absent) name"""
+        return self._scalar(SQL_POSITION, (item_name,))
+
+    def max_name_length(self):
+        """function to get the length of the longest item name"""
+        return self._scalar(SQL_MAX_NAME)
+
+    def max_order(self):
+        """function to get the largest price order of the pool
+
+        the order only grows with the price, so it is the order of the
+        highest price"""
+        cents = self._scalar(SQL_MAX_PRICE)
+        if cents is None:
+            return 0
+        return max(self._item('', cents).get_order(), 0)
+
+    def price_range(self, low, high):
+        """function to get the names of the items priced from low to high
+        (both included), cheapest first; served by the cents index"""
+        return [name for (name,) in self._query(
+            SQL_PRICE_RANGE, (Money.from_value(low).cents,
+                              Money.from_value(high).cents))]
+
+    def cheapest(self, count):
+        """function to get the names of the count cheapest items"""
+        return [name for (name,) in
+                self._query(SQL_CHEAPEST, (max(count, 0),))]
+
+    def most_expensive(self, count):
+        """function to get the names of the count most expensive items,
+        most expensive first"""
+        return [name for (name,) in
+                self._query(SQL_MOST_EXPENSIVE, (max(count, 0),))]
+
+    def get_memory_usage(self):
+        """function to get the approximate memory footprint in bytes
+
+        only the Python side is counted, the items stay in the file"""
+        return sys.getsizeof(self) + sys.getsizeof(self.readers)
+
+    def __repr__(self):
+        return f'SQLiteItemPool({self.path!r})'
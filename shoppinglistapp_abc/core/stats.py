@@ -0,0 +1,124 @@
+"""module used to collect per-command counts and latency histograms"""
+import json
+from bisect import bisect_left
+
+# upper bounds in seconds of the latency buckets, the last bucket
+# (above 10 s) is open
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+           0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0)
+KINDS = ('add', 'del', 'show', 'list', 'ask', 'answer', 'quit', 'stats',
+         'invalid')
+
+
+class Histogram:
+    """class used to count latencies in fixed buckets
+
+    observing is one bisect and three additions, so the histogram can
+    stay on in production; quantiles are read back as bucket bounds"""
+    __slots__ = ('counts', 'count', 'errors', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, error=False):
+        """function to record one latency"""
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, fraction):
+        """function to get the upper bound of the bucket holding the given
+        fraction of the observations (the max for the open bucket)"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class CommandStats:
+    """class used to keep a Histogram per command kind"""
+    def __init__(self):
+        self.kinds = {}
+
+    def observe(self, kind, seconds, error=False):
+        """function to record one command of a kind"""
+        histogram = self.kinds.get(kind)
+        if histogram is None:
+            histogram = self.kinds[kind] = Histogram()
+        histogram.observe(seconds, error)
+
+    def reset(self):
+        """function to drop every recorded command"""
+        self.kinds = {}
+
+    def _sorted(self):
+        order = {kind: i for i, kind in enumerate(KINDS)}
+        return sorted(self.kinds.items(),
+                      key=lambda pair: (order.get(pair[0], len(KINDS)),
+                                        pair[0]))
+
+    def to_text(self):
+        """function to format the stats as a table for the stats command"""
+        out = [f'{"COMMAND":8} {"COUNT":>8} {"ERRORS":>7} {"MEAN":>10} '
+               f'{"P50":>10} {"P99":>10} {"MAX":>10}']
+        for kind, hist in self._sorted():
+            out.append(
+                f'{kind:8} {hist.count:>8} {hist.errors:>7} '
+                f'{_ms(hist.total / hist.count)} {_ms(hist.quantile(0.5))} '
+                f'{_ms(hist.quantile(0.99))} {_ms(hist.max)}')
+        if not self.kinds:
+            out.append('No commands recorded yet.')
+        return '\n'.join(out)
+
+    def to_dict(self):
+        """function to get the stats as plain data"""
+        return {kind: {'count': hist.count, 'errors': hist.errors,
+                       'sum': hist.total, 'max': hist.max,
+                       'buckets': dict(zip([*map(str, BUCKETS), '+Inf'],
+                                           hist.counts))}
+                for kind, hist in self._sorted()}
+
+    def to_json(self):
+        """function to export the stats as JSON"""
+        return json.dumps(self.to_dict())
+
+    def to_prometheus(self, prefix='shoppinglist_command'):
+        """function to export the stats in the Prometheus text format"""
+        out = [f'# HELP {prefix}_seconds Latency of the app commands.',
+               f'# TYPE {prefix}_seconds histogram']
+        bounds = [*map(str, BUCKETS), '+Inf']
+        for kind, hist in self._sorted():
+            seen = 0
+            for bound, count in zip(bounds, hist.counts):
+                seen += count
+                out.append(f'{prefix}_seconds_bucket{{kind="{kind}",'
+                           f'le="{bound}"}} {seen}')
+            out.append(f'{prefix}_seconds_sum{{kind="{kind}"}} '
+                       f'{hist.total!r}')
+            out.append(f'{prefix}_seconds_count{{kind="{kind}"}} '
+                       f'{hist.count}')
+        out += [f'# HELP {prefix}_errors_total Commands that were rejected '
+                'or raised.',
+                f'# TYPE {prefix}_errors_total counter']
+        for kind, hist in self._sorted():
+            out.append(f'{prefix}_errors_total{{kind="{kind}"}} '
+                       f'{hist.errors}')
+        return '\n'.join(out)
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:>8.3f}ms'
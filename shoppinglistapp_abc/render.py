@@ -0,0 +1,128 @@
+"""This module renders the item pool and the shopping list for app_cli"""
+from shoppinglistapp.core.items import Item
+
+
+def item_line(item, padding, order, quantity=None, hide_price=False,
+              leading_dash=True):
+    """function to format one row of the items or shopping list table"""
+    return (item.get_list_item_str(quantity, leading_dash) + " " + "..."
+            + "." * padding + " "
+            + item.get_price_str(quantity, hide_price, order) + '\n')
+
+
+class Renderer:
+    """class used to render tables line by line with cached rows
+
+    rendered rows are cached per item name (pool) or per row (shopping
+    list) and thrown away as soon as the version of the rendered object
+    changes, so showing the same pool or list again only costs the
+    output"""
+    def __init__(self):
+        self._item_key = None
+        self._item_lines = {}
+        self._list_key = None
+        self._list_lines = None
+        self._layout = None
+
+    def iter_items(self, pool, names=None, title='ITEMS'):
+        """generator yielding the lines of the items table
+
+        names restricts the table to the given item names, in order; the
+        column widths always come from the whole pool so pages line up"""
+        key = (id(pool), pool.version)
+        if key != self._item_key:
+            self._item_key = key
+            self._item_lines = {}
+        cache = self._item_lines
+        max_name, max_order = pool.max_name_length(), pool.max_order()
+        yield title + '\n'
+        if names is None:
+            names = pool.sorted_names()
+        for item_name in names:
+            line = cache.get(item_name)
+            if line is None:
+                line = item_line(pool.get_item(item_name),
+                                 max_name - len(item_name), max_order)
+                cache[item_name] = line
+            yield line
+
+    def list_lines(self, shopping_list):
+        """function to get the cached unmasked lines of a shopping list
+
+        the result holds one line per row, then the total line, then the
+        horizontal rule. price changes of the pool are picked up first"""
+        shopping_list.sync()
+        key = (id(shopping_list), id(shopping_list.list),
+               shopping_list.version)
+        if key != self._list_key:
+            self._list_key = key
+            self._list_lines = self._render_list(shopping_list)
+        return self._list_lines
+
+    def iter_list(self, shopping_list, mask_index=None):
+        """generator yielding the lines of the shopping list table
+
+        the row at mask_index (or the total when it equals the number of
+        rows) is the only line formatted again, with its price hidden"""
+        lines = self.list_lines(shopping_list)
+        rows = len(lines) - 2
+        total_line, hline = lines[-2], lines[-1]
+        yield 'SHOPPING LIST\n'
+        for i in range(rows):
+            if i == mask_index:
+                yield self._masked_row(shopping_list, i)
+            else:
+                yield lines[i]
+        if mask_index == rows:
+            total_line = self._masked_total()
+            hline = '-' * (len(total_line) - 1) + '\n'
+        yield hline
+        yield total_line
+
+    @staticmethod
+    def _list_layout(shopping_list):
+        """compute the padding base and order shared by all list rows"""
+        max_item = max(len(item.name) for item, _ in shopping_list.list)
+        line_base_len = max(max_item, len('TOTAL') - 4)
+        total = Item('TOTAL', shopping_list.get_total_price())
+        max_order = total.get_order()
+        max_name = len(total.name)
+        for item, _ in shopping_list.list:
+            max_name = max(max_name, len(item.name))
+            max_order = max(max_order, item.get_order())
+        return line_base_len, max_name, max_order, total
+
+    def _render_list(self, shopping_list):
+        line_base_len, max_name, max_order, total = \
+            self._list_layout(shopping_list)
+        self._layout = (line_base_len, max_name, max_order, total)
+        lines = [item_line(item, line_base_len - len(item.name), max_order,
+                           quantity)
+                 for item, quantity in shopping_list.list]
+        total_line = self._total_line(total, max_name, max_order, False)
+        lines.append(total_line)
+        lines.append('-' * (len(total_line) - 1) + '\n')
+        return lines
+
+    @staticmethod
+    def _total_line(total, max_name, max_order, hide_price):
+        q_len = 5
+        d_len = 2
+        padding = max_name - len(total.name) + q_len + d_len
+        return item_line(total, padding, max_order, hide_price=hide_price,
+                         leading_dash=False)
+
+    def _masked_row(self, shopping_list, i):
+        line_base_len, _, max_order, _ = self._layout
+        item, quantity = shopping_list.list[i]
+        return item_line(item, line_base_len - len(item.name), max_order,
+                         quantity, hide_price=True)
+
+    def _masked_total(self):
+        _, max_name, max_order, total = self._layout
+        return self._total_line(total, max_name, max_order, True)
+
+    @staticmethod
+    def write(lines, stream):
+        """function to write rendered lines straight to an output stream"""
+        stream.writelines(lines)
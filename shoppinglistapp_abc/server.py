@@ -0,0 +1,160 @@
+"""This module serves many AppCLI sessions over a line-based TCP protocol
+
+every connection gets its own AppCLI (and so its own AppEngine and
+ShoppingList) over one shared item pool. the client sends one command
+per line; the server answers with the lines of the message followed by
+a line holding a single dot, lines starting with a dot being sent with
+one more dot (like SMTP)"""
+import asyncio
+import io
+import sys
+
+from shoppinglistapp.app_cli import AppCLI
+from shoppinglistapp.core.shoppinglist import ShoppingList
+
+
+def encode_reply(message):
+    """function to frame a message for the wire"""
+    lines = message.split('\n')
+    out = [('.' + line if line.startswith('.') else line) + '\n'
+           for line in lines]
+    out.append('.\n')
+    return ''.join(out).encode('utf-8')
+
+
+class Session:
+    """class used to hold the state of one connected client"""
+    def __init__(self, item_pool, writer=None, page_size=20, stats=None):
+        self.app = AppCLI(ShoppingList(), item_pool, page_size, stats)
+        self.writer = writer
+        self.commands = 0
+
+    def execute(self, cmd):
+        """function to run one command and return its message text"""
+        self.commands += 1
+        try:
+            self.app.execute_command(cmd)
+        # pylint: disable=broad-except
+        except Exception as exc:
+            self.app.app_engine.message = f'Error: {exc}'
+        out = io.StringIO()
+        self.app.write_message(out)
+        return out.getvalue().rstrip('\n')
+
+
+class AppServer:
+    """class used to run the asyncio server over a shared item pool
+
+    sessions idle for idle_timeout seconds are closed, at most
+    max_sessions are served at once (later clients are turned away) and
+    every reply is drained before the next command is read, so a slow
+    client only ever has one reply buffered. a CommandStats given as
+    stats is shared by all the sessions, so any client's stats command
+    shows the whole server"""
+    # pylint: disable=too-many-arguments
+    def __init__(self, item_pool, host='127.0.0.1', port=0,
+                 idle_timeout=300.0, max_sessions=10000, page_size=20,
+                 stats=None):
+        self.item_pool = item_pool
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.page_size = page_size
+        self.stats = stats
+        self.sessions = set()
+        self.evicted = 0
+        self.rejected = 0
+        self.server = None
+
+    async def start(self):
+        """function to start listening, returns the bound port"""
+        self.server = await asyncio.start_server(
+            self.handle, self.host, self.port,
+            backlog=min(self.max_sessions, 4096))
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        """function to serve until the task is cancelled"""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """function to stop listening, end the open sessions and wait for
+        the server to close"""
+        self.server.close()
+        for session in list(self.sessions):
+            session.writer.close()
+        while self.sessions:
+            await asyncio.sleep(0.01)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        """function to serve one client connection"""
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            writer.write(encode_reply('Server busy, try again later.'))
+            await self._close(writer)
+            return
+        session = Session(self.item_pool, writer, self.page_size,
+                          self.stats)
+        self.sessions.add(session)
+        try:
+            await self._serve(session, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError,
+                ValueError):
+            pass
+        finally:
+            self.sessions.discard(session)
+            await self._close(writer)
+
+    async def _serve(self, session, reader, writer):
+        while session.app.app_engine.continue_execution:
+            try:
+                line = await asyncio.wait_for(reader.readline(),
+                                              self.idle_timeout)
+            except asyncio.TimeoutError:
+                self.evicted += 1
+                writer.write(encode_reply(
+                    f'Session closed after {self.idle_timeout:g}s idle.'))
+                await writer.drain()
+                return
+            if not line:
+                return
+            cmd = line.decode('utf-8', 'replace').rstrip('\r\n')
+            writer.write(encode_reply(session.execute(cmd)))
+            await writer.drain()
+
+    @staticmethod
+    async def _close(writer):
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def read_reply(reader):
+    """function for clients: read one framed reply, None on EOF"""
+    lines = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        line = line.decode('utf-8').rstrip('\n')
+        if line == '.':
+            return '\n'.join(lines)
+        lines.append(line[1:] if line.startswith('.') else line)
+
+
+if __name__ == '__main__':
+    from shoppinglistapp.core.catalog import MappedItemPool
+    from shoppinglistapp.core.stats import CommandStats
+    # usage: server.py <catalog file> [port]
+    server = AppServer(MappedItemPool(sys.argv[1]),
+                       port=int(sys.argv[2]) if len(sys.argv) > 2 else 7777,
+                       stats=CommandStats())
+    asyncio.run(server.serve_forever())